@@ -6,7 +6,13 @@ This module sets up the FastAPI application and handles the
 requests for prediction and other endpoints.
 """
 
-from fastapi import FastAPI
-from .main import app as api_app
-
 __all__ = ["api_app"]
+
+
+def __getattr__(name):
+    # The app is built on first access, so importing a submodule (e.g. api.auth
+    # to mint tokens) does not load the model
+    if name == "api_app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
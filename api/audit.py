@@ -0,0 +1,485 @@
+# secure-healthcare-ml/api/audit.py
+
+"""
+This module records an audit trail of prediction and explanation calls:
+who called, which model version answered, a hash of the inputs, the output,
+the response status and the latency, for failed calls as well as successful
+ones. Handlers only append to an in-memory queue; a background task writes
+the queue to the database in batches, spooling to a local file while the
+database is unavailable and replaying the spool once it is back.
+"""
+
+import os
+import asyncio
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from db import async_db
+
+# Audit every prediction and explanation call
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Records held in memory before overflowing, records written per batch,
+# and the longest a record waits in the queue
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+
+# Local file receiving records the database could not take (NDJSON, one record per line);
+# shared by the workers of a host, which take a lock on "<path>.lock" to append to or claim it
+AUDIT_SPOOL_PATH = os.getenv("AUDIT_SPOOL_PATH", "audit_spool.ndjson")
+
+# What happens to records arriving at a full queue: 'spool' writes them straight
+# to the spool file on the request path, 'drop' discards and counts them
+AUDIT_OVERFLOW_POLICIES = ("spool", "drop")
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "spool")
+
+logger = logging.getLogger(__name__)
+
+# A queued call: (recorded_at, username, endpoint, model_version, inputs, input_hash, output, latency_seconds, status)
+QueuedRecord = Tuple[float, Optional[str], str, Optional[str], Any, Optional[str], Any, float, int]
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars and arrays serialize as their Python equivalents
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+
+def hash_inputs(inputs: Any) -> str:
+    """
+    Return the SHA-256 hex digest of canonicalized inputs; key order does not matter.
+    """
+    payload = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=_json_default)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AuditedCall:
+    """
+    An audited call in progress; the handler sets its output once computed.
+    """
+
+    def __init__(self, inputs: Any, input_hash: Any):
+        self.inputs = inputs
+        self.input_hash = input_hash
+        self.output: Any = None
+        self.status = 500
+
+
+class _Auditing:
+    """
+    Context manager auditing a handler call through the subclass's record().
+    """
+
+    @contextmanager
+    def audited(self, endpoint: str, username: Optional[str], model_version: Optional[str], inputs: Any = None,
+                input_hash: Any = None) -> Iterator[AuditedCall]:
+        """
+        Audit the handler code run inside the block, whether it returns or raises.
+        The status is 200 on success and the status code of the raised
+        HTTPException (500 for any other error) on failure.
+
+        Args:
+            endpoint (str): The audited route.
+            username (str, optional): The authenticated user.
+            model_version (str, optional): The model version that answers.
+            inputs (Any): JSON-serializable request inputs, as for record().
+            input_hash (Any, optional): Precomputed input hash, or a hashlib object
+                fed while the body streams in and read when the call ends.
+        """
+        call = AuditedCall(inputs, input_hash)
+        started = time.perf_counter()
+        try:
+            yield call
+            call.status = 200
+        except Exception as e:
+            call.status = getattr(e, "status_code", 500)
+            raise
+        finally:
+            input_hash = call.input_hash
+            if hasattr(input_hash, "hexdigest"):
+                input_hash = input_hash.hexdigest()
+            self.record(endpoint, username, model_version, call.inputs, call.output, time.perf_counter() - started,
+                        input_hash=input_hash, status=call.status)
+
+
+class AuditLog(_Auditing):
+    def __init__(
+        self,
+        writer: Optional[Callable[[List[tuple]], Awaitable[Any]]] = None,
+        spool_path: str = AUDIT_SPOOL_PATH,
+        max_queue: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        overflow: str = AUDIT_OVERFLOW,
+    ):
+        """
+        Initializes the audit log.
+
+        Args:
+            writer (Callable, optional): Coroutine function writing a list of rows in
+                AUDIT_COLUMNS order; records are only spooled when None.
+            spool_path (str): Local NDJSON file for records the writer could not take,
+                possibly shared with other processes.
+            max_queue (int): Records held in memory before the overflow policy applies.
+            batch_size (int): Maximum number of records per write.
+            flush_interval (float): Seconds between writes of a partial batch.
+            overflow (str): One of AUDIT_OVERFLOW_POLICIES.
+        """
+        if overflow not in AUDIT_OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy '{overflow}'; expected one of {AUDIT_OVERFLOW_POLICIES}")
+        self.writer = writer
+        self.spool_path = spool_path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._queue: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._spool_lock = threading.Lock()
+        self._replay_path = f"{spool_path}.{os.getpid()}.replay"
+        # Overflowing records being spooled by worker threads, awaited on stop
+        self._overflowing: set = set()
+
+        # Metrics
+        self.records_total = 0
+        self.written_total = 0
+        self.spooled_total = 0
+        self.replayed_total = 0
+        self.dropped_total = 0
+        self.dead_lettered_total = 0
+        self.batches_total = 0
+        self.write_seconds_total = 0.0
+        self.last_error: Optional[str] = None
+
+    def record(self, endpoint: str, username: Optional[str], model_version: Optional[str], inputs: Any,
+               output: Any, latency: float, input_hash: Optional[str] = None, status: int = 200):
+        """
+        Queue one audited call without blocking; hashing and serialization happen
+        in the background. Call from the event loop, once the call has finished;
+        handlers use audited() so failed calls are recorded as well.
+
+        Args:
+            endpoint (str): The audited route.
+            username (str, optional): The authenticated user.
+            model_version (str, optional): The model version that answered.
+            inputs (Any): JSON-serializable request inputs; only their hash is stored.
+                They must not be modified after the call.
+            output (Any): JSON-serializable response payload.
+            latency (float): Handler latency in seconds.
+            input_hash (str, optional): Precomputed input hash, e.g. of a streamed body.
+            status (int): HTTP status code of the response.
+        """
+        self.records_total += 1
+        item = (time.time(), username, endpoint, model_version, inputs, input_hash, output, latency, status)
+        if len(self._queue) >= self.max_queue:
+            if self.overflow == "drop":
+                self.dropped_total += 1
+            else:
+                self._spool_overflow(item)
+            return
+        self._queue.append(item)
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        """
+        Start the background task that drains the queue.
+        """
+        if self._worker is not None:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Write out every queued record (to the database or the spool), then stop.
+        The worker finishes its current batch rather than being cancelled mid-write.
+        Errors are logged rather than raised, so shutdown carries on.
+        """
+        if self._worker is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._worker
+            self._worker = None
+        if self._overflowing:
+            await asyncio.gather(*list(self._overflowing), return_exceptions=True)
+        while self._queue:
+            try:
+                await self.flush()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Audit log flush failed on shutdown; {len(self._queue)} queued records are lost: {e}")
+                self._queue.clear()
+                break
+
+    def _spool_overflow(self, item: QueuedRecord):
+        """
+        Spool a record arriving at a full queue. On the event loop, hashing and the
+        locked file append run in a worker thread, so an overloaded service is not
+        stalled further; without a running loop they run inline.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._spool(self._to_rows([item]))
+            return
+        future = loop.run_in_executor(None, lambda: self._spool(self._to_rows([item])))
+        self._overflowing.add(future)
+        future.add_done_callback(self._overflow_done)
+
+    def _overflow_done(self, future: asyncio.Future):
+        self._overflowing.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            self.last_error = str(future.exception())
+            logger.error(f"Spooling an overflowing audit record failed: {future.exception()}")
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return queue depth and write, spool and drop counters.
+        """
+        return {
+            "enabled": True,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "records_total": self.records_total,
+            "written_total": self.written_total,
+            "spooled_total": self.spooled_total,
+            "replayed_total": self.replayed_total,
+            "dropped_total": self.dropped_total,
+            "dead_lettered_total": self.dead_lettered_total,
+            "batches_total": self.batches_total,
+            "mean_write_ms": 1000.0 * self.write_seconds_total / self.batches_total if self.batches_total else 0.0,
+            "spool_pending": self._spool_pending(),
+            "last_error": self.last_error,
+        }
+
+    async def flush(self):
+        """
+        Write one batch of queued records, spooling it if the write fails, and
+        replay the spool after a successful write. The records stay queued until
+        they are converted; records that cannot be converted are dead-lettered.
+        """
+        batch = [self._queue[i] for i in range(min(self.batch_size, len(self._queue)))]
+        if not batch:
+            return
+        rows = await asyncio.to_thread(self._to_rows, batch)
+        # Only flush() takes records off the queue, and record() appends at the other end
+        for _ in batch:
+            self._queue.popleft()
+        if not rows:
+            return
+        if await self._write(rows) and self._spool_pending():
+            await self._replay()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Write full batches right away; a partial batch waits for the next interval
+            while self._queue and not self._stopping:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Audit log flush failed: {e}")
+                    break
+                if len(self._queue) < self.batch_size:
+                    break
+
+    async def _write(self, rows: List[list]) -> bool:
+        """
+        Write rows to the database, or to the spool if there is none or the write fails.
+        """
+        if self.writer is not None and await self._write_db(rows):
+            return True
+        await asyncio.to_thread(self._spool, rows)
+        return False
+
+    async def _write_db(self, rows: List[list]) -> bool:
+        started = time.perf_counter()
+        try:
+            await self.writer([self._to_record(row) for row in rows])
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Writing {len(rows)} audit records failed, spooling them to {self.spool_path}: {e}")
+            return False
+        self.write_seconds_total += time.perf_counter() - started
+        self.batches_total += 1
+        self.written_total += len(rows)
+        return True
+
+    @contextmanager
+    def _locked_spool(self):
+        """
+        Hold the spool against this process's threads and the other processes sharing it.
+        """
+        with self._spool_lock:
+            with open(self.spool_path + ".lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _claim_spool(self) -> bool:
+        """
+        Move the spool to this process's replay file, so each spooled row is
+        replayed by one process only, and take over replay files left by
+        processes that exited mid-replay. Returns whether there is anything to replay.
+        """
+        with self._locked_spool():
+            if os.path.exists(self._replay_path):
+                return True  # A previous replay in this process was interrupted
+            if os.path.exists(self.spool_path):
+                os.replace(self.spool_path, self._replay_path)
+            for path in glob.glob(f"{glob.escape(self.spool_path)}.*.replay"):
+                if path != self._replay_path and not _process_alive(path):
+                    with open(path) as stale, open(self._replay_path, "a") as replay:
+                        replay.write(stale.read())
+                    os.remove(path)
+            return os.path.exists(self._replay_path)
+
+    async def _replay(self):
+        """
+        Move the spool aside and write it back in batches; rows that still fail are spooled again.
+        """
+        if not await asyncio.to_thread(self._claim_spool):
+            return
+        rows = await asyncio.to_thread(self._read_spool, self._replay_path)
+        replayed = 0
+        for start in range(0, len(rows), self.batch_size):
+            if not await self._write_db(rows[start:start + self.batch_size]):
+                await asyncio.to_thread(self._spool, rows[start:], False)
+                break
+            replayed += len(rows[start:start + self.batch_size])
+        os.remove(self._replay_path)
+        self.replayed_total += replayed
+        logger.info(f"Replayed {replayed} of {len(rows)} spooled audit records.")
+
+    def _spool(self, rows: List[list], count: bool = True):
+        if not rows:
+            return
+        lines = "".join(json.dumps(row, default=_json_default) + "\n" for row in rows)
+        with self._locked_spool():
+            with open(self.spool_path, "a") as spool:
+                spool.write(lines)
+            if count:
+                self.spooled_total += len(rows)
+
+    def _spool_pending(self) -> bool:
+        return os.path.exists(self.spool_path) or bool(glob.glob(f"{glob.escape(self.spool_path)}.*.replay"))
+
+    @staticmethod
+    def _read_spool(path: str) -> List[list]:
+        with open(path) as spool:
+            return [json.loads(line) for line in spool if line.strip()]
+
+    def _to_rows(self, items: List[QueuedRecord]) -> List[list]:
+        """
+        Convert queued calls into rows, moving any that cannot be serialized to the
+        dead-letter file "<spool>.dead" instead of retrying them forever.
+        """
+        rows = []
+        for item in items:
+            try:
+                rows.append(self._to_row(item))
+            except Exception as e:
+                self._dead_letter(item, e)
+        return rows
+
+    def _dead_letter(self, item: QueuedRecord, error: Exception):
+        recorded_at, username, endpoint, model_version = item[:4]
+        line = json.dumps({
+            "recorded_at": recorded_at, "username": username, "endpoint": endpoint,
+            "model_version": model_version, "status": item[-1], "error": repr(error), "record": repr(item),
+        }, default=str)
+        with self._spool_lock:
+            with open(self.spool_path + ".dead", "a") as dead:
+                dead.write(line + "\n")
+            self.dead_lettered_total += 1
+        logger.error(f"Audit record of {endpoint} could not be serialized and was dead-lettered: {error}")
+
+    @staticmethod
+    def _to_row(item: QueuedRecord) -> list:
+        """
+        Convert a queued call into a JSON-serializable row in AUDIT_COLUMNS order.
+        """
+        recorded_at, username, endpoint, model_version, inputs, input_hash, output, latency, status = item
+        return [
+            recorded_at, username, endpoint, model_version,
+            input_hash or hash_inputs(inputs), json.dumps(output, default=_json_default), latency * 1000.0, status,
+        ]
+
+    @staticmethod
+    def _to_record(row: list) -> tuple:
+        return (datetime.fromtimestamp(row[0], tz=timezone.utc), *row[1:])
+
+
+def _process_alive(replay_path: str) -> bool:
+    """
+    Return whether the process that wrote a "<spool>.<pid>.replay" file is still running.
+    """
+    try:
+        pid = int(replay_path.rsplit(".", 2)[-2])
+    except ValueError:
+        return True  # Not a replay file of this spool; leave it alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class DisabledAuditLog(_Auditing):
+    """
+    Stand-in used when auditing is turned off.
+    """
+
+    def record(self, *args, **kwargs):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": False}
+
+
+def create_audit_log():
+    """
+    Build the process-wide audit log from the AUDIT_* settings, writing to the
+    database through the async pool when it is configured.
+    """
+    if not AUDIT_ENABLED:
+        return DisabledAuditLog()
+    writer = async_db.insert_audit_records if async_db.is_configured() else None
+    if writer is None:
+        logger.warning(f"No database configured; audit records are written to {AUDIT_SPOOL_PATH} only.")
+    return AuditLog(writer)
+
+
+# Process-wide audit log shared by the prediction and explanation routers
+audit_log = create_audit_log()
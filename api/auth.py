@@ -3,21 +3,104 @@
 """
 Authentication module for the Secure Healthcare ML service.
 This module handles user authentication and authorization,
-using JWT tokens for secure API access.
+using JWT tokens for secure API access. Verified tokens and user records
+are cached in memory for a bounded revocation window, so most requests
+skip signature verification and user lookups.
 """
 
-from fastapi import Depends, HTTPException, status
+import os
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from typing import List
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-from .schemas import User, TokenData
+from .schemas import LoginRequest, Token, User, TokenData
 from .utils import verify_password, get_user_by_username
-from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, METRICS_TOKEN
+from .metrics import time_stage
+
+# Maximum number of verified tokens and user records kept in memory
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+
+# Seconds a verified token or fetched user record is trusted before it is checked
+# again, i.e. the longest a revoked token or disabled user stays accepted by this worker
+AUTH_REVOCATION_WINDOW = float(os.getenv("AUTH_REVOCATION_WINDOW", 30.0))
 
 # OAuth2 password bearer for retrieving the token from Authorization header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Initialize router for authentication endpoints
+router = APIRouter()
+
+
+class ExpiringLRUCache:
+    """
+    Thread-safe LRU mapping whose entries each carry their own expiry time
+    (``time.time()`` seconds), counting hits and misses.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[Tuple[Any, float]]:
+        """
+        Return the (value, expires_at) of a live entry, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Any, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Any):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Verified tokens (by digest) and user records (by username, including unknown users)
+token_cache = ExpiringLRUCache(AUTH_TOKEN_CACHE_SIZE)
+user_cache = ExpiringLRUCache(AUTH_USER_CACHE_SIZE)
+
+# Digests of tokens revoked in this process, kept until the token expires
+_revoked_tokens: Dict[bytes, float] = {}
+
 # Utility function to create a JWT token
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
     to_encode = data.copy()
@@ -26,30 +109,132 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# Utility function to decode the JWT token
-def decode_access_token(token: str):
+# Utility function to decode the JWT token and return its claims
+def decode_access_token_claims(token: str) -> Tuple[TokenData, Optional[float]]:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return TokenData(username=username)
+        return TokenData(username=username), payload.get("exp")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-# Dependency to get the current user from the token
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    return decode_access_token(token)
+# Utility function to decode the JWT token
+def decode_access_token(token: str):
+    return decode_access_token_claims(token)[0]
+
+# Key of a token in the caches; the bearer token itself is never kept in memory
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+# Function to fetch a user record, cached for the revocation window
+def get_cached_user(username: str) -> Tuple[Any, float]:
+    """
+    Return a user record (None for unknown users) and the time it was fetched.
+    """
+    cached = user_cache.get(username)
+    if cached is not None:
+        user, expires_at = cached
+        return user, expires_at - AUTH_REVOCATION_WINDOW
+    fetched_at = time.time()
+    user = get_user_by_username(username)
+    user_cache.set(username, user, fetched_at + AUTH_REVOCATION_WINDOW)
+    return user, fetched_at
+
+# Function to fully verify a token: signature, expiry, revocation and the user's status
+def verify_token(token: str, digest: Optional[bytes] = None) -> TokenData:
+    """
+    Verify a token and cache the result until the token expires or the
+    revocation window of the user record it was checked against ends.
+    """
+    digest = digest or token_digest(token)
+    if digest in _revoked_tokens:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+    token_data, expires_at = decode_access_token_claims(token)
+    user, fetched_at = get_cached_user(token_data.username)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unknown user")
+    if getattr(user, "disabled", False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
+    token_data.is_admin = bool(getattr(user, "is_admin", False))
+    cache_until = fetched_at + AUTH_REVOCATION_WINDOW
+    if expires_at is not None:
+        cache_until = min(cache_until, float(expires_at))
+    token_cache.set(digest, token_data, cache_until)
+    return token_data
+
+# Function to revoke a token in this process before it expires
+def revoke_token(token: str):
+    """
+    Reject a token from now on in this worker. The revocation list is per
+    process; to cut off a user in every worker, disable the user record,
+    which each worker re-reads within the revocation window.
+    """
+    digest = token_digest(token)
+    now = time.time()
+    for revoked, expires_at in list(_revoked_tokens.items()):
+        if expires_at <= now:
+            _revoked_tokens.pop(revoked, None)
+    try:
+        expires_at = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        expires_at = None
+    _revoked_tokens[digest] = float(expires_at) if expires_at is not None else now + AUTH_REVOCATION_WINDOW
+    token_cache.pop(digest)
+
+# Function to drop a user's cached record, e.g. after disabling the user
+def invalidate_user(username: str):
+    user_cache.pop(username)
+
+# Dependency to get the current user from the token; cached tokens are
+# accepted on the event loop, others are verified in a worker thread
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    with time_stage("auth"):
+        digest = token_digest(token)
+        cached = token_cache.get(digest)
+        if cached is not None:
+            return cached[0]
+        return await run_in_threadpool(verify_token, token, digest)
 
 # Dependency to check if the user has admin privileges
-def get_current_admin_user(current_user: User = Depends(get_current_user)):
+async def get_current_admin_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient privileges")
     return current_user
 
-# Function to authenticate a user using their credentials
+# Dependency guarding the metrics endpoint: accepts the static METRICS_TOKEN,
+# when one is configured, or any user's access token
+async def get_metrics_scraper(token: str = Depends(oauth2_scheme)):
+    if METRICS_TOKEN and hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        return None
+    return await get_current_user(token)
+
+# Function to authenticate a user using their credentials; the password is
+# always checked against the stored hash, only the user lookup is cached
 def authenticate_user(username: str, password: str):
-    user = get_user_by_username(username)
+    user, _ = get_cached_user(username)
     if user is None or not verify_password(password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     return user
+
+# Endpoint exchanging a username and password for an access token
+@router.post("/token", response_model=Token)
+async def login(request: LoginRequest):
+    """
+    Issue an access token for valid credentials. Password hashing is slow by
+    design, so it runs off the event loop.
+    """
+    user = await run_in_threadpool(authenticate_user, request.username, request.password)
+    if getattr(user, "disabled", False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
+    return Token(access_token=create_access_token({"sub": user.username}))
+
+# Function reporting the hit rates and sizes of the authentication caches
+def auth_cache_stats() -> Dict[str, Any]:
+    return {
+        "revocation_window_seconds": AUTH_REVOCATION_WINDOW,
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats(),
+        "revoked_tokens": len(_revoked_tokens),
+    }
@@ -0,0 +1,194 @@
+# secure-healthcare-ml/api/batching.py
+
+"""
+This module provides a dynamic micro-batching scheduler for single-row
+predictions. Concurrent requests arriving within a short window are
+coalesced into one feature matrix, scored in a worker thread off the
+event loop, and the results are fanned back out to the awaiting requests.
+"""
+
+import asyncio
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (in milliseconds) of the added-latency histogram buckets
+LATENCY_BUCKETS_MS = (0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+# Queued after the pending rows to tell the worker to finish them and exit
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray], max_batch_size: int = 64, max_wait_ms: float = 2.0):
+        """
+        Initializes the micro-batcher.
+
+        Args:
+            predict_fn (Callable): Scores a 2-D feature matrix and returns one result per row.
+            max_batch_size (int): Maximum number of rows coalesced into one model call.
+            max_wait_ms (float): How long to wait for more rows after the first one arrives.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        # Event loop the worker runs on, once started
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Metrics
+        self.batch_size_histogram: Dict[int, int] = {}
+        self.latency_histogram: Dict[float, int] = {bound: 0 for bound in LATENCY_BUCKETS_MS + (float("inf"),)}
+        self.added_latency_sum = 0.0
+        self.added_latency_max = 0.0
+        self.requests_total = 0
+        self.batches_total = 0
+
+    async def start(self):
+        """
+        Start the background worker that drains the request queue.
+        """
+        if self._worker is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="microbatch")
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Score the batch being collected or scored and any queued requests, then
+        stop the worker. Requests the worker could not score are failed rather
+        than left waiting.
+        """
+        if self._worker is None:
+            return
+        self._queue.put_nowait(_STOP)
+        try:
+            await self._worker
+        finally:
+            self._fail_pending(RuntimeError("Micro-batcher stopped before the request was scored"))
+            self._executor.shutdown(wait=True)
+            self._worker = None
+
+    async def submit(self, row: np.ndarray) -> Any:
+        """
+        Queue one feature row for scoring and wait for its result.
+
+        Args:
+            row (np.ndarray): A 1-D feature vector in model column order.
+
+        Returns:
+            Any: The model output for this row.
+        """
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future, time.perf_counter()))
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        """
+        Return queue depth, batch-size histogram and added-latency metrics.
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "requests_total": self.requests_total,
+            "batches_total": self.batches_total,
+            "mean_batch_size": self.requests_total / self.batches_total if self.batches_total else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            "added_latency_ms": {
+                "mean": 1000.0 * self.added_latency_sum / self.requests_total if self.requests_total else 0.0,
+                "max": 1000.0 * self.added_latency_max,
+                "histogram": {str(bound): count for bound, count in self.latency_histogram.items()},
+            },
+        }
+
+    def _drain_nowait(self) -> List[Tuple[np.ndarray, asyncio.Future, float]]:
+        batch = []
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+        return batch
+
+    def _fail_pending(self, error: Exception):
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP and not item[1].done():
+                item[1].set_exception(error)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            # Block until the first row arrives, then collect more until the window closes
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._score_batch(batch)
+
+        # Score the rows submitted before the worker saw the stop request
+        while not self._queue.empty():
+            await self._score_batch(self._drain_nowait())
+
+    async def _score_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]]):
+        # Skip requests whose clients have already gone away
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+
+        dispatched = time.perf_counter()
+        self._record(batch, dispatched)
+
+        try:
+            matrix = np.vstack([row for row, _, _ in batch])
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self.predict_fn, matrix)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, batch: List[Tuple[np.ndarray, asyncio.Future, float]], dispatched: float):
+        size = len(batch)
+        self.batches_total += 1
+        self.requests_total += size
+        self.batch_size_histogram[size] = self.batch_size_histogram.get(size, 0) + 1
+        for _, _, enqueued in batch:
+            waited = dispatched - enqueued
+            self.added_latency_sum += waited
+            self.added_latency_max = max(self.added_latency_max, waited)
+            waited_ms = waited * 1000.0
+            for bound in self.latency_histogram:
+                if waited_ms <= bound:
+                    self.latency_histogram[bound] += 1
+                    break
@@ -0,0 +1,338 @@
+# secure-healthcare-ml/api/cache.py
+
+"""
+This module provides a cache for computed model explanations. Entries are
+keyed by model version, a hash of the canonicalized feature vector and the
+explainer configuration, and are evicted by LRU, TTL and a total size cap.
+The storage backend is pluggable: in-process memory, an on-disk SQLite file
+shared by all workers on a host, or Redis shared across hosts.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+def make_cache_key(model_version: str, features: dict, explainer_config: Optional[dict] = None) -> str:
+    """
+    Build a cache key from the model version, canonicalized features and explainer configuration.
+
+    Numeric feature values are normalized to floats and keys are sorted, so
+    ``{"age": 45, "bmi": 30.5}`` and ``{"bmi": 30.5, "age": 45.0}`` share a key.
+
+    Args:
+        model_version (str): Version of the model that produced the explanation.
+        features (dict): The raw input features.
+        explainer_config (dict, optional): Settings that affect the explanation.
+
+    Returns:
+        str: The cache key, prefixed with the model version.
+    """
+    canonical = {
+        name: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+        for name, value in features.items()
+    }
+    payload = json.dumps([canonical, explainer_config or {}], sort_keys=True, separators=(",", ":"), default=str)
+    return f"{model_version}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600.0):
+        """
+        In-process LRU store with TTL expiry and a total size cap.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, _, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, model_version: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(value) > self.max_bytes:
+                return
+            self._entries[key] = (value, model_version, time.monotonic() + self.ttl_seconds)
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete_version(self, model_version: str):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] == model_version]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def size(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key: str):
+        value, _, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class SQLiteBackend:
+    def __init__(self, path: str, max_entries: int = 100000, max_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 3600.0):
+        """
+        On-disk store shared by all worker processes on a host, with LRU, TTL and size cap.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS explanation_cache (
+                key TEXT PRIMARY KEY,
+                model_version TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS explanation_cache_lru ON explanation_cache (last_access)")
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM explanation_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM explanation_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE explanation_cache SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: bytes, model_version: str):
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO explanation_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_version, value, len(value), now + self.ttl_seconds, now),
+                )
+                self._conn.execute("DELETE FROM explanation_cache WHERE expires_at <= ?", (now,))
+                self._enforce_caps()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_version(self, model_version: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM explanation_cache WHERE model_version = ?", (model_version,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM explanation_cache")
+
+    def size(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM explanation_cache"
+            ).fetchone()
+        return {"entries": entries, "bytes": total}
+
+    def _enforce_caps(self):
+        entries, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM explanation_cache"
+        ).fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk entries from least recently used until both caps are satisfied
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM explanation_cache ORDER BY last_access"):
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            entries -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM explanation_cache WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+
+class RedisBackend:
+    def __init__(self, url: str, ttl_seconds: float = 3600.0, prefix: str = "explain:"):
+        """
+        Store shared across hosts. LRU and the size cap are delegated to the Redis
+        server's ``maxmemory`` / ``allkeys-lru`` policy; TTL is set per entry.
+        Entries expire and are evicted server-side, so their count and size are
+        not tracked and are reported as None.
+        """
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The Redis explanation cache backend requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, model_version: str):
+        self._client.set(self.prefix + key, value, ex=int(self.ttl_seconds))
+
+    def delete_version(self, model_version: str):
+        for key in self._client.scan_iter(match=f"{self.prefix}{model_version}:*"):
+            self._client.delete(key)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=f"{self.prefix}*"):
+            self._client.delete(key)
+
+    def size(self) -> dict:
+        # Counting keys takes a full SCAN of the keyspace, too slow for every stats call and scrape
+        return {"entries": None, "bytes": None}
+
+
+class ExplanationCache:
+    def __init__(self, backend: Any):
+        """
+        Serializes explanations into a backend and tracks hit and miss counts.
+
+        Args:
+            backend (Any): One of MemoryBackend, SQLiteBackend or RedisBackend.
+        """
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        # Lookups of blocking backends run in worker threads
+        self._counter_lock = threading.Lock()
+
+    def get(self, key: str, count: bool = True) -> Optional[dict]:
+        """
+        Return the cached explanation for a key, or None on a miss. Lookups
+        made with ``count=False`` are left out of the hit and miss counts.
+        """
+        value = self.backend.get(key)
+        if not count:
+            return None if value is None else json.loads(value)
+        with self._counter_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, explanation: dict):
+        """
+        Store an explanation. The model version is taken from the key prefix.
+        """
+        model_version = key.split(":", 1)[0]
+        self.backend.set(key, json.dumps(explanation).encode(), model_version)
+
+    @property
+    def blocking(self) -> bool:
+        """
+        Whether the backend does file or network I/O on every lookup.
+        """
+        return not isinstance(self.backend, MemoryBackend)
+
+    async def get_async(self, key: str, count: bool = True) -> Optional[dict]:
+        """
+        get() for the event loop: lookups in a SQLite or Redis backend run in a worker thread.
+        """
+        if not self.blocking:
+            return self.get(key, count)
+        return await asyncio.to_thread(self.get, key, count)
+
+    async def set_async(self, key: str, explanation: dict):
+        """
+        set() for the event loop: writes to a SQLite or Redis backend run in a worker thread.
+        """
+        if not self.blocking:
+            return self.set(key, explanation)
+        await asyncio.to_thread(self.set, key, explanation)
+
+    def invalidate(self, model_version: Optional[str] = None):
+        """
+        Drop all entries of a model version, or every entry when no version is given.
+        """
+        if model_version is None:
+            self.backend.clear()
+        else:
+            self.backend.delete_version(model_version)
+
+    def stats(self) -> dict:
+        """
+        Return hit and miss counts (for this process) and the backend's current size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            **self.backend.size(),
+        }
+
+
+def create_explanation_cache(
+    backend: str = "memory",
+    path: Optional[str] = None,
+    url: Optional[str] = None,
+    max_entries: int = 1024,
+    max_bytes: int = 64 * 1024 * 1024,
+    ttl_seconds: float = 3600.0,
+) -> ExplanationCache:
+    """
+    Create an explanation cache for the configured backend.
+
+    Args:
+        backend (str): 'memory', 'sqlite' or 'redis'.
+        path (str, optional): SQLite database file, for the 'sqlite' backend.
+        url (str, optional): Redis URL, for the 'redis' backend.
+        max_entries (int): Maximum number of cached explanations.
+        max_bytes (int): Maximum total size of cached explanations.
+        ttl_seconds (float): Lifetime of a cached explanation.
+
+    Returns:
+        ExplanationCache: The configured cache.
+    """
+    if backend == "memory":
+        return ExplanationCache(MemoryBackend(max_entries, max_bytes, ttl_seconds))
+    if backend == "sqlite":
+        return ExplanationCache(SQLiteBackend(path or "explanation_cache.sqlite3", max_entries, max_bytes, ttl_seconds))
+    if backend == "redis":
+        return ExplanationCache(RedisBackend(url or "redis://localhost:6379/0", ttl_seconds))
+    raise ValueError(f"Unknown explanation cache backend: {backend}")
@@ -0,0 +1,27 @@
+# secure-healthcare-ml/api/config.py
+
+"""
+This module reads the API settings from environment variables.
+"""
+
+import os
+import secrets
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Key signing the access tokens; set it so every worker accepts the tokens the
+# others issued, otherwise each process signs with its own random key
+SECRET_KEY = os.getenv("SECRET_KEY") or secrets.token_urlsafe(32)
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+# Static bearer token accepted by /metrics, for Prometheus' scrape config
+# (authorization credentials); without it, scrapes need a user's access token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# OpenAPI metadata
+API_TITLE = "Secure Healthcare ML API"
+API_DESCRIPTION = "Predictions and SHAP explanations from healthcare risk models, behind token authentication."
+API_VERSION = os.getenv("API_VERSION", "1.0.0")
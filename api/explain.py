@@ -2,45 +2,273 @@
 
 """
 This module handles the explanation of machine learning model predictions
-using various interpretability techniques.
+using various interpretability techniques. Explanations are returned as
+numeric attributions; visualizations are rendered lazily on request in a
+separate process pool.
 """
 
+import os
+import asyncio
+import multiprocessing
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-import shap
-import pandas as pd
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+import numpy as np
+from explainability.plots import SUPPORTED_FORMATS, render_force_plot, render_summary_plot
+from explainability.registry import (
+    ExplainerRegistry,
+    background_path_for,
+    build_explainer,
+    load_background,
+    select_class_base_value,
+    select_class_values,
+)
+from .audit import audit_log
 from .auth import get_current_user
-from .models import Model
+from .cache import create_explanation_cache, make_cache_key
+from .metrics import time_stage
 from .schemas import PredictionRequest, PredictionResponse
-from .utils import load_model
+from .registry import MODEL_PATH, ModelEntry, registry, resolve_model
+
+# Number of rendered plots kept in memory
+PLOT_CACHE_SIZE = int(os.getenv("PLOT_CACHE_SIZE", 256))
+
+# Number of worker processes used for rendering plots
+PLOT_WORKERS = int(os.getenv("PLOT_WORKERS", 2))
+
+# Explanation result cache: 'memory' per worker, 'sqlite' shared per host, 'redis' shared across hosts
+EXPLANATION_CACHE_BACKEND = os.getenv("EXPLANATION_CACHE_BACKEND", "memory")
+EXPLANATION_CACHE_PATH = os.getenv("EXPLANATION_CACHE_PATH", "explanation_cache.sqlite3")
+EXPLANATION_CACHE_URL = os.getenv("EXPLANATION_CACHE_URL", "redis://localhost:6379/0")
+EXPLANATION_CACHE_MAX_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", 10000))
+EXPLANATION_CACHE_MAX_BYTES = int(os.getenv("EXPLANATION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+EXPLANATION_CACHE_TTL = float(os.getenv("EXPLANATION_CACHE_TTL", 3600))
 
 # Initialize router for model explanation endpoints
 router = APIRouter()
 
-# Load the model for explanation
-model = load_model('model_v1.pkl')
+# Load the model for explanation; the registry shares one copy with the prediction endpoints
+registry.load(MODEL_PATH)
+
+# Build the explainer once per model version instead of once per request
+explainers = ExplainerRegistry()
+
+# Cache of computed explanations, keyed by model version and feature hash
+explanation_cache = create_explanation_cache(
+    EXPLANATION_CACHE_BACKEND,
+    path=EXPLANATION_CACHE_PATH,
+    url=EXPLANATION_CACHE_URL,
+    max_entries=EXPLANATION_CACHE_MAX_ENTRIES,
+    max_bytes=EXPLANATION_CACHE_MAX_BYTES,
+    ttl_seconds=EXPLANATION_CACHE_TTL,
+)
+
+# Recently rendered plots, oldest first; the inputs to render them live in the explanation cache
+_plot_cache: OrderedDict = OrderedDict()
+_plot_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ExplanationResponse(PredictionResponse):
+    explanation_id: str
+
+
+def _remember(store: OrderedDict, key, value, max_size: int):
+    store[key] = value
+    store.move_to_end(key)
+    while len(store) > max_size:
+        store.popitem(last=False)
+
+
+def register_explainer(entry: ModelEntry):
+    """
+    Build and register the explainer of a model version.
+    """
+    return explainers.register(entry.version, entry.model, load_background(background_path_for(entry.path)))
+
+
+def get_explainer(entry: ModelEntry):
+    """
+    Return the explainer of a loaded model version, building it on first use.
+    Explainers of retired versions are built for the request but not registered
+    again, so they are not kept after the version is gone.
+    """
+    if entry.version in explainers:
+        return explainers.get(entry.version)
+    if entry.version not in registry.versions:
+        return build_explainer(entry.model, load_background(background_path_for(entry.path)))
+    return register_explainer(entry)
+
+
+def plot_cache_key(explanation_id: str) -> str:
+    """
+    Return the explanation cache key holding the inputs to plot an explanation.
+    Keeping them in the explanation cache lets any worker sharing the backend render the plot.
+    """
+    return f"plot:{explanation_id}"
+
+
+def retire_explanations(version: str):
+    """
+    Drop the explainer and cached explanations of a retired model version.
+    """
+    explainers.remove(version)
+    explanation_cache.invalidate(version)
+
+
+def activate_model(model_path: str):
+    """
+    Load and swap in a model artifact; its explainer is built before it is served.
+
+    Args:
+        model_path (str): The file path of the new model artifact.
+    """
+    registry.load(model_path, activate=True)
+
+
+# Build explainers as part of loading a version, so a swapped-in model is served warm
+registry.load_hooks.append(register_explainer)
+registry.retire_hooks.append(retire_explanations)
+for version in registry.versions:
+    get_explainer(registry.get(version))
+
+
+def get_plot_pool() -> ProcessPoolExecutor:
+    """
+    Return the process pool used for rendering plots, creating it on first use.
+    """
+    global _plot_pool
+    if _plot_pool is None:
+        _plot_pool = ProcessPoolExecutor(max_workers=PLOT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _plot_pool
+
+
+def shutdown_plot_pool():
+    """
+    Stop the plot rendering workers, if any were started.
+    """
+    global _plot_pool
+    if _plot_pool is not None:
+        _plot_pool.shutdown(wait=False, cancel_futures=True)
+        _plot_pool = None
+
+
+def compute_explanation(entry: ModelEntry, explainer, features: dict) -> dict:
+    """
+    Score one request's features and compute the SHAP values of the predicted class.
+
+    Args:
+        entry (ModelEntry): The model version answering the request.
+        explainer: The version's prebuilt explainer.
+        features (dict): The raw input features of the request.
+
+    Returns:
+        dict: The prediction, SHAP values, base value and feature names.
+    """
+    # Validate and preprocess the input into a row in model order, without building a DataFrame
+    with time_stage("preprocess"):
+        input_data = entry.encode_row(features)
+
+    # Get model prediction
+    model = entry.model
+    with time_stage("predict"):
+        prediction = entry.predictor.predict(input_data)
+
+    # Generate SHAP values for the predicted class with the prebuilt explainer
+    class_index = int(np.flatnonzero(model.classes_ == prediction[0])[0]) if hasattr(model, "classes_") else 0
+    with time_stage("explain"):
+        shap_values = select_class_values(explainer.shap_values(input_data), class_index)
+
+    return {
+        "prediction": prediction[0].item() if hasattr(prediction[0], "item") else prediction[0],
+        "shap_values": shap_values[0].tolist(),
+        "base_value": select_class_base_value(explainer.expected_value, class_index),
+        "feature_names": [str(name) for name in entry.feature_names(features)],
+    }
+
 
 # Endpoint for explaining model predictions using SHAP (SHapley Additive exPlanations)
-@router.post("/explain", response_model=PredictionResponse)
-async def explain_prediction(request: PredictionRequest, current_user: dict = Depends(get_current_user)):
+@router.post("/explain", response_model=ExplanationResponse)
+async def explain_prediction(
+    request: PredictionRequest,
+    current_user: dict = Depends(get_current_user),
+    entry: ModelEntry = Depends(resolve_model),
+):
     """
     Provide model predictions and SHAP-based explanations for the given input.
     """
-    # Preprocess the input data
-    input_data = pd.DataFrame([request.features])
-    
-    # Get model prediction
-    prediction = model.predict(input_data)
-    
-    # Generate SHAP values for explanation
-    explainer = shap.KernelExplainer(model.predict, input_data)
-    shap_values = explainer.shap_values(input_data)
-    
-    # Generate SHAP summary plot (you could also return this as an image, for example)
-    shap_summary = shap.summary_plot(shap_values, input_data, show=False)
-    
-    # Convert the SHAP values into a suitable format for the response
-    shap_values_as_dict = {f"feature_{i}": shap_values[0][i].tolist() for i in range(len(shap_values[0]))}
-
-    return PredictionResponse(prediction=prediction[0], shap_values=shap_values_as_dict)
+    with audit_log.audited("/explain", current_user.username, entry.version, request.features) as call:
+        explainer = get_explainer(entry)
+        cache_key = make_cache_key(entry.version, request.features, {"explainer": type(explainer).__name__})
+
+        explanation = await explanation_cache.get_async(cache_key)
+        if explanation is None:
+            # Scoring and SHAP (seconds per row with a Kernel explainer) run off the event loop
+            explanation = await run_in_threadpool(compute_explanation, entry, explainer, request.features)
+            await explanation_cache.set_async(cache_key, explanation)
+        call.output = {"prediction": explanation["prediction"], "shap_values": explanation["shap_values"]}
+
+        # Keep the numbers needed to render a plot later, on request
+        explanation_id = uuid.uuid4().hex
+        await explanation_cache.set_async(plot_cache_key(explanation_id), {
+            **explanation,
+            "features": [float(request.features[name]) for name in explanation["feature_names"]],
+        })
+
+        # Convert the SHAP values into a suitable format for the response
+        shap_values_as_dict = {f"feature_{i}": value for i, value in enumerate(explanation["shap_values"])}
+
+        return ExplanationResponse(
+            prediction=explanation["prediction"], shap_values=shap_values_as_dict, explanation_id=explanation_id
+        )
+
+
+# Endpoint for monitoring the explanation cache
+@router.get("/cache/stats")
+async def explanation_cache_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Report explanation cache hit and miss rates and current size.
+    """
+    if explanation_cache.blocking:
+        return await asyncio.to_thread(explanation_cache.stats)
+    return explanation_cache.stats()
+
+
+# Endpoint for rendering a visualization of a previously computed explanation
+@router.get("/{explanation_id}/plot")
+async def explanation_plot(
+    explanation_id: str, kind: str = "summary", fmt: str = "png", current_user: dict = Depends(get_current_user)
+):
+    """
+    Render the summary or force plot of an explanation, caching the image.
+    """
+    if kind not in ("summary", "force"):
+        raise HTTPException(status_code=400, detail="Plot kind must be 'summary' or 'force'")
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Plot format must be one of: {', '.join(SUPPORTED_FORMATS)}")
+
+    cache_key = (explanation_id, kind, fmt)
+    image = _plot_cache.get(cache_key)
+    if image is None:
+        explanation = await explanation_cache.get_async(plot_cache_key(explanation_id), count=False)
+        if explanation is None:
+            raise HTTPException(status_code=404, detail="Explanation not found or expired")
+
+        shap_values = np.array([explanation["shap_values"]])
+        features = np.array([explanation["features"]], dtype=float)
+        if kind == "summary":
+            render = partial(render_summary_plot, shap_values, features, explanation["feature_names"], fmt)
+        else:
+            render = partial(render_force_plot, shap_values[0], explanation["base_value"], features[0],
+                             explanation["feature_names"], fmt)
+        # Render in a worker process so plotting never blocks scoring
+        image = await asyncio.get_running_loop().run_in_executor(get_plot_pool(), render)
+        _remember(_plot_cache, cache_key, image, PLOT_CACHE_SIZE)
+
+    media_type = "image/png" if fmt == "png" else "image/svg+xml"
+    return Response(content=image, media_type=media_type)
 
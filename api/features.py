@@ -0,0 +1,87 @@
+# secure-healthcare-ml/api/features.py
+
+"""
+This module materializes model features from rows of the patients table.
+The transform is vectorized over all fetched patients so that a whole list
+of patients is converted and scored in one pass.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Optional
+from fastapi import HTTPException
+from db.db_utils import PATIENT_COLUMNS
+
+# Column order of rows returned by fetch_patients_data
+PATIENT_ROW_COLUMNS = ("patient_id",) + PATIENT_COLUMNS
+
+# Categorical patient columns expanded into one-hot indicator features, e.g. 'diagnosis_code_C34'
+ONE_HOT_COLUMNS = ("gender", "diagnosis_code", "treatment_code", "medication_code")
+
+
+def patient_rows_to_frame(rows: Iterable[tuple], patient_ids: List[int]) -> pd.DataFrame:
+    """
+    Arrange fetched patient rows in the order the IDs were requested.
+
+    Args:
+        rows (Iterable[tuple]): Rows of (patient_id, *PATIENT_COLUMNS).
+        patient_ids (List[int]): The requested patient IDs.
+
+    Returns:
+        pd.DataFrame: One row per requested patient, indexed by patient_id.
+    """
+    frame = pd.DataFrame.from_records([tuple(row) for row in rows], columns=list(PATIENT_ROW_COLUMNS))
+    frame = frame.set_index("patient_id")
+    missing = [patient_id for patient_id in patient_ids if patient_id not in frame.index]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Patients not found: {', '.join(map(str, missing))}")
+    return frame.loc[patient_ids]
+
+
+def derive_features(frame: pd.DataFrame, as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Derive numeric features from patient records.
+
+    Args:
+        frame (pd.DataFrame): Patient records as returned by `patient_rows_to_frame`.
+        as_of (pd.Timestamp, optional): Reference date for patients without a visit date.
+
+    Returns:
+        pd.DataFrame: Numeric features ('age', 'days_since_visit' and one-hot indicators).
+    """
+    as_of = as_of if as_of is not None else pd.Timestamp.today().normalize()
+    dob = pd.to_datetime(frame["dob"], errors="coerce")
+    visit_date = pd.to_datetime(frame["visit_date"], errors="coerce")
+
+    features = pd.DataFrame(index=frame.index)
+    features["age"] = (visit_date.fillna(as_of) - dob).dt.days / 365.25
+    features["days_since_visit"] = (as_of - visit_date).dt.days.astype(float)
+    indicators = pd.get_dummies(frame[list(ONE_HOT_COLUMNS)], prefix=list(ONE_HOT_COLUMNS), dtype=float)
+    return pd.concat([features, indicators], axis=1)
+
+
+def materialize_features(frame: pd.DataFrame, feature_names: List[str]) -> np.ndarray:
+    """
+    Build the model's feature matrix from patient records.
+
+    One-hot indicators that no fetched patient has are filled with zeros;
+    any other model feature that cannot be derived is an error.
+
+    Args:
+        frame (pd.DataFrame): Patient records as returned by `patient_rows_to_frame`.
+        feature_names (List[str]): The column order expected by the model.
+
+    Returns:
+        np.ndarray: A C-contiguous float matrix of shape (n_patients, n_features).
+    """
+    features = derive_features(frame)
+    missing = [
+        name for name in feature_names
+        if name not in features.columns and not name.startswith(tuple(f"{column}_" for column in ONE_HOT_COLUMNS))
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Model features not available from patient records: {', '.join(missing)}",
+        )
+    return np.ascontiguousarray(features.reindex(columns=feature_names, fill_value=0.0).to_numpy(dtype=np.float64))
@@ -2,22 +2,58 @@
 
 """
 Main module to initialize the FastAPI application and include all routes
-for model prediction, explanation, and user authentication.
+for model prediction, explanation, and user authentication, and to expose
+Prometheus metrics for them.
 """
 
-from fastapi import FastAPI
-from .auth import router as auth_router
-from .explain import router as explain_router
-from .predict import router as predict_router
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from db import async_db
+from . import metrics
+from .audit import audit_log
+from .auth import auth_cache_stats, get_current_user, get_metrics_scraper, router as auth_router
+from .explain import explanation_cache, router as explain_router, shutdown_plot_pool
+from .predict import batchers, router as predict_router, start_batcher, stop_batcher
+from .registry import MODEL_WATCH_DIR, MODEL_WATCH_INTERVAL, ModelWatcher, registry
 from .config import API_TITLE, API_DESCRIPTION, API_VERSION
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open the database pool and start background workers on startup, and
+    drain them on shutdown. The audit log is flushed before the pool closes.
+    """
+    if async_db.is_configured():
+        await async_db.init_async_pool()
+    await audit_log.start()
+    await start_batcher()
+    watcher = ModelWatcher(registry, MODEL_WATCH_DIR, MODEL_WATCH_INTERVAL) if MODEL_WATCH_DIR else None
+    if watcher is not None:
+        await watcher.start()
+    yield
+    if watcher is not None:
+        await watcher.stop()
+    await stop_batcher()
+    shutdown_plot_pool()
+    await audit_log.stop()
+    await async_db.close_async_pool()
+
+
 # Initialize the FastAPI app
 app = FastAPI(
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
+    lifespan=lifespan,
 )
 
+# Count and time every request per route
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers for different functionality
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(explain_router, prefix="/explain", tags=["explainability"])
@@ -29,3 +65,51 @@ async def root():
     Root endpoint to test if the API is running.
     """
     return {"message": "Welcome to the Secure Healthcare ML API!"}
+
+@app.get("/audit/stats")
+async def audit_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Report the audit log's queue depth and write, spool and drop counters.
+    """
+    return audit_log.stats()
+
+def collect_component_stats():
+    """
+    Export the stats kept by the auth caches, the audit log, the explanation
+    cache, the micro-batchers and the model registry as metric families.
+    """
+    registry_stats = registry.stats()
+    return [
+        *metrics.stats_families("auth", [({}, auth_cache_stats())]),
+        *metrics.stats_families("audit", [({}, audit_log.stats())]),
+        *metrics.stats_families("explanation_cache", [({}, explanation_cache.stats())]),
+        *metrics.stats_families("batching", [({"version": version}, batcher.stats())
+                                             for version, batcher in list(batchers.items())]),
+        *metrics.stats_families("model", [
+            ({"version": model["version"], "engine": model["engine"]},
+             {**model, "active": model["version"] == registry_stats["active_version"]})
+            for model in registry_stats["models"]
+        ]),
+    ]
+
+
+metrics.registry.register_collector("components", collect_component_stats)
+
+if metrics.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics(scraper: dict = Depends(get_metrics_scraper)):
+        """
+        Prometheus scrape endpoint, authenticated with METRICS_TOKEN or a user's
+        access token. Rendering reads component stats, so it runs off the event loop.
+        """
+        return PlainTextResponse(await run_in_threadpool(metrics.registry.render),
+                                 media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/model-status")
+async def model_status():
+    """
+    Readiness endpoint: reports the model as loaded once it has been warmed up.
+    """
+    if not registry.is_ready():
+        return JSONResponse(status_code=503, content={"model_status": "loading"})
+    return {"model_status": "loaded"}
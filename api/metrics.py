@@ -0,0 +1,338 @@
+# secure-healthcare-ml/api/metrics.py
+
+"""
+This module collects Prometheus-style metrics for the API: per-route request
+counts and latency histograms, requests in flight, and latency histograms for
+each stage of the request path (auth, preprocess, predict, explain, db).
+Statistics other components already keep, such as cache hit rates, batcher
+and audit queues and model load timings, are read through collectors only
+when /metrics is scraped. Metrics are rendered in the Prometheus text format.
+"""
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Record request and stage metrics and serve /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Prefix of every metric name
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "secure_healthcare_ml")
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A metric family produced by a collector: (name, type, help, [(labels, value), ...])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+# Stats keys that only ever increase, exported as counters named <key>_total
+_COUNTER_KEYS = ("hits", "misses", "evictions")
+_NAME_PATTERN = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """
+    A monotonically increasing value per label combination.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def get(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Gauge(Counter):
+    """
+    A value per label combination that can go up and down.
+    """
+
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """
+    Observation counts in fixed buckets, with their sum, per label combination.
+    Buckets are stored non-cumulatively, so an observation updates one slot.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Bucket counts (the last one is +Inf), then the sum of observations
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return sum(series[:-1]) if series is not None else 0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = []
+        for labels, series in snapshot:
+            label_dict = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels({**label_dict, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(label_dict)} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(label_dict)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics recorded on the request path, plus collectors called at scrape time.
+    """
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE):
+        self.namespace = namespace
+        self._metrics: List[Any] = []
+        self._collectors: List[Tuple[str, Callable[[], Iterable[Family]]]] = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(f"{self.namespace}_{name}", documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.namespace}_{name}", documentation, labelnames, buckets))
+
+    def register_collector(self, name: str, collect: Callable[[], Iterable[Family]]):
+        """
+        Register a function returning metric families, called on every scrape.
+        Family names are prefixed with the namespace.
+
+        Args:
+            name (str): Name used when reporting a failing collector.
+            collect (Callable): Function returning (name, type, help, samples) tuples.
+        """
+        self._collectors.append((name, collect))
+
+    def render(self) -> str:
+        """
+        Render every metric and collector in the Prometheus text exposition format.
+        A failing collector is reported in a gauge instead of failing the scrape.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+        failed = []
+        for collector_name, collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception:
+                failed.append(collector_name)
+                continue
+            for name, metric_type, documentation, samples in families:
+                name = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        name = f"{self.namespace}_collector_errors"
+        lines.append(f"# HELP {name} Collectors that failed during this scrape")
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(f'{name}{_format_labels({"collector": collector})} 1' for collector in failed)
+        return "\n".join(lines) + "\n"
+
+
+def stats_families(prefix: str, labelled_stats: Iterable[Tuple[Dict[str, str], Dict[str, Any]]]) -> List[Family]:
+    """
+    Convert components' stats dicts into metric families: numeric values become
+    gauges (counters for *_total keys, and for hit, miss and eviction keys, which
+    gain a _total suffix), nested dicts extend the metric name, and dicts keyed
+    by values rather than names (histograms) become one family labelled by key.
+    Strings, lists and None are skipped.
+
+    Args:
+        prefix (str): Metric name prefix, e.g. 'auth'.
+        labelled_stats (Iterable): (labels, stats) pairs, where stats is what a
+            component's stats() method returns; e.g. one pair per model version.
+
+    Returns:
+        families (list): (name, type, help, samples) tuples.
+    """
+    families: Dict[str, Family] = {}
+
+    def add(name: str, value: Any, sample_labels: Dict[str, str]):
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (int, float)):
+            return
+        name = _NAME_PATTERN.sub("_", name)
+        if name.rsplit("_", 1)[-1] in _COUNTER_KEYS:
+            # Counter families are named *_total, as Prometheus conventions expect
+            name += "_total"
+        if name not in families:
+            metric_type = "counter" if name.endswith("_total") else "gauge"
+            families[name] = (name, metric_type, name.replace("_", " "), [])
+        families[name][3].append((sample_labels, value))
+
+    def walk(name: str, value: Any, sample_labels: Dict[str, str]):
+        if not isinstance(value, dict):
+            add(name, value, sample_labels)
+        elif value and all(not str(key)[:1].isalpha() for key in value):
+            # Keyed by values, e.g. {1: 12, 2: 40} or {"0.001": 3}
+            for key, item in value.items():
+                walk(name, item, {**sample_labels, "key": str(key)})
+        else:
+            for key, item in value.items():
+                walk(f"{name}_{key}", item, sample_labels)
+
+    for labels, stats in labelled_stats:
+        walk(prefix, stats, labels)
+    return list(families.values())
+
+
+def route_template(scope) -> str:
+    """
+    Return the template of the route that served a request, e.g.
+    /predict/patient/{patient_id}, so raw paths never become labels.
+    """
+    path_format = getattr(scope.get("route"), "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    # Some FastAPI versions record routes of an included router without its prefix;
+    # recover the prefix from the part of the request path the route did not match
+    path = scope.get("path", "")
+    try:
+        matched = path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return path_format
+    if matched != path and path.endswith(matched):
+        return path[:len(path) - len(matched)] + path_format
+    return path_format
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per route template
+    (e.g. /predict/patient/{patient_id}), and tracking requests in flight.
+    """
+
+    def __init__(self, app, metrics: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.metrics = metrics or registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            route = route_template(scope)
+            request_latency.observe(time.perf_counter() - started, scope["method"], route)
+            requests_total.inc(scope["method"], route, str(status_code))
+
+
+class time_stage:
+    """
+    Context manager timing one stage of the request path, e.g.
+    ``with time_stage("predict"): ...``.
+    """
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if METRICS_ENABLED:
+            stage_latency.observe(time.perf_counter() - self.started, self.stage)
+
+
+# Process-wide metrics registry and the request path metrics
+registry = MetricsRegistry()
+requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by method, route and status code", ("method", "route", "status"))
+request_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route", ("method", "route"))
+requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served")
+stage_latency = registry.histogram(
+    "stage_duration_seconds", "Latency of request path stages: auth, preprocess, predict, explain, db", ("stage",))
@@ -3,38 +3,394 @@
 """
 This module handles the prediction of healthcare data using the trained
 machine learning model. It provides an endpoint for users to send input
-data and receive predictions.
+data and receive predictions, and batch endpoints for scoring many
+patients in a single request.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+import os
+import json
+import asyncio
+import hashlib
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import pandas as pd
-from typing import List
-from .auth import get_current_user
-from .models import Model
+import numpy as np
+from typing import Any, Dict, List, Optional, Set
+from db import async_db, db_utils
+from .audit import audit_log
+from .metrics import time_stage
+from .auth import get_current_admin_user, get_current_user
 from .schemas import PredictionRequest, PredictionResponse
-from .utils import load_model
+from .batching import MicroBatcher
+from .features import materialize_features, patient_rows_to_frame
+from .registry import MODEL_PATH, ModelEntry, registry, resolve_model
+from .utils import records_to_matrix, predict_matrix
+
+# Number of rows scored per model call on the batch endpoints
+BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", 1024))
+
+# Opt-in dynamic batching of concurrent single-row predictions
+MICROBATCH_ENABLED = os.getenv("PREDICT_MICROBATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+MICROBATCH_MAX_SIZE = int(os.getenv("PREDICT_MICROBATCH_MAX_SIZE", 64))
+MICROBATCH_WAIT_MS = float(os.getenv("PREDICT_MICROBATCH_WAIT_MS", 2.0))
 
 # Initialize router for prediction endpoints
 router = APIRouter()
 
-# Load the model for prediction
-model = load_model('model_v1.pkl')
+# Load the model for prediction, with the preprocessing fitted alongside it (shared with explanations)
+registry.load(MODEL_PATH, activate=True)
+
+# Micro-batchers coalescing single-row requests, one per model version so a
+# batch is never scored by a different version than its rows were prepared for
+batchers: Dict[str, MicroBatcher] = {}
+
+# Stops of retired versions' micro-batchers still scoring their last rows, awaited at shutdown
+_retiring: Set[asyncio.Task] = set()
+
+
+def get_batcher(entry: ModelEntry) -> Optional[MicroBatcher]:
+    """
+    Return the micro-batcher of a model version, or None when batching is disabled
+    or the version has been retired; requests still holding a retired entry are
+    scored directly instead.
+    """
+    if not MICROBATCH_ENABLED:
+        return None
+    batcher = batchers.get(entry.version)
+    if batcher is None:
+        if entry.version not in registry.versions:
+            return None
+        batcher = batchers[entry.version] = MicroBatcher(entry.predictor.predict, MICROBATCH_MAX_SIZE, MICROBATCH_WAIT_MS)
+    return batcher
+
+
+def _stop_retired_batcher(batcher: MicroBatcher):
+    task = asyncio.get_running_loop().create_task(batcher.stop())
+    _retiring.add(task)
+    task.add_done_callback(_retiring.discard)
+
+
+def retire_batcher(version: str):
+    """
+    Flush and stop the micro-batcher of a retired model version. Requests already
+    queued on it are still scored; the stop runs on the batcher's event loop,
+    whichever thread the version was retired from, and is awaited at shutdown.
+    """
+    batcher = batchers.pop(version, None)
+    if batcher is None or batcher.loop is None:
+        return  # The batcher never started
+    try:
+        batcher.loop.call_soon_threadsafe(_stop_retired_batcher, batcher)
+    except RuntimeError:
+        pass  # The event loop has already closed
+
+
+registry.retire_hooks.append(retire_batcher)
+
+
+class BatchPredictionRequest(BaseModel):
+    records: List[Dict[str, Any]]
+    return_probabilities: bool = False
+
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[Any]
+    probabilities: Optional[List[List[float]]] = None
+
+
+class PatientPredictionRequest(BaseModel):
+    patient_ids: List[int]
+    return_probabilities: bool = False
+
+
+class PatientPrediction(BaseModel):
+    patient_id: int
+    prediction: Any
+    probabilities: Optional[List[float]] = None
+
+
+class PatientPredictionResponse(BaseModel):
+    results: List[PatientPrediction]
+
 
 # Endpoint for model prediction
 @router.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest, current_user: dict = Depends(get_current_user)):
+async def predict(
+    request: PredictionRequest,
+    current_user: dict = Depends(get_current_user),
+    entry: ModelEntry = Depends(resolve_model),
+):
     """
     Provide a prediction from the trained model based on the given input features.
     """
-    # Preprocess the input data
-    input_data = pd.DataFrame([request.features])
-    
-    # Get model prediction
-    prediction = model.predict(input_data)
-    
-    if prediction is None:
-        raise HTTPException(status_code=400, detail="Prediction failed.")
-    
-    return PredictionResponse(prediction=prediction[0])
+    with audit_log.audited("/predict", current_user.username, entry.version, request.features) as call:
+        batcher = get_batcher(entry)
+        if batcher is not None:
+            # Coalesce with concurrent requests and score off the event loop
+            with time_stage("preprocess"):
+                row = entry.prepare(records_to_matrix([request.features], entry.feature_names(request.features)))[0]
+            with time_stage("predict"):
+                call.output = await batcher.submit(row)
+            return PredictionResponse(prediction=call.output)
+
+        # Validate and preprocess the input into a row in model order, without building a DataFrame
+        with time_stage("preprocess"):
+            input_data = entry.encode_row(request.features)
+
+        # Get model prediction
+        with time_stage("predict"):
+            prediction = entry.predictor.predict(input_data)
+
+        if prediction is None:
+            raise HTTPException(status_code=400, detail="Prediction failed.")
+
+        call.output = prediction[0]
+        return PredictionResponse(prediction=prediction[0])
+
+
+# Endpoint for inspecting the micro-batcher so the window can be tuned against p99
+@router.get("/batching/stats")
+async def batching_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Report queue depth, batch-size histogram and added latency of the micro-batcher
+    of the active model version, and of any other version with batched traffic.
+    """
+    if not MICROBATCH_ENABLED:
+        return {"enabled": False}
+    active = get_batcher(registry.get())
+    return {
+        "enabled": True,
+        **active.stats(),
+        "versions": {version: batcher.stats() for version, batcher in list(batchers.items())},
+    }
+
+
+# Endpoint for inspecting loaded model artifacts
+@router.get("/models")
+async def model_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Report the active model version and the load time, warm-up time and
+    resident size of every loaded artifact.
+    """
+    return registry.stats()
+
+
+# Endpoint for switching the served model version
+@router.post("/models/{version}/activate")
+async def activate_model_version(version: str, current_user: dict = Depends(get_current_admin_user)):
+    """
+    Make a loaded model version the one served by default.
+    """
+    try:
+        registry.activate(version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return {"active_version": registry.active_version}
 
+
+# Endpoint for reverting to the previously served model version
+@router.post("/models/rollback")
+async def rollback_model(current_user: dict = Depends(get_current_admin_user)):
+    """
+    Reactivate the model version that was served before the current one.
+    """
+    try:
+        registry.rollback()
+    except KeyError as e:
+        raise HTTPException(status_code=409, detail=str(e.args[0]))
+    return {"active_version": registry.active_version}
+
+
+async def start_batcher():
+    """
+    Start the micro-batcher worker of the active model, if batching is enabled.
+    """
+    batcher = get_batcher(registry.get())
+    if batcher is not None:
+        await batcher.start()
+
+
+async def stop_batcher():
+    """
+    Flush queued requests and stop the micro-batcher workers, including those
+    of retired versions still finishing.
+    """
+    for batcher in list(batchers.values()):
+        await batcher.stop()
+    if _retiring:
+        await asyncio.gather(*list(_retiring))
+
+
+# Endpoint for scoring many patients with one vectorized model call per chunk
+@router.post("/batch", response_model=BatchPredictionResponse)
+async def predict_batch(
+    request: BatchPredictionRequest,
+    current_user: dict = Depends(get_current_user),
+    entry: ModelEntry = Depends(resolve_model),
+):
+    """
+    Provide predictions for an array of feature records, returned in input order.
+    """
+    if not request.records:
+        return BatchPredictionResponse(predictions=[])
+
+    with audit_log.audited("/predict/batch", current_user.username, entry.version, request.records) as call:
+        # Assemble all records into one matrix in the model's column order
+        with time_stage("preprocess"):
+            feature_names = entry.feature_names(request.records[0])
+            matrix = entry.prepare(records_to_matrix(request.records, feature_names))
+
+        # Score off the event loop so other requests are not stalled
+        with time_stage("predict"):
+            predictions, probabilities = await run_in_threadpool(
+                predict_matrix, entry.predictor, matrix, BATCH_CHUNK_SIZE, request.return_probabilities
+            )
+
+        call.output = predictions
+        return BatchPredictionResponse(
+            predictions=predictions.tolist(),
+            probabilities=probabilities.tolist() if probabilities is not None else None,
+        )
+
+
+# Endpoint for scoring a streamed NDJSON body, one feature record per line
+@router.post("/batch/ndjson")
+async def predict_batch_ndjson(
+    request: Request,
+    return_probabilities: bool = False,
+    current_user: dict = Depends(get_current_user),
+    entry: ModelEntry = Depends(resolve_model),
+):
+    """
+    Score newline-delimited JSON feature records as the body is received, one
+    chunk at a time, and return one NDJSON result line per record in input order.
+    """
+    # The body is never held whole, so its audit hash is computed as it streams in
+    body_hash = hashlib.sha256()
+    results: List[str] = []
+    audited_predictions: list = []
+    records: List[dict] = []
+    feature_names = None
+
+    async def score(records: List[dict]):
+        with time_stage("preprocess"):
+            matrix = entry.prepare(records_to_matrix(records, feature_names))
+        with time_stage("predict"):
+            predictions, probabilities = await run_in_threadpool(
+                predict_matrix, entry.predictor, matrix, BATCH_CHUNK_SIZE, return_probabilities
+            )
+        chunk_predictions = predictions.tolist()
+        audited_predictions.extend(chunk_predictions)
+        for i, prediction in enumerate(chunk_predictions):
+            result = {"prediction": prediction}
+            if probabilities is not None:
+                result["probabilities"] = probabilities[i].tolist()
+            results.append(json.dumps(result))
+
+    def parse(line: bytes) -> dict:
+        try:
+            return json.loads(line)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid NDJSON record at line {len(results) + len(records) + 1}")
+
+    with audit_log.audited("/predict/batch/ndjson", current_user.username, entry.version,
+                           input_hash=body_hash) as call:
+        # Predictions of the chunks scored so far, also when a later line fails
+        call.output = audited_predictions
+
+        # Parse and score the body incrementally so only one chunk of records is held at a time
+        buffer = b""
+        async for body_chunk in request.stream():
+            body_hash.update(body_chunk)
+            buffer += body_chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                records.append(parse(line))
+                if feature_names is None:
+                    feature_names = entry.feature_names(records[0])
+                if len(records) >= BATCH_CHUNK_SIZE:
+                    await score(records)
+                    records = []
+        if buffer.strip():
+            records.append(parse(buffer))
+            if feature_names is None:
+                feature_names = entry.feature_names(records[0])
+        if records:
+            await score(records)
+
+        return Response(content="\n".join(results) + "\n" if results else "", media_type="application/x-ndjson")
+
+
+async def fetch_patient_rows(patient_ids: List[int]) -> list:
+    """
+    Fetch patient rows with a single query, through the async pool when it is
+    configured and the blocking pool in a worker thread otherwise.
+    """
+    with time_stage("db"):
+        if async_db.is_configured():
+            return await async_db.fetch_patients_data(patient_ids)
+        return await run_in_threadpool(db_utils.fetch_patients_data, patient_ids)
+
+
+async def score_patients(
+    entry: ModelEntry, patient_ids: List[int], return_probabilities: bool
+) -> List[PatientPrediction]:
+    """
+    Fetch patients, materialize their features and score them in one model pass.
+    """
+    rows = await fetch_patient_rows(patient_ids)
+    with time_stage("preprocess"):
+        frame = patient_rows_to_frame(rows, patient_ids)
+        matrix = entry.prepare(materialize_features(frame, entry.feature_names()))
+    with time_stage("predict"):
+        predictions, probabilities = await run_in_threadpool(
+            predict_matrix, entry.predictor, matrix, BATCH_CHUNK_SIZE, return_probabilities
+        )
+    return [
+        PatientPrediction(
+            patient_id=patient_id,
+            prediction=prediction,
+            probabilities=probabilities[i].tolist() if probabilities is not None else None,
+        )
+        for i, (patient_id, prediction) in enumerate(zip(patient_ids, predictions.tolist()))
+    ]
+
+
+# Endpoint for scoring a stored patient without the client assembling features
+@router.get("/patient/{patient_id}", response_model=PatientPrediction)
+async def predict_patient(
+    patient_id: int,
+    return_probabilities: bool = False,
+    current_user: dict = Depends(get_current_user),
+    entry: ModelEntry = Depends(resolve_model),
+):
+    """
+    Provide a prediction for a patient in the patients table.
+    """
+    with audit_log.audited("/predict/patient", current_user.username, entry.version,
+                           {"patient_ids": [patient_id]}) as call:
+        result = (await score_patients(entry, [patient_id], return_probabilities))[0]
+        call.output = result.prediction
+        return result
+
+
+# Endpoint for scoring many stored patients with one query and one model pass
+@router.post("/patients", response_model=PatientPredictionResponse)
+async def predict_patients(
+    request: PatientPredictionRequest,
+    current_user: dict = Depends(get_current_user),
+    entry: ModelEntry = Depends(resolve_model),
+):
+    """
+    Provide predictions for a list of patients in the patients table, in request order.
+    """
+    if not request.patient_ids:
+        return PatientPredictionResponse(results=[])
+    with audit_log.audited("/predict/patients", current_user.username, entry.version,
+                           {"patient_ids": request.patient_ids}) as call:
+        results = await score_patients(entry, request.patient_ids, request.return_probabilities)
+        call.output = [result.prediction for result in results]
+        return PatientPredictionResponse(results=results)
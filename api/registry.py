@@ -0,0 +1,414 @@
+# secure-healthcare-ml/api/registry.py
+
+"""
+This module keeps the loaded model artifacts of the API in one place, so
+each artifact is read once per process and shared by the prediction and
+explanation endpoints. Artifacts are loaded with their arrays
+memory-mapped and warmed up with a prediction before they are served, and
+new versions can be swapped in while the API keeps serving.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from fastapi import Header, HTTPException
+from explainability.registry import model_version_from_path
+from scripts.compile_model import compile_forest, compiled_path_for, load_compiled
+from .utils import (
+    Preprocessor, get_feature_names, load_model, load_preprocessor, record_to_row, requires_dataframe,
+)
+
+# Model artifact served by default
+MODEL_PATH = os.getenv("MODEL_PATH", "model_v1.pkl")
+
+# Directory watched for new model versions (watching is off when unset)
+MODEL_WATCH_DIR = os.getenv("MODEL_WATCH_DIR")
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", 5.0))
+
+# Number of most recently active versions kept loaded for rollback and pinning
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", 2))
+
+# Engine scoring predictions: "sklearn", or "compiled" for flattened forests
+# (see scripts/compile_model.py); models that cannot be compiled use sklearn
+PREDICT_ENGINES = ("sklearn", "compiled")
+PREDICT_ENGINE = os.getenv("PREDICT_ENGINE", "sklearn")
+
+logger = logging.getLogger(__name__)
+
+
+def resident_bytes() -> Optional[int]:
+    """
+    Return the resident set size of this process in bytes, where the platform exposes it.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class ModelEntry:
+    """
+    A loaded model artifact with its fitted preprocessing and load metrics.
+    Predictions are scored with `predictor`: the model itself, or its compiled
+    form; explanations always use the model.
+    """
+
+    def __init__(self, version: str, path: str, model: Any, preprocessor: Optional[Preprocessor]):
+        self.version = version
+        self.path = path
+        self.model = model
+        self.predictor = model
+        self.engine = "sklearn"
+        self.preprocessor = preprocessor
+        self.requires_dataframe = requires_dataframe(model)
+        self._rows = threading.local()
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.resident_bytes: Optional[int] = None
+        self.loaded_at = time.time()
+
+    def feature_names(self, sample_record: Optional[dict] = None) -> List[str]:
+        """
+        Return the raw feature order expected by the model: the fitted preprocessing
+        order when available, otherwise as inferred from the model or a sample record.
+        """
+        if self.preprocessor is not None:
+            return self.preprocessor.feature_names
+        return get_feature_names(self.model, sample_record)
+
+    def prepare(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Apply the fitted preprocessing to a raw feature matrix, if the model has one.
+        """
+        return self.preprocessor.transform(matrix) if self.preprocessor is not None else matrix
+
+    def encode_row(self, features: dict):
+        """
+        Validate a single request's features and convert them into a preprocessed
+        row of shape (1, n_features) in model order, without pandas.
+
+        The row is written into a buffer preallocated per thread and reused by
+        the next call on the same thread, so it must be scored before then; copy
+        it to keep it. Estimators that select columns by name get a DataFrame.
+
+        Args:
+            features (dict): The raw input features of the request.
+
+        Returns:
+            Union[np.ndarray, pd.DataFrame]: The row, ready for the predictor.
+        """
+        feature_names = self.feature_names(features)
+        row = getattr(self._rows, "row", None)
+        if row is None or row.shape[1] != len(feature_names):
+            row = self._rows.row = np.empty((1, len(feature_names)), dtype=np.float64)
+        record_to_row(features, feature_names, out=row)
+        if self.preprocessor is not None:
+            self.preprocessor.transform(row, out=row)
+        if self.requires_dataframe:
+            return pd.DataFrame(row.copy(), columns=feature_names)
+        return row
+
+    def warm_up(self):
+        """
+        Run one prediction so lazily initialized state and mapped pages are
+        in place before the first request.
+        """
+        n_features = len(self.preprocessor.feature_names) if self.preprocessor is not None \
+            else getattr(self.model, "n_features_in_", None)
+        if n_features is None:
+            return
+        started = time.perf_counter()
+        self.predictor.predict(self.prepare(np.zeros((1, n_features))))
+        self.warmup_seconds = time.perf_counter() - started
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        Summarize the artifact and its load metrics.
+        """
+        return {
+            "version": self.version,
+            "path": self.path,
+            "model": type(self.model).__name__,
+            "engine": self.engine,
+            "preprocessing": self.preprocessor is not None,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "resident_bytes": self.resident_bytes,
+            "loaded_at": self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """
+    Loaded model artifacts keyed by version, with one active version.
+    Loading is idempotent: a version already in the registry is not read again.
+    Activating a version is a single pointer swap, so requests that already
+    hold an entry finish on it undisturbed. The most recently active versions
+    are kept loaded for rollback and pinning; older ones are retired.
+    """
+
+    def __init__(self, mmap_mode: Optional[str] = "r", keep_versions: int = 2, engine: str = "sklearn"):
+        if engine not in PREDICT_ENGINES:
+            raise ValueError(f"Unknown prediction engine '{engine}'; expected one of {PREDICT_ENGINES}")
+        self.mmap_mode = mmap_mode
+        self.keep_versions = keep_versions
+        self.engine = engine
+        self._entries: Dict[str, ModelEntry] = {}
+        self._active: Optional[str] = None
+        self._history: List[str] = []
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+        # Called with each newly loaded entry before it can be activated, and
+        # with the version string of each retired entry
+        self.load_hooks: List[Callable[[ModelEntry], Any]] = []
+        self.retire_hooks: List[Callable[[str], Any]] = []
+
+    def load(self, model_path: str, activate: bool = False) -> ModelEntry:
+        """
+        Load a model artifact and its preprocessing, warm it up and register it.
+        Requests keep being served from the current entries while loading.
+
+        Args:
+            model_path (str): The file path to the model file.
+            activate (bool): Whether to make this version the one served by default.
+
+        Returns:
+            ModelEntry: The registered artifact.
+        """
+        version = model_version_from_path(model_path)
+        with self._load_lock:
+            entry = self._entries.get(version)
+            if entry is None:
+                resident_before = resident_bytes()
+                started = time.perf_counter()
+                entry = ModelEntry(version, model_path, load_model(model_path, self.mmap_mode),
+                                   load_preprocessor(model_path))
+                if self.engine == "compiled":
+                    self._compile(entry)
+                entry.load_seconds = time.perf_counter() - started
+                entry.warm_up()
+                resident_after = resident_bytes()
+                if resident_before is not None and resident_after is not None:
+                    entry.resident_bytes = max(0, resident_after - resident_before)
+                for hook in self.load_hooks:
+                    hook(entry)
+                with self._lock:
+                    self._entries[version] = entry
+        if activate or self._active is None:
+            self.activate(version)
+        return entry
+
+    def _compile(self, entry: ModelEntry):
+        """
+        Score an entry with its compiled forest: the one saved next to the
+        artifact (memory-mapped, so processes share it) or one compiled now.
+        """
+        compiled_path = compiled_path_for(entry.path)
+        try:
+            if os.path.isdir(compiled_path):
+                entry.predictor = load_compiled(compiled_path, self.mmap_mode)
+            else:
+                entry.predictor = compile_forest(entry.model)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Scoring model version '{entry.version}' with sklearn: {e}")
+            return
+        # Rows with missing values are scored by the model itself
+        entry.predictor.fallback = entry.model
+        entry.engine = f"compiled ({entry.predictor.engine})"
+
+    def get(self, version: Optional[str] = None) -> ModelEntry:
+        """
+        Return a registered version, or the active one when no version is given.
+        """
+        version = version or self._active
+        entry = self._entries.get(version) if version is not None else None
+        if entry is None:
+            raise KeyError(f"No model loaded for version '{version}'")
+        return entry
+
+    def activate(self, version: str):
+        """
+        Make a registered version the one served by default, retiring versions
+        beyond the most recent `keep_versions`.
+        """
+        with self._lock:
+            if version not in self._entries:
+                raise KeyError(f"No model loaded for version '{version}'")
+            self._active = version
+            if version in self._history:
+                self._history.remove(version)
+            self._history.append(version)
+        self._prune()
+
+    def rollback(self) -> str:
+        """
+        Reactivate the previously active version.
+
+        Returns:
+            str: The version now active.
+        """
+        with self._lock:
+            if len(self._history) < 2:
+                raise KeyError("No previous model version to roll back to")
+            self._history.pop()
+            self._active = self._history[-1]
+            version = self._active
+        self._prune()
+        return version
+
+    def remove(self, version: str):
+        """
+        Drop a registered version that is no longer active.
+        """
+        with self._lock:
+            if version == self._active:
+                raise ValueError(f"Cannot remove the active model version '{version}'")
+            removed = self._entries.pop(version, None)
+            if version in self._history:
+                self._history.remove(version)
+        if removed is not None:
+            for hook in self.retire_hooks:
+                hook(version)
+
+    def _prune(self):
+        with self._lock:
+            keep = set(self._history[-self.keep_versions:]) | {self._active}
+            retired = [version for version in self._entries if version not in keep]
+        for version in retired:
+            self.remove(version)
+
+    @property
+    def active_version(self) -> Optional[str]:
+        return self._active
+
+    @property
+    def versions(self) -> List[str]:
+        return list(self._entries)
+
+    def is_ready(self) -> bool:
+        """
+        Return True once an active model has been loaded and warmed up.
+        """
+        return self._active is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Describe the active version and every registered artifact.
+        """
+        return {
+            "active_version": self._active,
+            "history": list(self._history),
+            "models": [entry.describe() for entry in list(self._entries.values())],
+        }
+
+
+class ModelWatcher:
+    """
+    Polls a models directory and hot-swaps in new artifacts: each new file is
+    loaded and warmed up in a worker thread, then activated, in the order
+    the files were published. Publish a model
+    by writing it under a new version name and renaming it into the directory,
+    so the watcher never sees a partial file.
+    """
+
+    def __init__(self, registry: "ModelRegistry", models_dir: str, interval: float = 5.0):
+        self.registry = registry
+        self.models_dir = models_dir
+        self.interval = interval
+        self._seen: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def scan(self) -> Dict[str, float]:
+        """
+        Return the model artifacts in the directory and their modification times.
+        """
+        artifacts = {}
+        with os.scandir(self.models_dir) as entries:
+            for item in entries:
+                if item.is_file() and item.name.endswith(".pkl") and not item.name.endswith(".background.pkl"):
+                    artifacts[item.path] = item.stat().st_mtime
+        return artifacts
+
+    async def start(self):
+        """
+        Remember the artifacts already present and start polling for new ones.
+        """
+        if self._task is not None:
+            return
+        self._seen = self.scan()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop polling; a load in progress is abandoned.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def poll(self) -> Optional[str]:
+        """
+        Load and activate the artifacts that appeared since the last poll, oldest
+        first, so the newest ends up active and the others are kept for rollback
+        as far as `keep_versions` allows. An artifact that fails to load, e.g.
+        because it is still being written, is retried on the next poll.
+
+        Returns:
+            Optional[str]: The last newly activated version, if any.
+        """
+        artifacts = await asyncio.to_thread(self.scan)
+        new = [path for path, mtime in artifacts.items() if self._seen.get(path) != mtime]
+        # Forget deleted artifacts; new ones are only marked seen once handled
+        self._seen = {path: mtime for path, mtime in self._seen.items() if path in artifacts}
+        activated = None
+        for path in sorted(new, key=artifacts.get):
+            version = model_version_from_path(path)
+            if version in self.registry.versions:
+                logger.warning(f"Ignoring changed artifact {path}: version '{version}' is already loaded")
+                self._seen[path] = artifacts[path]
+                continue
+            try:
+                await asyncio.to_thread(self.registry.load, path)
+            except Exception as e:
+                logger.error(f"Loading model artifact {path} failed, retrying on the next poll: {e}")
+                continue
+            self._seen[path] = artifacts[path]
+            self.registry.activate(version)
+            logger.info(f"Activated model version '{version}' from {path}")
+            activated = version
+        return activated
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.poll()
+
+
+def resolve_model(x_model_version: Optional[str] = Header(None)) -> ModelEntry:
+    """
+    Dependency returning the model entry a request is served by: the version
+    pinned with the X-Model-Version header, or the active version.
+    """
+    try:
+        return registry.get(x_model_version)
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model version '{x_model_version}' is not loaded; available: {', '.join(registry.versions)}",
+        )
+
+
+# Process-wide registry shared by the prediction and explanation routers
+registry = ModelRegistry(keep_versions=MODEL_KEEP_VERSIONS, engine=PREDICT_ENGINE)
@@ -0,0 +1,40 @@
+# secure-healthcare-ml/api/schemas.py
+
+"""
+This module defines the request and response bodies of the API endpoints
+and the user and token records used for authentication.
+"""
+
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+
+class PredictionRequest(BaseModel):
+    features: Dict[str, Any]
+
+
+class PredictionResponse(BaseModel):
+    prediction: float
+    shap_values: Optional[Dict[str, float]] = None
+
+
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+
+
+class TokenData(BaseModel):
+    username: Optional[str] = None
+    is_admin: bool = False
+
+
+class User(BaseModel):
+    username: str
+    password: str
+    disabled: bool = False
+    is_admin: bool = False
@@ -5,54 +5,121 @@ This module contains utility functions for loading models, data preprocessing,
 and other common functions used throughout the API.
 """
 
-import pickle
+import os
+import base64
+import hashlib
+import hmac
+import operator
+import secrets
+import warnings
+import joblib
+import numpy as np
 import pandas as pd
-from typing import Any
-from sklearn.preprocessing import StandardScaler
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
 from fastapi import HTTPException
+from db import db_utils
+from scripts.preprocess import load_preprocessing, preprocessing_path_for
+from .schemas import User
 
+# Batch matrices are assembled in ``feature_names_in_`` order, so sklearn's
+# missing-feature-names warning on bare arrays is noise on every request.
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
 
-def load_model(model_path: str) -> Any:
+# PBKDF2 iterations of newly hashed passwords; stored hashes carry their own count
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 600000))
+
+
+def load_model(model_path: str, mmap_mode: Optional[str] = None) -> Any:
     """
-    Load a machine learning model from a pickle file.
+    Load a machine learning model saved with joblib (or a plain pickle).
     
     Args:
         model_path (str): The file path to the model file.
+        mmap_mode (str, optional): Memory-map the artifact's arrays (e.g. 'r')
+            instead of reading them into memory.
     
     Returns:
         Any: The loaded machine learning model.
     """
     try:
-        with open(model_path, "rb") as model_file:
-            model = pickle.load(model_file)
-        return model
+        return joblib.load(model_path, mmap_mode=mmap_mode)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Model loading failed: {str(e)}")
 
 
-def preprocess_data(input_data: dict) -> pd.DataFrame:
+class Preprocessor:
+    """
+    Serving-side imputation and scaling with the parameters fitted at training
+    time, compiled to plain NumPy arrays so applying them is one vectorized
+    affine operation per request.
+    """
+
+    def __init__(self, params: dict):
+        self.feature_names: List[str] = list(params["feature_names"])
+        self.impute_values = np.asarray(params["impute_values"], dtype=np.float64)
+        self.mean = np.asarray(params["mean"], dtype=np.float64)
+        self.inv_scale = 1.0 / np.asarray(params["scale"], dtype=np.float64)
+
+    def transform(self, matrix: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Impute missing values (NaN) and standardize a matrix in ``feature_names`` order.
+
+        Args:
+            matrix (np.ndarray): Raw features of shape (n_rows, n_features).
+            out (np.ndarray, optional): Float64 array of the same shape to write the
+                result into, which may be ``matrix`` itself; a new array by default.
+
+        Returns:
+            np.ndarray: The preprocessed features.
+        """
+        if out is None:
+            missing = np.isnan(matrix)
+            if missing.any():
+                matrix = np.where(missing, self.impute_values, matrix)
+            return (matrix - self.mean) * self.inv_scale
+        if out is not matrix:
+            np.copyto(out, matrix)
+        np.copyto(out, self.impute_values, where=np.isnan(out))
+        np.subtract(out, self.mean, out=out)
+        np.multiply(out, self.inv_scale, out=out)
+        return out
+
+
+def load_preprocessor(model_path: str) -> Optional[Preprocessor]:
+    """
+    Load the preprocessing parameters saved alongside a model artifact.
+
+    Args:
+        model_path (str): The file path to the model file.
+
+    Returns:
+        Optional[Preprocessor]: The fitted preprocessor, or None for models
+        shipped without preprocessing parameters.
+    """
+    path = preprocessing_path_for(model_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        return Preprocessor(load_preprocessing(path))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Preprocessing parameters loading failed: {str(e)}")
+
+
+def preprocess_data(input_data: dict, preprocessor: Optional[Preprocessor] = None) -> pd.DataFrame:
     """
     Preprocess input data to ensure it is in the correct format for the model.
     
     Args:
         input_data (dict): The raw input data from the user request.
+        preprocessor (Preprocessor, optional): Fitted preprocessing applied to the features.
     
     Returns:
         pd.DataFrame: The preprocessed data in the form of a DataFrame.
     """
-    try:
-        # Convert input data to DataFrame
-        data_df = pd.DataFrame([input_data])
-        
-        # Example preprocessing: scale the data using StandardScaler (if necessary)
-        scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(data_df)
-        
-        # Return the scaled DataFrame
-        return pd.DataFrame(scaled_data, columns=data_df.columns)
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Data preprocessing failed: {str(e)}")
+    if preprocessor is None:
+        return pd.DataFrame([input_data])
+    matrix = records_to_matrix([input_data], preprocessor.feature_names)
+    return pd.DataFrame(preprocessor.transform(matrix), columns=preprocessor.feature_names)
 
 
 def validate_input(input_data: dict, expected_columns: list) -> bool:
@@ -70,3 +137,215 @@ def validate_input(input_data: dict, expected_columns: list) -> bool:
     if missing_columns:
         raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing_columns)}")
     return True
+
+
+def record_to_row(record: dict, feature_names: List[str], out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Validate one raw input record and convert it into a float row in model column order.
+
+    This is the single-record counterpart of `records_to_matrix` with the checks
+    of `validate_input` folded in: missing features are reported together, null
+    values become NaN (imputed during preprocessing) and non-numeric values are
+    rejected, all without building a DataFrame.
+
+    Args:
+        record (dict): The raw input data from the user request.
+        feature_names (List[str]): The column order expected by the model.
+        out (np.ndarray, optional): Preallocated float64 array of shape
+            (1, n_features) to write into; a new array by default.
+
+    Returns:
+        np.ndarray: The row, of shape (1, n_features).
+    """
+    row = out if out is not None else np.empty((1, len(feature_names)), dtype=np.float64)
+    try:
+        values = [record[name] for name in feature_names]
+    except KeyError:
+        validate_input(record, feature_names)
+        raise
+    try:
+        row[0] = numeric_values(values)
+    except TypeError:
+        raise HTTPException(status_code=400, detail="Input contains non-numeric features")
+    return row
+
+
+# Types accepted as feature values; booleans are binary flags. numpy would also
+# convert numeric strings such as "1.5", so values are type-checked before they are assigned.
+NUMERIC_TYPES = frozenset((int, float, bool, np.int32, np.int64, np.float32, np.float64, np.bool_))
+
+
+def numeric_values(values: Sequence[Any]) -> Sequence[Any]:
+    """
+    Check that feature values are ints, floats or None, mapping None (a missing
+    feature, imputed during preprocessing) to NaN.
+
+    Args:
+        values (Sequence[Any]): The raw feature values of one record.
+
+    Returns:
+        Sequence[Any]: The values, ready to be assigned to a float row.
+
+    Raises:
+        TypeError: If any value is of another type, such as a string.
+    """
+    if all(type(value) in NUMERIC_TYPES for value in values):
+        return values
+    if any(value is not None and type(value) not in NUMERIC_TYPES for value in values):
+        raise TypeError("Feature values must be numbers or null")
+    return [np.nan if value is None else value for value in values]
+
+
+def requires_dataframe(model: Any) -> bool:
+    """
+    Return True for estimators that select input columns by name, such as a
+    ColumnTransformer or a Pipeline starting with one, and so must be given a
+    DataFrame rather than a bare matrix.
+    """
+    steps = [step for _, step in getattr(model, "steps", [])] or [model]
+    return hasattr(steps[0], "transformers_")
+
+
+def get_feature_names(model: Any, sample_record: Optional[dict] = None) -> List[str]:
+    """
+    Determine the column order the model expects its features in.
+
+    Models fitted on a DataFrame expose ``feature_names_in_``; for models fitted
+    on a bare matrix the key order of a sample record is used instead.
+
+    Args:
+        model (Any): The loaded machine learning model.
+        sample_record (dict, optional): A raw input record used as a fallback.
+
+    Returns:
+        List[str]: The ordered feature names.
+    """
+    feature_names = getattr(model, "feature_names_in_", None)
+    if feature_names is not None:
+        return list(feature_names)
+    if sample_record is None:
+        raise HTTPException(status_code=500, detail="Model does not expose its feature order.")
+    n_features = getattr(model, "n_features_in_", len(sample_record))
+    if len(sample_record) != n_features:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Expected {n_features} features, got {len(sample_record)}",
+        )
+    return list(sample_record)
+
+
+def records_to_matrix(records: Iterable[dict], feature_names: List[str]) -> np.ndarray:
+    """
+    Assemble raw input records into one contiguous float matrix in model column order.
+
+    Args:
+        records (Iterable[dict]): The raw feature records, one per patient.
+        feature_names (List[str]): The column order expected by the model.
+
+    Returns:
+        np.ndarray: A C-contiguous matrix of shape (n_records, n_features).
+    """
+    records = list(records)
+    matrix = np.empty((len(records), len(feature_names)), dtype=np.float64)
+    getter = operator.itemgetter(*feature_names)
+    single_feature = len(feature_names) == 1
+    for i, record in enumerate(records):
+        try:
+            values = getter(record)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=f"Record {i} is missing feature: {e.args[0]}")
+        try:
+            matrix[i] = numeric_values((values,) if single_feature else values)
+        except TypeError:
+            raise HTTPException(status_code=400, detail=f"Record {i} contains non-numeric features")
+    return matrix
+
+
+def predict_matrix(
+    model: Any, matrix: np.ndarray, chunk_size: int = 1024, with_probabilities: bool = False
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Score a feature matrix in fixed-size chunks, preserving input order.
+
+    When probabilities are requested, ``predict_proba`` is called once per chunk
+    and the class labels are derived from it rather than running ``predict`` as
+    well, so each chunk traverses the model only once.
+
+    Args:
+        model (Any): The loaded machine learning model.
+        matrix (np.ndarray): Feature matrix in model column order.
+        chunk_size (int): Maximum number of rows scored per model call.
+        with_probabilities (bool): Whether to also return class probabilities.
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: Predictions and, if requested,
+        class probabilities.
+    """
+    use_proba = with_probabilities and hasattr(model, "predict_proba") and hasattr(model, "classes_")
+    predictions, probabilities = [], []
+    for start in range(0, matrix.shape[0], chunk_size):
+        chunk = matrix[start:start + chunk_size]
+        if use_proba:
+            proba = model.predict_proba(chunk)
+            probabilities.append(proba)
+            predictions.append(model.classes_.take(np.argmax(proba, axis=1)))
+        else:
+            predictions.append(model.predict(chunk))
+    if not predictions:
+        return np.empty(0), (np.empty((0, 0)) if use_proba else None)
+    return np.concatenate(predictions), (np.vstack(probabilities) if use_proba else None)
+
+
+def hash_password(password: str, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
+    """
+    Hash a password with PBKDF2-HMAC-SHA256 and a random salt.
+
+    Args:
+        password (str): The plain-text password.
+        iterations (int): The PBKDF2 iteration count.
+
+    Returns:
+        str: 'pbkdf2_sha256$<iterations>$<salt>$<hash>', with base64 salt and hash.
+    """
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Check a password against a hash from `hash_password`, in constant time.
+
+    Args:
+        plain_password (str): The password the user supplied.
+        hashed_password (str): The stored hash.
+
+    Returns:
+        bool: True if the password matches; False for a wrong password or a malformed hash.
+    """
+    try:
+        algorithm, iterations, salt, digest = hashed_password.split("$")
+        if algorithm != "pbkdf2_sha256":
+            return False
+        expected = base64.b64decode(digest)
+        actual = hashlib.pbkdf2_hmac("sha256", plain_password.encode(), base64.b64decode(salt), int(iterations))
+    except (AttributeError, ValueError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def get_user_by_username(username: str) -> Optional[User]:
+    """
+    Fetch a user record from the users table.
+
+    Args:
+        username (str): The user's name.
+
+    Returns:
+        Optional[User]: The user, with the stored password hash, or None for unknown users.
+    """
+    row = db_utils.fetch_user(username)
+    if row is None:
+        return None
+    username, hashed_password, disabled, is_admin = row
+    return User(username=username, password=hashed_password, disabled=disabled, is_admin=is_admin)
@@ -0,0 +1,120 @@
+# secure-healthcare-ml/benchmarks/auth.py
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types
+import httpx
+import numpy as np
+from fastapi import Depends, FastAPI
+
+# Adding the path to the src folder (or where your modules are located)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from api import auth
+from api.auth import create_access_token, decode_access_token, get_current_user, oauth2_scheme
+
+def build_app():
+    """
+    Build an app with one route behind the previous, uncached auth dependency
+    (a synchronous full decode per request) and one behind `get_current_user`.
+
+    Returns:
+    - app (FastAPI): The benchmark app.
+    """
+    app = FastAPI()
+
+    def uncached_user(token: str = Depends(oauth2_scheme)):
+        return decode_access_token(token)
+
+    @app.get("/uncached")
+    async def uncached(user=Depends(uncached_user)):
+        return {"username": user.username}
+
+    @app.get("/cached")
+    async def cached(user=Depends(get_current_user)):
+        return {"username": user.username}
+
+    return app
+
+def measure_calls(tokens, repeats):
+    """
+    Measure the median cost of authenticating one token, uncached and cached.
+
+    Returns:
+    - results (dict): p50 microseconds per call, by path.
+    """
+    async def cached_calls():
+        timings = []
+        for i in range(repeats):
+            started = time.perf_counter()
+            await get_current_user(tokens[i % len(tokens)])
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    timings = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        decode_access_token(tokens[i % len(tokens)])
+        timings.append(time.perf_counter() - started)
+    results = {"call uncached": np.median(timings) * 1e6}
+
+    # The first pass over the tokens fills the cache
+    asyncio.run(cached_calls())
+    results["call cached"] = np.median(asyncio.run(cached_calls())) * 1e6
+    return results
+
+async def measure_requests(app, path, tokens, n_requests, concurrency):
+    """
+    Send authenticated requests to an in-process app from `concurrency` clients.
+
+    Returns:
+    - rate (float): Requests per second.
+    - p50_us, p99_us (float): Latency percentiles in microseconds.
+    """
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def worker(offset):
+            for i in range(offset, n_requests, concurrency):
+                headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        # One untimed request per token first, so the cached path is measured in its steady state
+        for token in tokens:
+            await client.get(path, headers={"Authorization": f"Bearer {token}"})
+        latencies.clear()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return n_requests / elapsed, np.percentile(latencies, 50) * 1e6, np.percentile(latencies, 99) * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cached against uncached token verification.")
+    parser.add_argument("--n-users", type=int, default=1000, help="Distinct tokens in the traffic")
+    parser.add_argument("--n-requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=20000, help="Calls timed per path")
+    args = parser.parse_args()
+
+    # Users are served from the auth user cache, so no users table is needed
+    user = types.SimpleNamespace(disabled=False, is_admin=False)
+    for i in range(args.n_users):
+        auth.user_cache.set(f"user{i}", user, time.time() + 365 * 24 * 3600)
+    tokens = [create_access_token({"sub": f"user{i}"}) for i in range(args.n_users)]
+    for name, p50_us in measure_calls(tokens, args.repeats).items():
+        print(f"{name:<20} p50 {p50_us:8.1f} us")
+
+    app = build_app()
+    for path in ("/uncached", "/cached"):
+        auth.token_cache.clear()
+        rate, p50_us, p99_us = asyncio.run(
+            measure_requests(app, path, tokens, args.n_requests, args.concurrency))
+        print(f"requests {path:<11} {rate:8.0f} req/s  p50 {p50_us:8.0f} us  p99 {p99_us:8.0f} us")
+    print(f"token cache: {auth.auth_cache_stats()['tokens']}")
@@ -0,0 +1,136 @@
+# secure-healthcare-ml/benchmarks/data.py
+
+import datetime
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Adding the path to the src folder (or where your modules are located)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from api.features import derive_features
+from db.db_utils import PATIENT_COLUMNS
+from scripts.preprocess import apply_preprocessing, fit_preprocessing, preprocessing_path_for, save_preprocessing
+from scripts.train import save_model, train_model
+
+# Coded values drawn for the synthetic patients: ICD-10 diagnoses, CPT procedures and
+# RxNorm medications, as they appear in FHIR Condition, Procedure and MedicationRequest resources
+DIAGNOSES = {
+    "E11.9": "Type 2 diabetes mellitus without complications",
+    "I10": "Essential (primary) hypertension",
+    "J45.909": "Unspecified asthma, uncomplicated",
+    "C34.90": "Malignant neoplasm of unspecified part of bronchus or lung",
+    "N18.3": "Chronic kidney disease, stage 3",
+    "F32.9": "Major depressive disorder, single episode, unspecified",
+}
+TREATMENTS = {
+    "99213": "Office visit, established patient",
+    "93000": "Electrocardiogram, routine",
+    "94010": "Spirometry",
+    "96413": "Chemotherapy administration, intravenous infusion",
+    "90837": "Psychotherapy, 60 minutes",
+}
+MEDICATIONS = {
+    "860975": "Metformin 500 MG Oral Tablet",
+    "314076": "Lisinopril 10 MG Oral Tablet",
+    "745679": "Albuterol 0.09 MG/ACTUAT Inhaler",
+    "1734919": "Osimertinib 80 MG Oral Tablet",
+    "310385": "Fluoxetine 20 MG Oral Capsule",
+}
+GENDERS = ("male", "female", "other", "unknown")
+
+# Diagnoses raising the synthetic risk target
+HIGH_RISK_DIAGNOSES = ("C34.90", "N18.3")
+
+# Reference date of the derived features, the latest visit date
+AS_OF = datetime.date(2024, 1, 1)
+
+def generate_patients(n_rows, seed=0, as_of=AS_OF):
+    """
+    Generate synthetic FHIR-shaped patient records: demographics from the Patient
+    resource and one coded diagnosis, procedure and medication per patient.
+
+    Args:
+    - n_rows (int): Number of patients.
+    - seed (int): Seed of the generator.
+    - as_of (datetime.date): Latest visit date.
+
+    Returns:
+    - patients (list): Tuples in PATIENT_COLUMNS order.
+    - target (np.ndarray): Synthetic binary risk label per patient.
+    """
+    rng = np.random.default_rng(seed)
+    ages = rng.uniform(18, 90, n_rows)
+    visit_offsets = rng.integers(0, 3 * 365, n_rows)
+    diagnoses = rng.choice(list(DIAGNOSES), n_rows)
+    treatments = rng.choice(list(TREATMENTS), n_rows)
+    medications = rng.choice(list(MEDICATIONS), n_rows)
+    genders = rng.choice(GENDERS, n_rows, p=[0.48, 0.48, 0.02, 0.02])
+
+    patients = []
+    for i in range(n_rows):
+        visit_date = as_of - datetime.timedelta(days=int(visit_offsets[i]))
+        dob = visit_date - datetime.timedelta(days=int(ages[i] * 365.25))
+        patients.append((
+            f"Given{i}", f"Family{i}", dob, genders[i], f"{i} Main Street, Springfield", f"555-{i % 10000:04d}",
+            f"patient{i}@example.org", diagnoses[i], DIAGNOSES[diagnoses[i]], treatments[i], TREATMENTS[treatments[i]],
+            medications[i], MEDICATIONS[medications[i]], visit_date,
+        ))
+
+    risk = (ages - 18) / 72 + np.isin(diagnoses, HIGH_RISK_DIAGNOSES) + rng.normal(scale=0.3, size=n_rows)
+    target = (risk > 0.9).astype(int)
+    return patients, target
+
+def patients_to_frame(patients, target=None):
+    """
+    Derive the model's numeric features from patient records, as the API does for stored patients.
+
+    Args:
+    - patients (list): Tuples in PATIENT_COLUMNS order.
+    - target (np.ndarray, optional): Labels added as the 'target' column.
+
+    Returns:
+    - df (pd.DataFrame): One row of features per patient.
+    """
+    records = pd.DataFrame.from_records(patients, columns=list(PATIENT_COLUMNS))
+    df = derive_features(records, as_of=pd.Timestamp(AS_OF)).reset_index(drop=True)
+    if target is not None:
+        df['target'] = target
+    return df
+
+def build_reference_model(model_dir, n_rows=20000, n_estimators=100, seed=0):
+    """
+    Train and save the reference model with its preprocessing parameters,
+    through the same functions as scripts/train.py.
+
+    Args:
+    - model_dir (str): Directory for the model artifact.
+    - n_rows (int): Number of synthetic patients.
+    - n_estimators (int): Number of trees.
+    - seed (int): Seed of the synthetic data.
+
+    Returns:
+    - reference (dict): The model path, training frame, preprocessing parameters,
+      fitted model, patient tuples and raw request records.
+    """
+    patients, target = generate_patients(n_rows, seed)
+    df = patients_to_frame(patients, target)
+    params = fit_preprocessing(df)
+    X = apply_preprocessing(df, params)
+    model = train_model(X, df['target'], n_estimators=n_estimators)
+
+    model_path = os.path.join(model_dir, "model_v1.pkl")
+    save_model(model, model_path)
+    save_preprocessing(params, preprocessing_path_for(model_path))
+    records = df[params['feature_names']].to_dict(orient="records")
+    return {
+        "model_path": model_path,
+        "frame": df,
+        "params": params,
+        "model": model,
+        "X": X,
+        "y": df['target'],
+        "patients": patients,
+        "records": records,
+    }
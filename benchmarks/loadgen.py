@@ -0,0 +1,445 @@
+# secure-healthcare-ml/benchmarks/loadgen.py
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import Counter, defaultdict
+import numpy as np
+
+# Adding the path to the src folder (or where your modules are located)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+# Endpoints a traffic mix can include: (method, path)
+ENDPOINTS = {
+    "predict": ("POST", "/predict/predict"),
+    "explain": ("POST", "/explain/explain"),
+    "batch": ("POST", "/predict/batch"),
+}
+DEFAULT_MIX = "predict=0.8,explain=0.1,batch=0.1"
+
+# Percentiles reported for every endpoint
+PERCENTILES = (50, 90, 99, 99.9, 99.99, 100)
+
+# Innermost frames of threads blocked waiting, left out of profiles unless idle stacks are requested;
+# executor workers wait for work inside C code, so their innermost Python frame is the worker loop
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+def parse_mix(spec):
+    """
+    Parse a traffic mix such as 'predict=0.8,explain=0.1,batch=0.1'.
+
+    Args:
+    - spec (str): Comma-separated endpoint=weight pairs.
+
+    Returns:
+    - mix (dict): Endpoint names and their shares of the traffic, summing to 1.
+    """
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in traffic mix; expected one of {tuple(ENDPOINTS)}")
+        mix[name] = float(weight) if weight else 1.0
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("The traffic mix needs at least one positive weight")
+    return {name: weight / total for name, weight in mix.items() if weight > 0}
+
+def load_records(path):
+    """
+    Load feature records from a JSON array or an NDJSON file.
+    """
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+def mint_tokens(n_users, prefix):
+    """
+    Mint one access token per simulated user with `create_access_token`.
+    The server must share the signing key and know the users.
+    """
+    from api.auth import create_access_token
+    return [create_access_token({"sub": f"{prefix}{i}"}) for i in range(n_users)]
+
+class RequestLog:
+    """
+    Outcomes of the requests sent during the measured part of a run.
+
+    Each request has two latencies: the service time, measured from when it
+    was actually sent, and the corrected latency, measured from when it was
+    scheduled to be sent. When the server (or the client's in-flight limit)
+    falls behind, requests leave late, and only the corrected latency shows
+    the wait users would have seen (coordinated omission).
+    """
+
+    def __init__(self, expected_interval=None):
+        self.expected_interval = expected_interval
+        self.corrected = defaultdict(list)
+        self.service = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        # When the last measured request finished, the end of the measured window
+        self.last_finished = None
+
+    def add(self, endpoint, scheduled, sent, finished, status):
+        """
+        Record one request; `scheduled` is None for closed-loop requests, which have no schedule.
+        """
+        self.statuses[endpoint][status] += 1
+        if self.last_finished is None or finished > self.last_finished:
+            self.last_finished = finished
+        service = finished - sent
+        corrected = finished - (scheduled if scheduled is not None else sent)
+        self.service[endpoint].append(service)
+        self.corrected[endpoint].append(corrected)
+        # Back-fill the requests a stalled closed-loop client would have sent meanwhile
+        if self.expected_interval and scheduled is None:
+            missed = corrected - self.expected_interval
+            while missed > 0:
+                self.corrected[endpoint].append(missed)
+                missed -= self.expected_interval
+
+    def summary(self, elapsed):
+        """
+        Summarize throughput, error rates and latency percentiles per endpoint and overall.
+
+        Args:
+        - elapsed (float): Seconds of the measured part of the run.
+
+        Returns:
+        - report (dict): Metrics keyed by endpoint, plus 'total'.
+        """
+        report = {}
+        groups = {name: [name] for name in self.statuses}
+        groups["total"] = list(self.statuses)
+        for group, names in groups.items():
+            statuses = sum((self.statuses[name] for name in names), Counter())
+            count = sum(statuses.values())
+            errors = sum(n for status, n in statuses.items() if not 200 <= status < 400)
+            service = np.concatenate([self.service[name] for name in names]) if count else np.zeros(1)
+            corrected = np.concatenate([self.corrected[name] for name in names]) if count else np.zeros(1)
+            report[group] = {
+                "requests": count,
+                "throughput_per_sec": count / elapsed,
+                "error_rate": errors / count if count else 0.0,
+                "statuses": {str(status): n for status, n in sorted(statuses.items())},
+                "latency_ms": {f"p{p:g}": float(np.percentile(corrected, p) * 1e3) for p in PERCENTILES},
+                "service_time_ms": {f"p{p:g}": float(np.percentile(service, p) * 1e3) for p in PERCENTILES},
+            }
+        return report
+
+    def all_corrected(self):
+        return np.concatenate([values for values in self.corrected.values()]) if self.corrected else np.zeros(0)
+
+def write_percentile_distribution(latencies, path, ticks_per_half=5):
+    """
+    Write latencies (in milliseconds) as an HdrHistogram percentile distribution,
+    the .hgrm text format accepted by HdrHistogram's plotting tools.
+
+    Args:
+    - latencies (np.ndarray): Latencies in seconds.
+    - path (str): Output file.
+    - ticks_per_half (int): Percentile steps per halving of the remaining distance to 100%.
+    """
+    values = np.sort(np.asarray(latencies) * 1e3)
+    n = len(values)
+    with open(path, "w") as f:
+        f.write(f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}\n\n")
+        step = 0
+        while True:
+            percentile = 1.0 - 0.5 ** (step / ticks_per_half)
+            if percentile * n >= n - 1:
+                break
+            index = int(percentile * (n - 1))
+            f.write(f"{values[index]:12.3f} {percentile:14.12f} {index + 1:10d} {1 / (1 - percentile):14.2f}\n")
+            step += 1
+        f.write(f"{values[-1]:12.3f} {1.0:14.12f} {n:10d}\n")
+        f.write(f"#[Mean    = {values.mean():12.3f}, StdDeviation   = {values.std():12.3f}]\n")
+        f.write(f"#[Max     = {values[-1]:12.3f}, Total count    = {n:12d}]\n")
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every other thread in this process at a fixed
+    interval and counts them as collapsed stacks ('thread;outer;...;inner count'),
+    the input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005, include_idle=False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                code = frame.f_code
+                if thread_id == own_id or (
+                        not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+@contextlib.contextmanager
+def profile_server(pid, path, duration, rate=200):
+    """
+    Record the stacks of a running server process with py-spy, as collapsed stacks.
+    """
+    if shutil.which("py-spy") is None:
+        raise RuntimeError("Profiling a server process requires py-spy on the PATH")
+    recorder = subprocess.Popen([
+        "py-spy", "record", "--pid", str(pid), "--format", "raw", "--output", path,
+        "--rate", str(rate), "--duration", str(int(np.ceil(duration)) + 1), "--nonblocking",
+    ])
+    try:
+        yield
+    finally:
+        recorder.wait(timeout=duration + 60)
+
+class TrafficGenerator:
+    """
+    Replays a traffic mix against the API, either open-loop at a target rate
+    (requests are scheduled up front and sent on time whether or not earlier
+    ones finished) or closed-loop with a fixed number of concurrent clients.
+    """
+
+    def __init__(self, client, tokens, records, mix, batch_size=64, seed=0):
+        self.client = client
+        self.tokens = tokens
+        self.records = records
+        self.names = list(mix)
+        self.weights = np.array([mix[name] for name in self.names])
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+
+    def next_request(self):
+        """
+        Draw the endpoint, token and payload of the next request.
+        """
+        name = self.names[self.rng.choice(len(self.names), p=self.weights)]
+        token = self.tokens[self.rng.integers(len(self.tokens))]
+        if name == "batch":
+            start = int(self.rng.integers(len(self.records)))
+            payload = {"records": [self.records[(start + i) % len(self.records)] for i in range(self.batch_size)]}
+        else:
+            payload = {"features": self.records[self.rng.integers(len(self.records))]}
+        return name, token, payload
+
+    async def send(self, log, name, token, payload, scheduled, measured):
+        method, path = ENDPOINTS[name]
+        sent = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, json=payload, headers={"Authorization": f"Bearer {token}"})
+            status = response.status_code
+        except Exception:
+            status = 0  # Transport error: no response
+        if measured:
+            log.add(name, scheduled, sent, time.perf_counter(), status)
+
+    async def open_loop(self, log, rps, duration, warmup=0.0, max_in_flight=1024, poisson=False):
+        """
+        Send requests at `rps` per second on a precomputed schedule. Requests
+        beyond `max_in_flight` wait for a slot, and that wait counts in their latency.
+        """
+        slots = asyncio.Semaphore(max_in_flight)
+        tasks = []
+        start = time.perf_counter()
+        measure_from = start + warmup
+        scheduled = start
+
+        async def send_when_free(name, token, payload, at):
+            async with slots:
+                await self.send(log, name, token, payload, at, at >= measure_from)
+
+        while scheduled < measure_from + duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send_when_free(*self.next_request(), scheduled)))
+            scheduled += self.rng.exponential(1.0 / rps) if poisson else 1.0 / rps
+        await asyncio.gather(*tasks)
+        return measure_from
+
+    async def closed_loop(self, log, concurrency, duration, warmup=0.0):
+        """
+        Run `concurrency` clients that each send their next request as soon as
+        the previous one completes.
+        """
+        start = time.perf_counter()
+        measure_from = start + warmup
+        deadline = measure_from + duration
+
+        async def client_loop():
+            while time.perf_counter() < deadline:
+                await self.send(log, *self.next_request(), None, time.perf_counter() >= measure_from)
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        return measure_from
+
+@contextlib.asynccontextmanager
+async def in_process_client(n_users, prefix):
+    """
+    Serve the app from api/main.py in this process, running its lifespan,
+    with the simulated users registered in the auth user cache.
+    """
+    import httpx
+    from api import auth
+    from api.main import app
+    user = types.SimpleNamespace(disabled=False, is_admin=False)
+    for i in range(n_users):
+        auth.user_cache.set(f"{prefix}{i}", user, time.time() + 365 * 24 * 3600)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=60) as client:
+            yield client
+
+async def run(args, records, mix):
+    """
+    Run the load against the configured target and return the request log and measured seconds.
+    """
+    import httpx
+    log = RequestLog(args.expected_interval_ms / 1000.0 if args.expected_interval_ms else None)
+    if args.url:
+        limits = httpx.Limits(max_connections=args.max_in_flight if args.rps else args.concurrency)
+        client_context = httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits)
+    else:
+        client_context = in_process_client(args.users, args.user_prefix)
+
+    async with client_context as client:
+        generator = TrafficGenerator(client, mint_tokens(args.users, args.user_prefix), records, mix,
+                                     args.batch_size, args.seed)
+        if args.rps:
+            measure_from = await generator.open_loop(log, args.rps, args.duration, args.warmup,
+                                                     args.max_in_flight, args.arrival == "poisson")
+        else:
+            measure_from = await generator.closed_loop(log, args.concurrency, args.duration, args.warmup)
+        # End the window at the last measured response, before the client and the
+        # in-process app shut down
+        measure_until = log.last_finished if log.last_finished is not None else time.perf_counter()
+    return log, measure_until - measure_from
+
+def print_report(report):
+    header = "".join(f"{f'p{p:g}':>10}" for p in PERCENTILES)
+    print(f"{'endpoint':<10} {'requests':>9} {'req/s':>9} {'errors':>8} {'latency (ms)':<14}{header}")
+    for name, metrics in report.items():
+        for kind, label in (("latency_ms", "corrected"), ("service_time_ms", "service")):
+            values = "".join(f"{value:10.2f}" for value in metrics[kind].values())
+            if kind == "latency_ms":
+                print(f"{name:<10} {metrics['requests']:>9} {metrics['throughput_per_sec']:>9.1f} "
+                      f"{metrics['error_rate']:>8.2%} {label:<14}{values}")
+            else:
+                print(f"{'':<10} {'':>9} {'':>9} {'':>8} {label:<14}{values}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a traffic mix against the API and report latency.")
+    parser.add_argument("--url", help="Base URL of a running server; without it the app runs in this process")
+    parser.add_argument("--model-path", help="Model served in-process (default: MODEL_PATH, else a synthetic "
+                                             "reference model trained by benchmarks/data.py)")
+    parser.add_argument("--records", help="JSON array or NDJSON file of feature records (default: synthetic)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Traffic mix, e.g. 'predict=0.8,explain=0.1,batch=0.1'")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rps", type=float, help="Open-loop target request rate")
+    load.add_argument("--concurrency", type=int, default=16, help="Closed-loop concurrent clients")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="constant",
+                        help="Spacing of open-loop requests")
+    parser.add_argument("--max-in-flight", type=int, default=1024, help="Open-loop limit on outstanding requests")
+    parser.add_argument("--expected-interval-ms", type=float,
+                        help="Closed-loop: interval each client is expected to keep, for coordinated-omission correction")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before the measurement")
+    parser.add_argument("--users", type=int, default=100, help="Simulated users, one token each")
+    parser.add_argument("--user-prefix", default="loadgen")
+    parser.add_argument("--batch-size", type=int, default=64, help="Records per batch request")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--histogram-out", help="Write the corrected latency distribution in HdrHistogram .hgrm format")
+    parser.add_argument("--profile", help="Write collapsed stacks sampled during the run to this path")
+    parser.add_argument("--profile-pid", type=int, help="Server process to profile with py-spy (with --url)")
+    parser.add_argument("--profile-interval-ms", type=float, default=5.0)
+    parser.add_argument("--profile-idle", action="store_true", help="Keep the stacks of threads blocked waiting")
+    args = parser.parse_args()
+    if args.profile and args.url and not args.profile_pid:
+        parser.error("--profile with --url needs --profile-pid of the server process")
+
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory() as work_dir:
+        records = load_records(args.records) if args.records else None
+        if not args.url:
+            # api.main loads MODEL_PATH on import, so the model must exist before the app is imported
+            model_path = args.model_path or os.environ.get("MODEL_PATH")
+            if model_path:
+                os.environ["MODEL_PATH"] = model_path
+            else:
+                from benchmarks.data import build_reference_model
+                with contextlib.redirect_stdout(sys.stderr):
+                    reference = build_reference_model(work_dir, n_estimators=100, seed=args.seed)
+                os.environ["MODEL_PATH"] = reference["model_path"]
+                records = records or reference["records"]
+            os.environ.setdefault("AUDIT_SPOOL_PATH", os.path.join(work_dir, "audit_spool.ndjson"))
+        if records is None:
+            from benchmarks.data import generate_patients, patients_to_frame
+            records = patients_to_frame(generate_patients(10000, args.seed)[0]).to_dict(orient="records")
+
+        profiler = None
+        with contextlib.ExitStack() as stack:
+            if args.profile and args.url:
+                stack.enter_context(profile_server(args.profile_pid, args.profile, args.warmup + args.duration,
+                                                   rate=int(1000 / args.profile_interval_ms)))
+            elif args.profile:
+                profiler = SamplingProfiler(args.profile_interval_ms / 1000.0, args.profile_idle)
+                profiler.start()
+            try:
+                log, elapsed = asyncio.run(run(args, records, mix))
+            finally:
+                if profiler is not None:
+                    profiler.stop()
+
+    report = log.summary(elapsed)
+    print_report(report)
+    if profiler is not None:
+        profiler.write(args.profile)
+        print(f"{profiler.samples} stack samples written to {args.profile}.")
+    if args.histogram_out:
+        write_percentile_distribution(log.all_corrected(), args.histogram_out)
+        print(f"Latency distribution written to {args.histogram_out}.")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": {key: value for key, value in vars(args).items()}, "report": report}, f, indent=2)
+        print(f"Report saved to {args.output}.")
@@ -0,0 +1,122 @@
+# secure-healthcare-ml/benchmarks/request_path.py
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+# Adding the path to the src folder (or where your modules are located)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from api.registry import ModelRegistry
+from api.utils import preprocess_data
+from scripts.preprocess import fit_preprocessing, preprocessing_path_for, save_preprocessing
+
+# The DataFrame path scores a model fitted on arrays with named columns, which sklearn warns about on every call
+warnings.filterwarnings("ignore", message="X has feature names", category=UserWarning)
+
+def build_model(model_dir, n_features=20, n_estimators=100, n_rows=5000, seed=0):
+    """
+    Train and save a forest with preprocessing parameters on synthetic data.
+
+    Args:
+    - model_dir (str): Directory for the model artifact.
+    - n_features (int): Number of numeric features.
+    - n_estimators (int): Number of trees.
+    - n_rows (int): Number of training rows.
+    - seed (int): Seed of the synthetic data.
+
+    Returns:
+    - model_path (str): Path of the saved model.
+    - record (dict): A raw request record.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n_rows, n_features)), columns=[f"feature_{i}" for i in range(n_features)])
+    df['target'] = (df.iloc[:, 0] + df.iloc[:, 1] > 0).astype(int)
+    params = fit_preprocessing(df)
+    X = (df[params['feature_names']].to_numpy() - params['mean']) / params['scale']
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=seed).fit(X, df['target'])
+
+    model_path = os.path.join(model_dir, "model_v1.pkl")
+    joblib.dump(model, model_path)
+    save_preprocessing(params, preprocessing_path_for(model_path))
+    record = {name: float(value) for name, value in zip(params['feature_names'], df.iloc[0])}
+    record[params['feature_names'][1]] = None
+    return model_path, record
+
+def measure(fn, repeats):
+    """
+    Measure a callable's median latency and the median peak memory it allocates per call.
+
+    Args:
+    - fn (callable): The request path to measure, called without arguments.
+    - repeats (int): Number of calls timed and traced.
+
+    Returns:
+    - p50_us (float): Median latency in microseconds.
+    - alloc_bytes (int): Median peak bytes allocated per call.
+    """
+    for _ in range(10):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(repeats):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return float(np.median(timings) * 1e6), int(np.median(peaks))
+
+def run(model_path, record, repeats=500):
+    """
+    Compare the single-row request path through pandas (before) with the
+    preallocated-row path (after), for input conversion alone and end to end
+    with the sklearn and compiled engines.
+
+    Returns:
+    - results (list): (path, p50 microseconds, bytes allocated per request) tuples.
+    """
+    sklearn_entry = ModelRegistry(engine="sklearn").load(model_path)
+    compiled_entry = ModelRegistry(engine="compiled").load(model_path)
+    paths = {
+        "convert: DataFrame": lambda: preprocess_data(record, sklearn_entry.preprocessor),
+        "convert: preallocated row": lambda: sklearn_entry.encode_row(record),
+        "predict sklearn: DataFrame": lambda: sklearn_entry.model.predict(
+            preprocess_data(record, sklearn_entry.preprocessor)),
+        "predict sklearn: preallocated row": lambda: sklearn_entry.predictor.predict(
+            sklearn_entry.encode_row(record)),
+        f"predict {compiled_entry.engine}: DataFrame": lambda: compiled_entry.predictor.predict(
+            preprocess_data(record, compiled_entry.preprocessor)),
+        f"predict {compiled_entry.engine}: preallocated row": lambda: compiled_entry.predictor.predict(
+            compiled_entry.encode_row(record)),
+    }
+    return [(name, *measure(fn, repeats)) for name, fn in paths.items()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the single-row prediction request path.")
+    parser.add_argument("--n-features", type=int, default=20)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        model_path, record = build_model(model_dir, args.n_features, args.n_estimators)
+        results = run(model_path, record, args.repeats)
+
+    print(f"{'path':<48} {'p50 (us)':>10} {'alloc (bytes)':>14}")
+    for name, p50_us, alloc_bytes in results:
+        print(f"{name:<48} {p50_us:>10.1f} {alloc_bytes:>14}")
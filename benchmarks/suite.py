@@ -0,0 +1,450 @@
+# secure-healthcare-ml/benchmarks/suite.py
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import numpy as np
+
+# Adding the path to the src folder (or where your modules are located)
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(REPO_ROOT)
+
+from benchmarks.data import build_reference_model
+
+# Benchmarks in the order they run; 'server' and 'db' are skipped when uvicorn or a database is unavailable
+BENCHMARK_NAMES = ("preprocess", "train", "predict", "explain", "request_path", "auth", "server", "db")
+
+# Relative change of a metric beyond which the comparison reports a regression
+DEFAULT_THRESHOLD = 0.10
+
+# Metrics where larger is better end with one of these; for every other metric smaller is better
+HIGHER_IS_BETTER = ("_per_sec",)
+
+# Username of the token minted for authenticated requests
+BENCHMARK_USER = "benchmark"
+
+RESULTS_FORMAT_VERSION = 1
+
+class SkipBenchmark(Exception):
+    """
+    Raised by a benchmark that cannot run in this environment.
+    """
+
+def latency_metrics(prefix, latencies, elapsed, items=None, unit="requests"):
+    """
+    Summarize measured latencies as p50/p99 milliseconds and a throughput.
+
+    Args:
+    - prefix (str): Prefix of the metric names, e.g. 'single'.
+    - latencies (list): Seconds per call.
+    - elapsed (float): Wall-clock seconds of the whole run.
+    - items (int, optional): Items processed in the run; defaults to the number of calls.
+    - unit (str): Name of the items in the throughput metric.
+
+    Returns:
+    - metrics (dict): '<prefix>_p50_ms', '<prefix>_p99_ms' and '<prefix>_<unit>_per_sec'.
+    """
+    return {
+        f"{prefix}_p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        f"{prefix}_p99_ms": float(np.percentile(latencies, 99) * 1e3),
+        f"{prefix}_{unit}_per_sec": (items if items is not None else len(latencies)) / elapsed,
+    }
+
+def register_benchmark_user():
+    """
+    Put the benchmark user in the auth user cache, so authenticated requests
+    exercise token verification without a users table.
+
+    Returns:
+    - headers (dict): Authorization header with a freshly minted token.
+    """
+    from api import auth
+    user = types.SimpleNamespace(username=BENCHMARK_USER, disabled=False, is_admin=False)
+    auth.user_cache.set(BENCHMARK_USER, user, time.time() + 365 * 24 * 3600)
+    return {"Authorization": f"Bearer {auth.create_access_token({'sub': BENCHMARK_USER})}"}
+
+def timed_requests(client, method, path, payloads, headers):
+    """
+    Send one request per payload through a TestClient and time each of them.
+
+    Returns:
+    - latencies (list): Seconds per request.
+    - elapsed (float): Wall-clock seconds of the run.
+    """
+    latencies = []
+    started = time.perf_counter()
+    for payload in payloads:
+        request_started = time.perf_counter()
+        response = client.request(method, path, json=payload, headers=headers)
+        latencies.append(time.perf_counter() - request_started)
+        response.raise_for_status()
+    return latencies, time.perf_counter() - started
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silence the progress output the training and preprocessing functions print.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def bench_preprocess(ctx):
+    """
+    Rows per second of applying fitted preprocessing to the training frame.
+    """
+    from scripts.preprocess import preprocess_data
+    frame, params = ctx["reference"]["frame"], ctx["reference"]["params"]
+    timings = []
+    for _ in range(ctx["args"].repeats):
+        started = time.perf_counter()
+        preprocess_data(frame, params)
+        timings.append(time.perf_counter() - started)
+    return {"rows_per_sec": len(frame) / float(np.median(timings)), "p50_ms": float(np.median(timings) * 1e3)}
+
+def bench_train(ctx):
+    """
+    Fit time of the reference random forest on the synthetic training set.
+    """
+    from scripts.train import train_model
+    reference, args = ctx["reference"], ctx["args"]
+    timings = []
+    for _ in range(args.train_repeats):
+        started = time.perf_counter()
+        with quiet():
+            train_model(reference["X"], reference["y"], n_estimators=args.n_estimators)
+        timings.append(time.perf_counter() - started)
+    fit_seconds = float(np.median(timings))
+    return {"fit_seconds": fit_seconds, "rows_per_sec": len(reference["X"]) / fit_seconds}
+
+def bench_predict(ctx):
+    """
+    Latency and throughput of /predict for single records and of /predict/batch.
+    """
+    client, headers, records, args = ctx["client"], ctx["headers"], ctx["reference"]["records"], ctx["args"]
+    singles = [{"features": records[i % len(records)]} for i in range(args.requests)]
+    latencies, elapsed = timed_requests(client, "POST", "/predict/predict", singles, headers)
+    metrics = latency_metrics("single", latencies, elapsed)
+
+    n_batches = max(args.requests // 10, 10)
+    batches = [
+        {"records": [records[(i * args.batch_size + j) % len(records)] for j in range(args.batch_size)]}
+        for i in range(n_batches)
+    ]
+    latencies, elapsed = timed_requests(client, "POST", "/predict/batch", batches, headers)
+    metrics.update(latency_metrics("batch", latencies, elapsed, items=n_batches * args.batch_size, unit="rows"))
+    return metrics
+
+def bench_explain(ctx):
+    """
+    Latency of /explain/explain for records not yet explained, then for cached ones.
+    """
+    client, headers, records, args = ctx["client"], ctx["headers"], ctx["reference"]["records"], ctx["args"]
+    # Start past the records /predict used, so uncached explanations are measured even with a shared cache
+    payloads = [{"features": record} for record in records[-args.explain_requests:]]
+    latencies, elapsed = timed_requests(client, "POST", "/explain/explain", payloads, headers)
+    metrics = latency_metrics("uncached", latencies, elapsed)
+    latencies, elapsed = timed_requests(client, "POST", "/explain/explain", payloads, headers)
+    metrics.update(latency_metrics("cached", latencies, elapsed))
+    return metrics
+
+def bench_request_path(ctx):
+    """
+    Single-row input conversion and prediction, per engine (benchmarks/request_path.py).
+    """
+    from benchmarks.request_path import run
+    metrics = {}
+    for name, p50_us, alloc_bytes in run(ctx["reference"]["model_path"], ctx["reference"]["records"][0],
+                                         ctx["args"].repeats * 20):
+        slug = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+        metrics[f"{slug}_p50_us"] = p50_us
+        metrics[f"{slug}_alloc_bytes"] = alloc_bytes
+    return metrics
+
+def bench_auth(ctx):
+    """
+    Cost of authenticating one token, uncached and cached (benchmarks/auth.py).
+    """
+    from api import auth
+    from benchmarks.auth import measure_calls
+    user = types.SimpleNamespace(username=BENCHMARK_USER, disabled=False)
+    tokens = []
+    for i in range(100):
+        auth.user_cache.set(f"{BENCHMARK_USER}{i}", user, time.time() + 3600)
+        tokens.append(auth.create_access_token({"sub": f"{BENCHMARK_USER}{i}"}))
+    results = measure_calls(tokens, ctx["args"].repeats * 100)
+    return {f"{name.replace(' ', '_')}_us": p50_us for name, p50_us in results.items()}
+
+async def drive_server(base_url, headers, payloads, path, concurrency):
+    """
+    Send payloads to a running server from `concurrency` concurrent clients.
+
+    Returns:
+    - latencies (list): Seconds per request.
+    - elapsed (float): Wall-clock seconds of the run.
+    """
+    import httpx
+    latencies = []
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60) as client:
+        async def worker(offset):
+            for payload in payloads[offset::concurrency]:
+                started = time.perf_counter()
+                response = await client.post(path, json=payload)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        # Warm up the connections before timing
+        await asyncio.gather(*(client.post(path, json=payloads[0]) for _ in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        return latencies, time.perf_counter() - started
+
+def serve(port):
+    """
+    Run the API under uvicorn with the benchmark user registered; started by `bench_server`.
+    """
+    import uvicorn
+    from api.main import app
+    register_benchmark_user()
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+def bench_server(ctx):
+    """
+    Latency and throughput of /predict and /predict/batch served by a real uvicorn process.
+    """
+    if importlib.util.find_spec("uvicorn") is None:
+        raise SkipBenchmark("uvicorn is not installed")
+    import httpx
+    args, records = ctx["args"], ctx["reference"]["records"]
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(args.port)],
+        env={**os.environ, "PYTHONPATH": REPO_ROOT}, cwd=ctx["work_dir"],
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{base_url}/model-status", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None or time.monotonic() > deadline:
+                raise SkipBenchmark("the uvicorn server did not start")
+            time.sleep(0.2)
+
+        from api.auth import create_access_token
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': BENCHMARK_USER})}"}
+        singles = [{"features": records[i % len(records)]} for i in range(args.requests * 4)]
+        latencies, elapsed = asyncio.run(drive_server(base_url, headers, singles, "/predict/predict", args.concurrency))
+        metrics = latency_metrics("single", latencies, elapsed)
+        batches = [{"records": records[i:i + args.batch_size]}
+                   for i in range(0, min(len(records), args.requests * args.batch_size), args.batch_size)]
+        latencies, elapsed = asyncio.run(drive_server(base_url, headers, batches, "/predict/batch", args.concurrency))
+        metrics.update(latency_metrics("batch", latencies, elapsed,
+                                       items=sum(len(batch["records"]) for batch in batches), unit="rows"))
+        return metrics
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def bench_db(ctx):
+    """
+    Insert and query rates of db_utils against the configured (local) database.
+    The synthetic patients are deleted again afterwards.
+    """
+    from db import db_utils
+    if not db_utils.DB_HOST:
+        raise SkipBenchmark("no database configured (set DB_HOST, DB_NAME, DB_USER and DB_PASSWORD)")
+    patients, args = ctx["reference"]["patients"], ctx["args"]
+    db_utils.create_table()
+    first_id = db_utils.execute_query("SELECT COALESCE(MAX(patient_id), 0) FROM patients;")[0][0] + 1
+    try:
+        inserted = db_utils.bulk_insert_patients(patients, batch_size=10000)
+        patient_ids = list(range(first_id, first_id + inserted["rows"]))
+        rng = np.random.default_rng(0)
+
+        lookups = rng.choice(patient_ids, size=args.requests)
+        latencies = []
+        started = time.perf_counter()
+        for patient_id in lookups:
+            query_started = time.perf_counter()
+            db_utils.fetch_patient_data(int(patient_id))
+            latencies.append(time.perf_counter() - query_started)
+        metrics = latency_metrics("fetch_one", latencies, time.perf_counter() - started, unit="queries")
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(max(args.requests // 10, 10)):
+            query_started = time.perf_counter()
+            db_utils.fetch_patients_data([int(i) for i in rng.choice(patient_ids, size=args.batch_size)])
+            latencies.append(time.perf_counter() - query_started)
+        metrics.update(latency_metrics("fetch_many", latencies, time.perf_counter() - started,
+                                       items=len(latencies) * args.batch_size, unit="rows"))
+        metrics["insert_rows_per_sec"] = inserted["rows_per_sec"]
+        return metrics
+    finally:
+        db_utils.execute_insert("DELETE FROM patients WHERE patient_id >= %s;", (first_id,))
+
+BENCHMARKS = {
+    "preprocess": bench_preprocess,
+    "train": bench_train,
+    "predict": bench_predict,
+    "explain": bench_explain,
+    "request_path": bench_request_path,
+    "auth": bench_auth,
+    "server": bench_server,
+    "db": bench_db,
+}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(args):
+    """
+    Build the reference model and run the selected benchmarks against it.
+
+    Args:
+    - args (argparse.Namespace): Parsed command-line arguments.
+
+    Returns:
+    - results (dict): Environment metadata and the metrics of every benchmark.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        with quiet():
+            reference = build_reference_model(work_dir, args.n_rows, args.n_estimators, args.seed)
+
+        # api.main loads MODEL_PATH on import, so the app is only imported from here on
+        os.environ["MODEL_PATH"] = reference["model_path"]
+        os.environ["PREDICT_ENGINE"] = args.engine
+        os.environ.setdefault("AUDIT_SPOOL_PATH", os.path.join(work_dir, "audit_spool.ndjson"))
+        ctx = {"args": args, "reference": reference, "work_dir": work_dir}
+
+        results = {}
+        with contextlib.ExitStack() as stack:
+            for name in args.only or BENCHMARK_NAMES:
+                if name in ("predict", "explain") and "client" not in ctx:
+                    from fastapi.testclient import TestClient
+                    from api.main import app
+                    ctx["client"] = stack.enter_context(TestClient(app))
+                    ctx["headers"] = register_benchmark_user()
+                started = time.perf_counter()
+                try:
+                    results[name] = BENCHMARKS[name](ctx)
+                    print(f"{name:<14} done in {time.perf_counter() - started:.1f}s")
+                except SkipBenchmark as e:
+                    results[name] = {"skipped": str(e)}
+                    print(f"{name:<14} skipped: {e}")
+
+    return {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": {key: value for key, value in vars(args).items()
+                           if key not in ("output", "baseline", "results", "serve")},
+        },
+        "benchmarks": results,
+    }
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare every metric present in both results.
+
+    Args:
+    - baseline (dict): Results of the reference run.
+    - current (dict): Results of the run under test.
+    - threshold (float): Relative worsening reported as a regression, e.g. 0.1 for 10%.
+
+    Returns:
+    - rows (list): (benchmark, metric, baseline, current, relative change, regressed) tuples;
+      a positive change is an improvement.
+    """
+    rows = []
+    for name, metrics in current["benchmarks"].items():
+        baseline_metrics = baseline["benchmarks"].get(name, {})
+        for metric, value in metrics.items():
+            reference = baseline_metrics.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(reference, (int, float)) or reference == 0:
+                continue
+            change = (value - reference) / abs(reference)
+            if not metric.endswith(HIGHER_IS_BETTER):
+                change = -change
+            rows.append((name, metric, reference, value, change, change < -threshold))
+    return rows
+
+def print_results(results):
+    for name, metrics in results["benchmarks"].items():
+        for metric, value in metrics.items():
+            formatted = f"{value:14.3f}" if isinstance(value, float) else f"{value!s:>14}"
+            print(f"{name:<14} {metric:<52} {formatted}")
+
+def print_comparison(rows, threshold):
+    print(f"{'benchmark':<14} {'metric':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metric, reference, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<14} {metric:<52} {reference:12.3f} {value:12.3f} {change:+8.1%}{flag}")
+    regressions = sum(row[5] for row in rows)
+    print(f"{regressions} of {len(rows)} metrics regressed by more than {threshold:.0%}.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the serving and training paths on synthetic data.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARK_NAMES, help="Benchmarks to run (default: all)")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--baseline", help="Compare against these JSON results and exit 1 on regressions")
+    parser.add_argument("--results", help="Compare these JSON results instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative worsening of a metric reported as a regression")
+    parser.add_argument("--n-rows", type=int, default=20000, help="Synthetic patients in the training set")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--engine", default="sklearn", help="Prediction engine served by the API")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per latency measurement")
+    parser.add_argument("--explain-requests", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=256, help="Records per batch request")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients against the uvicorn server")
+    parser.add_argument("--repeats", type=int, default=5, help="Repeats of the preprocessing measurement")
+    parser.add_argument("--train-repeats", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.serve)
+        sys.exit(0)
+
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        results = run_suite(args)
+        print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}.")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, results, args.threshold)
+        print_comparison(rows, args.threshold)
+        sys.exit(1 if any(row[5] for row in rows) else 0)
@@ -0,0 +1,240 @@
+import os
+import time
+from itertools import islice
+import asyncpg
+from dotenv import load_dotenv
+import logging
+from db.db_utils import AUDIT_COLUMNS, LOAD_CHECKPOINTS_DDL, PATIENT_COLUMNS
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Database connection settings (shared with db_utils)
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = int(os.getenv("DB_PORT", 5432))  # Default PostgreSQL port
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+
+# Async connection pool settings
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))  # Prepared statements kept per connection
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+ch.setFormatter(formatter)
+logger.addHandler(ch)
+
+# Process-wide asyncpg pool, opened by init_async_pool()
+_pool = None
+
+
+def is_configured():
+    """
+    Return True when database settings are present in the environment.
+    """
+    return DB_NAME is not None
+
+
+async def init_async_pool(min_size=DB_POOL_MIN, max_size=DB_POOL_MAX, **kwargs):
+    """
+    Open the process-wide asyncpg connection pool.
+    Statements run through the pool are prepared once per connection and
+    reused from asyncpg's statement cache.
+    Parameters:
+        - min_size: Number of connections opened up front.
+        - max_size: Maximum number of concurrent connections.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    try:
+        _pool = await asyncpg.create_pool(
+            host=DB_HOST,
+            port=DB_PORT,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            min_size=min_size,
+            max_size=max_size,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+            **kwargs,
+        )
+        logger.info(f"Async database pool opened (min={min_size}, max={max_size}).")
+        return _pool
+    except Exception as e:
+        logger.error(f"Error while opening async database pool: {e}")
+        raise
+
+
+async def close_async_pool():
+    """
+    Close the process-wide asyncpg pool, waiting for checked-out connections.
+    """
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+        logger.info("Async database pool closed.")
+
+
+def get_async_pool():
+    """
+    Return the open asyncpg pool.
+    """
+    if _pool is None:
+        raise RuntimeError("Async database pool is not initialized; call init_async_pool() first")
+    return _pool
+
+
+async def execute_query(query, *params):
+    """
+    Executes a SELECT query and returns the result rows.
+    Parameters:
+        - query: SQL query string with $1, $2, ... placeholders.
+        - params: Parameters to pass into the query.
+    """
+    try:
+        return await get_async_pool().fetch(query, *params)
+    except Exception as e:
+        logger.error(f"Error executing query: {e}")
+        raise
+
+
+async def execute_insert(query, *params):
+    """
+    Executes an INSERT query in its own transaction.
+    Parameters:
+        - query: SQL insert query string with $1, $2, ... placeholders.
+        - params: Parameters to pass into the query.
+    """
+    try:
+        await get_async_pool().execute(query, *params)
+        logger.debug(f"Query executed successfully: {query}")
+    except Exception as e:
+        logger.error(f"Error executing insert query: {e}")
+        raise
+
+
+async def insert_patient_data(patient_data):
+    """
+    Insert patient data into the patients table.
+    Parameters:
+        - patient_data: A tuple containing the patient's data, in PATIENT_COLUMNS order.
+    """
+    placeholders = ", ".join(f"${i}" for i in range(1, len(PATIENT_COLUMNS) + 1))
+    query = f"INSERT INTO patients ({', '.join(PATIENT_COLUMNS)}) VALUES ({placeholders});"
+    await execute_insert(query, *patient_data)
+
+
+async def _read_checkpoint(checkpoint):
+    if checkpoint is None:
+        return 0
+    await execute_insert(LOAD_CHECKPOINTS_DDL)
+    result = await execute_query(
+        "SELECT source, rows_committed FROM patient_load_checkpoints WHERE name = $1;", checkpoint
+    )
+    if not result:
+        return 0
+    source, rows_committed = result[0]
+    if source != "iterable":
+        raise ValueError(f"Checkpoint '{checkpoint}' belongs to a different source: {source}")
+    return rows_committed
+
+
+async def bulk_insert_patients(rows, batch_size=10000, checkpoint=None):
+    """
+    Bulk load patient tuples into the patients table using the binary COPY
+    protocol, one transaction per batch.
+    Parameters:
+        - rows: An iterable of patient tuples in PATIENT_COLUMNS order. Date
+          columns must be datetime.date values.
+        - batch_size: Number of rows written and committed per transaction.
+        - checkpoint: Optional name of the load. The rows committed so far are recorded in the
+          patient_load_checkpoints table, in the same transaction as each batch, and re-running
+          with the same rows and checkpoint resumes after the last committed batch.
+    Returns a dict with the number of rows inserted, elapsed seconds and rows per second.
+    """
+    rows_committed = await _read_checkpoint(checkpoint)
+    if rows_committed:
+        logger.info(f"Resuming bulk insert after {rows_committed} committed rows.")
+
+    inserted = 0
+    started = time.perf_counter()
+    batch = []
+
+    async def flush(batch):
+        async with get_async_pool().acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table("patients", records=batch, columns=list(PATIENT_COLUMNS))
+                if checkpoint is not None:
+                    await conn.execute(
+                        """
+                        INSERT INTO patient_load_checkpoints (name, source, rows_committed) VALUES ($1, $2, $3)
+                        ON CONFLICT (name) DO UPDATE SET source = EXCLUDED.source,
+                            rows_committed = EXCLUDED.rows_committed;
+                        """,
+                        checkpoint, "iterable", rows_committed + inserted + len(batch),
+                    )
+
+    try:
+        for row in islice(rows, rows_committed, None):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await flush(batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+            inserted += len(batch)
+    except Exception as e:
+        logger.error(f"Bulk insert failed after {rows_committed + inserted} committed rows: {e}")
+        raise
+
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Bulk inserted {inserted} patient rows in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    if checkpoint is not None:
+        await execute_insert("DELETE FROM patient_load_checkpoints WHERE name = $1;", checkpoint)
+    return {"rows": inserted, "seconds": elapsed, "rows_per_sec": rate}
+
+
+async def insert_audit_records(rows):
+    """
+    Write a batch of prediction audit records with the binary COPY protocol, in one transaction.
+    Parameters:
+        - rows: A list of tuples in AUDIT_COLUMNS order; recorded_at must be a datetime.
+    """
+    async with get_async_pool().acquire() as conn:
+        async with conn.transaction():
+            await conn.copy_records_to_table("prediction_audit", records=rows, columns=list(AUDIT_COLUMNS))
+
+
+async def fetch_patient_data(patient_id):
+    """
+    Fetch patient data by patient_id.
+    Parameters:
+        - patient_id: The ID of the patient.
+    """
+    query = """
+    SELECT * FROM patients WHERE patient_id = $1;
+    """
+    return await execute_query(query, patient_id)
+
+
+async def fetch_patients_data(patient_ids):
+    """
+    Fetch many patients' data in a single query.
+    Parameters:
+        - patient_ids: An iterable of patient IDs.
+    Returns rows of (patient_id, *PATIENT_COLUMNS), in no particular order.
+    """
+    query = f"""
+    SELECT patient_id, {', '.join(PATIENT_COLUMNS)} FROM patients WHERE patient_id = ANY($1::int[]);
+    """
+    return await execute_query(query, list(patient_ids))
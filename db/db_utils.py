@@ -1,6 +1,14 @@
 import os
+import io
+import csv
+import time
+import threading
+from itertools import islice
+from collections import deque
+from contextlib import contextmanager
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 import logging
 
@@ -14,6 +22,12 @@ DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 
+# Connection pool settings
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # Seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30))  # Idle seconds before a ping
+
 # Set up logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -53,6 +67,193 @@ def close_db_connection(conn):
         logger.info("Database connection closed.")
 
 
+class ConnectionPool:
+    """
+    Thread-safe pool of persistent database connections.
+
+    Connections are created lazily up to `maxconn` by the given `connect`
+    factory (psycopg2 by default). The pool itself only relies on DB-API
+    calls, but the query helpers in this module use psycopg2's `%s`
+    placeholders, so another driver must accept that paramstyle. Checkouts
+    block for up to `timeout` seconds when the pool is exhausted, and
+    connections idle for longer than `health_check_interval` seconds are
+    pinged before being handed out, replacing any that have gone stale.
+    """
+
+    def __init__(self, connect=get_db_connection, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL):
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()  # (connection, last_used) pairs, most recently used last
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def getconn(self):
+        """
+        Check out a healthy connection, waiting for one to be returned if needed.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        conn, last_used = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a database connection")
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            if self._is_healthy(conn, last_used):
+                return conn
+            logger.warning("Discarding stale pooled database connection.")
+            self._discard(conn)
+
+    def putconn(self, conn, discard=False):
+        """
+        Return a connection to the pool, or close it if it is broken.
+        """
+        if discard or self._closed or getattr(conn, "closed", False):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """
+        Close every idle connection and refuse further checkouts.
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                close_db_connection(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Return the pool's total, idle and checked-out connection counts.
+        """
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle)}
+
+    def _is_healthy(self, conn, last_used):
+        if getattr(conn, "closed", False):
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+# Process-wide connection pool, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, connect=get_db_connection, **kwargs):
+    """
+    Initialize the process-wide connection pool, replacing any existing one.
+    Parameters:
+        - minconn: Number of connections opened up front.
+        - maxconn: Maximum number of concurrent connections.
+        - connect: Factory returning a new DB-API connection (default: PostgreSQL via psycopg2).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = ConnectionPool(connect, minconn, maxconn, **kwargs)
+        logger.info(f"Database connection pool initialized (min={minconn}, max={maxconn}).")
+        return _pool
+
+
+def close_pool():
+    """
+    Close all pooled connections.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def get_pool():
+    """
+    Return the process-wide connection pool, initializing it with defaults if needed.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    """
+    Check out a pooled connection for the duration of a `with` block.
+    The transaction is committed on success and rolled back on error;
+    connections that fail to roll back are discarded instead of reused.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    discard = False
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            discard = True
+        raise
+    finally:
+        pool.putconn(conn, discard=discard)
+
+
 def execute_query(query, params=None):
     """
     Executes a SELECT query and returns the result.
@@ -60,20 +261,19 @@ def execute_query(query, params=None):
         - query: SQL query string.
         - params: Parameters to pass into the query (default is None).
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        result = cursor.fetchall()
-        cursor.close()
-        return result
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            if params is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(query, params)
+            result = cursor.fetchall()
+            cursor.close()
+            return result
     except Exception as e:
         logger.error(f"Error executing query: {e}")
         raise
-    finally:
-        if conn:
-            close_db_connection(conn)
 
 
 def execute_insert(query, params):
@@ -83,22 +283,15 @@ def execute_insert(query, params):
         - query: SQL insert query string.
         - params: Parameters to pass into the query.
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()  # Commit the transaction
-        cursor.close()
-        logger.info(f"Query executed successfully: {query}")
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            cursor.close()
+        logger.debug(f"Query executed successfully: {query}")
     except Exception as e:
         logger.error(f"Error executing insert query: {e}")
-        if conn:
-            conn.rollback()  # Rollback in case of error
         raise
-    finally:
-        if conn:
-            close_db_connection(conn)
 
 
 def create_table():
@@ -128,6 +321,68 @@ def create_table():
     execute_insert(query, ())
 
 
+def create_audit_table():
+    """
+    Creates the prediction audit table if it doesn't exist.
+    One row is written per audited /predict or /explain call.
+    """
+    query = """
+    CREATE TABLE IF NOT EXISTS prediction_audit (
+        audit_id BIGSERIAL PRIMARY KEY,
+        recorded_at TIMESTAMPTZ NOT NULL,
+        username VARCHAR(100),
+        endpoint VARCHAR(100) NOT NULL,
+        model_version VARCHAR(100),
+        input_hash CHAR(64) NOT NULL,
+        output TEXT,
+        latency_ms DOUBLE PRECISION,
+        status_code SMALLINT
+    );
+    ALTER TABLE prediction_audit ADD COLUMN IF NOT EXISTS status_code SMALLINT;
+    """
+    execute_insert(query, ())
+
+
+def create_users_table():
+    """
+    Creates the table of API users if it doesn't exist.
+    Passwords are stored as salted PBKDF2 hashes (see api.utils.hash_password).
+    """
+    query = """
+    CREATE TABLE IF NOT EXISTS users (
+        username VARCHAR(100) PRIMARY KEY,
+        hashed_password TEXT NOT NULL,
+        disabled BOOLEAN NOT NULL DEFAULT FALSE,
+        is_admin BOOLEAN NOT NULL DEFAULT FALSE
+    );
+    """
+    execute_insert(query, ())
+
+
+# Bulk load checkpoints, shared with the asyncpg loader
+LOAD_CHECKPOINTS_DDL = """
+CREATE TABLE IF NOT EXISTS patient_load_checkpoints (
+    name VARCHAR(200) PRIMARY KEY,
+    source TEXT NOT NULL,
+    rows_committed BIGINT NOT NULL
+);
+"""
+
+
+def create_load_checkpoints_table():
+    """
+    Creates the table of bulk load checkpoints if it doesn't exist.
+    One row per named load in progress records how many rows of its source are committed.
+    """
+    execute_insert(LOAD_CHECKPOINTS_DDL, ())
+
+
+# Columns of the prediction_audit table populated on insert, in tuple order
+AUDIT_COLUMNS = (
+    "recorded_at", "username", "endpoint", "model_version", "input_hash", "output", "latency_ms", "status_code",
+)
+
+
 def insert_patient_data(patient_data):
     """
     Insert patient data into the patients table.
@@ -145,6 +400,177 @@ def insert_patient_data(patient_data):
     execute_insert(query, patient_data)
 
 
+# Columns of the patients table populated on insert, in tuple order
+PATIENT_COLUMNS = (
+    "first_name", "last_name", "dob", "gender", "address", "phone_number", "email",
+    "diagnosis_code", "diagnosis_description", "treatment_code", "treatment_description",
+    "medication_code", "medication_description", "visit_date",
+)
+
+
+def _iter_patient_batches(source, batch_size, skip_rows=0):
+    """
+    Yield lists of patient tuples from an iterable of tuples or a CSV/Parquet file,
+    skipping the first `skip_rows` rows.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            batches = (
+                batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=list(PATIENT_COLUMNS))
+            )
+        else:
+            # Let the CSV reader skip already committed rows without parsing them
+            batches = _read_csv_chunks(path, batch_size, skip_rows)
+            skip_rows = 0
+        # Missing values (NaN/NaT/NA) are written as NULL
+        rows = (
+            row
+            for frame in batches
+            for row in frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+        )
+    else:
+        rows = iter(source)
+
+    rows = islice(rows, skip_rows, None)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _read_csv_chunks(path, batch_size, skip_rows=0):
+    """
+    Read the patient columns of a CSV file as strings, `batch_size` rows at a time.
+    """
+    import pandas as pd
+
+    chunks = pd.read_csv(
+        path, usecols=list(PATIENT_COLUMNS), dtype=str, chunksize=batch_size,
+        skiprows=range(1, skip_rows + 1),
+    )
+    return (chunk[list(PATIENT_COLUMNS)] for chunk in chunks)
+
+
+def _copy_batch(cursor, rows):
+    """
+    Stream a batch into the patients table with COPY FROM STDIN.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY patients ({', '.join(PATIENT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def _values_batch(cursor, rows):
+    """
+    Insert a batch as multi-row INSERT statements (any DB-API driver).
+    """
+    columns = ", ".join(PATIENT_COLUMNS)
+    if isinstance(cursor, psycopg2.extensions.cursor):
+        execute_values(cursor, f"INSERT INTO patients ({columns}) VALUES %s", rows, page_size=1000)
+    else:
+        placeholders = ", ".join(["%s"] * len(PATIENT_COLUMNS))
+        cursor.executemany(f"INSERT INTO patients ({columns}) VALUES ({placeholders})", rows)
+
+
+def _read_checkpoint(checkpoint, source_id):
+    if checkpoint is None:
+        return 0
+    create_load_checkpoints_table()
+    result = execute_query(
+        "SELECT source, rows_committed FROM patient_load_checkpoints WHERE name = %s;", (checkpoint,)
+    )
+    if not result:
+        return 0
+    source, rows_committed = result[0]
+    if source != source_id:
+        raise ValueError(f"Checkpoint '{checkpoint}' belongs to a different source: {source}")
+    return rows_committed
+
+
+def _write_checkpoint(cursor, checkpoint, source_id, rows_committed):
+    """
+    Record the committed row count with the batch's cursor, so it commits or rolls back with the batch.
+    """
+    cursor.execute(
+        """
+        INSERT INTO patient_load_checkpoints (name, source, rows_committed) VALUES (%s, %s, %s)
+        ON CONFLICT (name) DO UPDATE SET source = EXCLUDED.source, rows_committed = EXCLUDED.rows_committed;
+        """,
+        (checkpoint, source_id, rows_committed),
+    )
+
+
+def _commit_patient_batch(batch, use_copy, checkpoint, source_id, rows_committed):
+    """
+    Write one batch, and its checkpoint if any, in a transaction of its own.
+    Returns whether COPY was used, which is False when the driver does not support it.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if use_copy and hasattr(cursor, "copy_expert"):
+            _copy_batch(cursor, batch)
+        else:
+            use_copy = False
+            _values_batch(cursor, batch)
+        if checkpoint is not None:
+            _write_checkpoint(cursor, checkpoint, source_id, rows_committed)
+        cursor.close()
+    return use_copy
+
+
+def bulk_insert_patients(source, batch_size=10000, method="copy", checkpoint=None):
+    """
+    Bulk load patient records into the patients table, one transaction per batch.
+    Parameters:
+        - source: An iterable of patient tuples (in PATIENT_COLUMNS order) or a path to a CSV/Parquet file.
+        - batch_size: Number of rows written and committed per transaction.
+        - method: 'copy' (COPY FROM STDIN, falling back to 'values' if unavailable or refused) or 'values'
+          (multi-row INSERT via execute_values).
+        - checkpoint: Optional name of the load. The rows committed so far are recorded in the
+          patient_load_checkpoints table, in the same transaction as each batch, and re-running
+          with the same source and checkpoint resumes after the last committed batch.
+    Returns a dict with the number of rows inserted, elapsed seconds and rows per second.
+    """
+    source_id = os.path.abspath(os.fspath(source)) if isinstance(source, (str, os.PathLike)) else "iterable"
+    rows_committed = _read_checkpoint(checkpoint, source_id)
+    if rows_committed:
+        logger.info(f"Resuming bulk insert after {rows_committed} committed rows.")
+
+    inserted = 0
+    started = time.perf_counter()
+    use_copy = method == "copy"
+    for batch in _iter_patient_batches(source, batch_size, skip_rows=rows_committed):
+        try:
+            try:
+                use_copy = _commit_patient_batch(batch, use_copy, checkpoint, source_id, rows_committed + len(batch))
+            except psycopg2.Error as e:
+                if not use_copy:
+                    raise
+                # COPY can be refused (missing privileges, poolers such as pgbouncer); the batch was
+                # rolled back, so retry it and the rest of the load with multi-row INSERTs
+                logger.warning(f"COPY failed, falling back to multi-row INSERT: {e}")
+                use_copy = _commit_patient_batch(batch, False, checkpoint, source_id, rows_committed + len(batch))
+        except Exception as e:
+            logger.error(f"Bulk insert failed after {rows_committed} committed rows: {e}")
+            raise
+
+        inserted += len(batch)
+        rows_committed += len(batch)
+        logger.debug(f"Committed batch of {len(batch)} rows ({rows_committed} total).")
+
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Bulk inserted {inserted} patient rows in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    if checkpoint is not None:
+        execute_insert("DELETE FROM patient_load_checkpoints WHERE name = %s;", (checkpoint,))
+    return {"rows": inserted, "seconds": elapsed, "rows_per_sec": rate}
+
+
 def fetch_patient_data(patient_id):
     """
     Fetch patient data by patient_id.
@@ -158,10 +584,39 @@ def fetch_patient_data(patient_id):
     return result
 
 
+def fetch_patients_data(patient_ids):
+    """
+    Fetch many patients' data in a single query.
+    Parameters:
+        - patient_ids: An iterable of patient IDs.
+    Returns rows of (patient_id, *PATIENT_COLUMNS), in no particular order.
+    """
+    query = f"""
+    SELECT patient_id, {', '.join(PATIENT_COLUMNS)} FROM patients WHERE patient_id = ANY(%s);
+    """
+    return execute_query(query, (list(patient_ids),))
+
+
+def fetch_user(username):
+    """
+    Fetch an API user by username.
+    Parameters:
+        - username: The user's name.
+    Returns a (username, hashed_password, disabled, is_admin) row, or None for unknown users.
+    """
+    query = """
+    SELECT username, hashed_password, disabled, is_admin FROM users WHERE username = %s;
+    """
+    result = execute_query(query, (username,))
+    return result[0] if result else None
+
+
 # Example usage:
 if __name__ == "__main__":
-    # Create the table if it doesn't exist
+    # Create the tables if they don't exist
     create_table()
+    create_audit_table()
+    create_users_table()
 
     # Example of inserting patient data
     sample_patient = (
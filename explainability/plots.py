@@ -0,0 +1,88 @@
+# secure-healthcare-ml/explainability/plots.py
+
+"""
+Rendering of SHAP visualizations to image bytes.
+
+These functions are kept separate from SHAP value computation so that
+explanations can be served as numbers and plots rendered lazily, typically
+in a separate worker process. matplotlib is only imported when a plot is
+actually rendered.
+"""
+
+import io
+import numpy as np
+from typing import List, Optional
+
+SUPPORTED_FORMATS = ("png", "svg")
+
+
+def _figure_to_bytes(fig, fmt: str) -> bytes:
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_summary_plot(
+    shap_values: np.ndarray,
+    features: np.ndarray,
+    feature_names: Optional[List[str]] = None,
+    fmt: str = "png",
+    max_display: int = 10,
+) -> bytes:
+    """
+    Render a SHAP summary plot to image bytes.
+
+    Args:
+        shap_values (np.ndarray): SHAP values of shape (n_samples, n_features).
+        features (np.ndarray): Feature values of the same shape.
+        feature_names (list, optional): Names of the features.
+        fmt (str): Image format, 'png' or 'svg'.
+        max_display (int): Number of top features to show.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import shap
+
+    shap.summary_plot(
+        np.atleast_2d(shap_values), np.atleast_2d(features),
+        feature_names=feature_names, max_display=max_display, show=False,
+    )
+    return _figure_to_bytes(plt.gcf(), fmt)
+
+
+def render_force_plot(
+    shap_values: np.ndarray,
+    base_value: float,
+    features: np.ndarray,
+    feature_names: Optional[List[str]] = None,
+    fmt: str = "png",
+) -> bytes:
+    """
+    Render a SHAP force plot for a single instance to image bytes.
+
+    Args:
+        shap_values (np.ndarray): SHAP values of one instance, shape (n_features,).
+        base_value (float): The explainer's expected value for the explained output.
+        features (np.ndarray): Feature values of the instance.
+        feature_names (list, optional): Names of the features.
+        fmt (str): Image format, 'png' or 'svg'.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import shap
+
+    fig = shap.force_plot(
+        base_value, np.asarray(shap_values), np.asarray(features),
+        feature_names=feature_names, matplotlib=True, show=False,
+    )
+    return _figure_to_bytes(fig, fmt)
@@ -0,0 +1,155 @@
+# secure-healthcare-ml/explainability/registry.py
+
+"""
+Prebuilt SHAP explainers, one per loaded model version.
+
+Building an explainer is too slow to repeat on every request, so the API
+builds it once when a model version is loaded and looks it up by version
+afterwards. Tree ensembles get an exact TreeExplainer; other models fall
+back to a KernelExplainer over a k-means summary of the training data,
+saved next to the model artifact at training time.
+"""
+
+import os
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+import shap
+from typing import Any, Dict, Optional, Union
+
+# Number of k-means centroids used to summarize the Kernel SHAP background set
+DEFAULT_BACKGROUND_SIZE = 50
+
+
+def model_version_from_path(model_path: str) -> str:
+    """
+    Derive a model version key from its artifact path (e.g. 'models/model_v1.pkl' -> 'model_v1').
+    """
+    return os.path.splitext(os.path.basename(model_path))[0]
+
+
+def background_path_for(model_path: str) -> str:
+    """
+    Return the path of the persisted background set that accompanies a model artifact.
+    """
+    return os.path.splitext(model_path)[0] + ".background.pkl"
+
+
+def save_background(X: Union[pd.DataFrame, np.ndarray], path: str, size: int = DEFAULT_BACKGROUND_SIZE):
+    """
+    Summarize a training matrix with k-means and persist it as a SHAP background set.
+
+    Args:
+        X (pd.DataFrame or np.ndarray): Training features the background is drawn from.
+        path (str): Where to save the summarized background.
+        size (int): Number of weighted centroids to keep.
+    """
+    background = shap.kmeans(X, min(size, len(X)))
+    joblib.dump(background, path)
+    print(f"SHAP background ({background.data.shape[0]} centroids) saved to {path}")
+
+
+def load_background(path: str) -> Optional[Any]:
+    """
+    Load a persisted background set, or return None when none has been saved.
+    """
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+
+def build_explainer(model: Any, background: Optional[Any] = None) -> Any:
+    """
+    Build the fastest applicable SHAP explainer for a model.
+
+    Tree ensembles get an exact ``TreeExplainer``, which needs no background
+    data. Any other model falls back to ``KernelExplainer`` over a summarized
+    background set.
+
+    Args:
+        model (Any): The trained model to explain.
+        background (Any, optional): Summarized background data for the Kernel fallback.
+
+    Returns:
+        Any: A SHAP explainer exposing ``shap_values``.
+    """
+    try:
+        return shap.TreeExplainer(model)
+    except Exception:
+        pass
+
+    if background is None:
+        raise ValueError("Model is not a tree ensemble and no background set is available for KernelExplainer")
+    predict_fn = model.predict_proba if hasattr(model, "predict_proba") else model.predict
+    return shap.KernelExplainer(predict_fn, background)
+
+
+def select_class_values(shap_values: Any, class_index: int) -> np.ndarray:
+    """
+    Reduce SHAP values to a single output, as (n_samples, n_features).
+
+    Multi-output explainers return either a list with one array per class or a
+    (n_samples, n_features, n_classes) array depending on the SHAP version.
+    """
+    if isinstance(shap_values, list):
+        return np.asarray(shap_values[class_index])
+    shap_values = np.asarray(shap_values)
+    if shap_values.ndim == 3:
+        return shap_values[:, :, class_index]
+    return shap_values
+
+
+def select_class_base_value(expected_value: Any, class_index: int) -> float:
+    """
+    Reduce an explainer's expected value to the one matching a single output.
+    """
+    expected_value = np.atleast_1d(expected_value)
+    if expected_value.size > 1:
+        return float(expected_value[class_index])
+    return float(expected_value[0])
+
+
+class ExplainerRegistry:
+    def __init__(self):
+        """
+        Holds one prebuilt SHAP explainer per loaded model version.
+        """
+        self._explainers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, version: str, model: Any, background: Optional[Any] = None) -> Any:
+        """
+        Build and store the explainer for a model version, replacing any previous one.
+
+        Args:
+            version (str): The model version key.
+            model (Any): The trained model.
+            background (Any, optional): Summarized background data for non-tree models.
+
+        Returns:
+            Any: The registered explainer.
+        """
+        explainer = build_explainer(model, background)
+        with self._lock:
+            self._explainers[version] = explainer
+        return explainer
+
+    def get(self, version: str) -> Any:
+        """
+        Return the explainer registered for a model version.
+        """
+        try:
+            return self._explainers[version]
+        except KeyError:
+            raise KeyError(f"No explainer registered for model version '{version}'")
+
+    def remove(self, version: str):
+        """
+        Drop the explainer for a model version, e.g. after the model is retired.
+        """
+        with self._lock:
+            self._explainers.pop(version, None)
+
+    def __contains__(self, version: str) -> bool:
+        return version in self._explainers
@@ -1,10 +1,32 @@
 # secure-healthcare-ml/explainability/shap_explainer.py
 
 import shap
+import warnings
 import numpy as np
 import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.base import BaseEstimator
-from typing import Any, Union
+from typing import Any, Iterator, Optional, Tuple, Union
+
+# Explainer built once per worker process by `_init_worker`
+_worker_explainer = None
+
+
+def _init_worker(model: BaseEstimator):
+    global _worker_explainer
+    _worker_explainer = shap.Explainer(model)
+
+
+def _explain_chunk(X_chunk: Union[pd.DataFrame, np.ndarray]) -> shap.Explanation:
+    return _worker_explainer(X_chunk)
+
+
+def _slice_rows(X: Union[pd.DataFrame, np.ndarray], start: int, stop: int):
+    if isinstance(X, pd.DataFrame):
+        return X.iloc[start:stop]
+    return np.asarray(X[start:stop])
+
 
 class SHAPExplainer:
     def __init__(self, model: BaseEstimator, feature_names: Union[list, np.ndarray]):
@@ -17,32 +39,124 @@ class SHAPExplainer:
         """
         self.model = model
         self.feature_names = feature_names
+        self._explainer = None
 
-    def explain(self, X: pd.DataFrame, num_features: int = 10) -> shap.Explanation:
+    @property
+    def explainer(self) -> shap.Explainer:
+        """
+        The underlying SHAP explainer, built on first use and reused afterwards.
+        """
+        if self._explainer is None:
+            # SHAP Explainer based on the model type
+            if isinstance(self.model, BaseEstimator):
+                self._explainer = shap.Explainer(self.model)
+            else:
+                raise ValueError("Model must be a scikit-learn estimator")
+        return self._explainer
+
+    def explain(self, X: pd.DataFrame, num_features: Optional[int] = None) -> shap.Explanation:
         """
         Generates SHAP explanations for the model predictions on the given dataset.
+        No plots are rendered; use `plot_summary` for visualization.
 
         Args:
             X (pd.DataFrame): Input features for which SHAP values need to be computed.
-            num_features (int): Number of top features to visualize in the explanation.
+            num_features (int, optional): Deprecated. If given, only the `num_features`
+                features with the largest mean absolute SHAP value are returned, most
+                important first; pass it to `plot_summary` to limit the plot instead.
 
         Returns:
             shap.Explanation: SHAP explanation object containing the SHAP values.
         """
-        # SHAP Explainer based on the model type
-        if isinstance(self.model, BaseEstimator):
-            explainer = shap.Explainer(self.model)
-        else:
-            raise ValueError("Model must be a scikit-learn estimator")
-
         # Get SHAP values for the input data
-        shap_values = explainer(X)
-
-        # Visualize the top 'num_features' features
-        shap.summary_plot(shap_values, X, feature_names=self.feature_names, max_display=num_features)
+        shap_values = self.explainer(X)
+
+        if num_features is not None:
+            warnings.warn(
+                "SHAPExplainer.explain(num_features=...) is deprecated and now truncates the returned "
+                "explanation; pass num_features to plot_summary to limit the plot instead",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+            values = np.abs(shap_values.values)
+            importance = values.mean(axis=tuple(axis for axis in range(values.ndim) if axis != 1))
+            shap_values = shap_values[:, np.argsort(-importance)[:num_features]]
 
         return shap_values
 
+    def explain_batch(
+        self,
+        X: Union[pd.DataFrame, np.ndarray],
+        chunk_size: int = 10000,
+        n_jobs: int = 1,
+    ) -> Iterator[Tuple[int, shap.Explanation]]:
+        """
+        Generates SHAP explanations for a large dataset chunk by chunk.
+
+        Chunks are explained in order, optionally across a pool of worker
+        processes that each build the explainer once. At most two chunks per
+        worker are in flight, so memory stays bounded by the chunk size.
+
+        Args:
+            X (pd.DataFrame or np.ndarray): Input features; may be a memory-mapped array.
+            chunk_size (int): Number of rows explained per chunk.
+            n_jobs (int): Number of worker processes; 1 explains in-process.
+
+        Yields:
+            Tuple[int, shap.Explanation]: The starting row of each chunk and its explanation.
+        """
+        starts = range(0, len(X), chunk_size)
+
+        if n_jobs == 1:
+            for start in starts:
+                yield start, self.explainer(_slice_rows(X, start, start + chunk_size))
+            return
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(self.model,)) as pool:
+            pending = deque()
+            for start in starts:
+                pending.append((start, pool.submit(_explain_chunk, _slice_rows(X, start, start + chunk_size))))
+                if len(pending) >= 2 * n_jobs:
+                    start_done, future = pending.popleft()
+                    yield start_done, future.result()
+            while pending:
+                start_done, future = pending.popleft()
+                yield start_done, future.result()
+
+    def explain_to_npy(
+        self,
+        X: Union[pd.DataFrame, np.ndarray],
+        output_path: str,
+        chunk_size: int = 10000,
+        n_jobs: int = 1,
+    ) -> np.memmap:
+        """
+        Writes SHAP values for a large dataset to a memory-mapped `.npy` file.
+
+        Args:
+            X (pd.DataFrame or np.ndarray): Input features; may be a memory-mapped array.
+            output_path (str): Path of the `.npy` file to write.
+            chunk_size (int): Number of rows explained per chunk.
+            n_jobs (int): Number of worker processes; 1 explains in-process.
+
+        Returns:
+            np.memmap: The SHAP values, opened read-only from `output_path`.
+        """
+        output: Optional[np.memmap] = None
+        for start, explanation in self.explain_batch(X, chunk_size=chunk_size, n_jobs=n_jobs):
+            values = explanation.values
+            if output is None:
+                output = np.lib.format.open_memmap(
+                    output_path, mode="w+", dtype=np.float32, shape=(len(X),) + values.shape[1:]
+                )
+            output[start:start + len(values)] = values
+        if output is None:
+            raise ValueError("Cannot explain an empty dataset")
+        output.flush()
+        del output
+        print(f"SHAP values for {len(X)} rows saved to {output_path}")
+        return np.load(output_path, mmap_mode="r")
+
     def local_explanation(self, X: pd.DataFrame, instance_idx: int = 0) -> shap.Explanation:
         """
         Explains a single instance prediction using SHAP.
@@ -54,14 +168,32 @@ class SHAPExplainer:
         Returns:
             shap.Explanation: SHAP explanation for the instance.
         """
-        # Get SHAP values for the dataset
-        shap_values = self.explain(X)
+        # Get SHAP values for the requested instance only
+        shap_values = self.explain(_slice_rows(X, instance_idx, instance_idx + 1))
 
-        # Visualize the SHAP values for the single instance
-        shap.initjs()
-        shap.force_plot(shap_values[instance_idx].values, shap_values[instance_idx].base_values, X.iloc[instance_idx])
+        return shap_values[0]
 
-        return shap_values[instance_idx]
+    def plot_summary(self, shap_values: shap.Explanation, X: pd.DataFrame, num_features: int = 10):
+        """
+        Visualizes the top features of previously computed SHAP values.
+
+        Args:
+            shap_values (shap.Explanation): SHAP values returned by `explain`.
+            X (pd.DataFrame): The input features the values were computed for.
+            num_features (int): Number of top features to visualize.
+        """
+        shap.summary_plot(shap_values, X, feature_names=self.feature_names, max_display=num_features)
+
+    def plot_local(self, explanation: shap.Explanation, x: pd.Series):
+        """
+        Visualizes a single-instance explanation as a force plot.
+
+        Args:
+            explanation (shap.Explanation): SHAP explanation returned by `local_explanation`.
+            x (pd.Series): The feature values of the explained instance.
+        """
+        shap.initjs()
+        return shap.force_plot(explanation.base_values, explanation.values, x)
 
 # Example Usage:
 # Assuming you have a trained model `model` and a dataset `X`
@@ -70,4 +202,11 @@ class SHAPExplainer:
 
 # explainer = SHAPExplainer(model, feature_names)
 # shap_values = explainer.explain(X)
+# explainer.plot_summary(shap_values, X)
 # shap_values_local = explainer.local_explanation(X, instance_idx=0)
+# explainer.plot_local(shap_values_local, X.iloc[0])
+
+# For whole-cohort audits, stream chunks or write values to disk:
+# for start, chunk_values in explainer.explain_batch(X, chunk_size=50000, n_jobs=8):
+#     ...
+# values = explainer.explain_to_npy(X, "cohort_shap.npy", chunk_size=50000, n_jobs=8)
@@ -0,0 +1,352 @@
+# secure-healthcare-ml/scripts/compile_model.py
+
+import argparse
+import json
+import os
+import sys
+import time
+import joblib
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Adding the path to the src folder (or where your modules are located)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+# Version of the persisted compiled forest layout; bump when the layout changes
+COMPILED_FORMAT_VERSION = 1
+
+# Node arrays of a compiled forest, stored as one .npy file each
+NODE_ARRAYS = ('feature', 'threshold', 'child', 'value', 'roots', 'depth')
+
+# Evaluation engines: 'numba' runs a JIT-compiled loop and needs the numba package
+ENGINES = ('numpy', 'numba')
+
+# The numpy engine drops (tree, row) pairs that reached a leaf every this many levels
+COMPACT_EVERY = 4
+
+def compiled_path_for(path):
+    """
+    Return the path of the compiled forest that accompanies a model artifact.
+
+    Args:
+    - path (str): Path of the model (e.g. '../models/model_v1.pkl').
+
+    Returns:
+    - str: Directory of the compiled forest (e.g. '../models/model_v1.compiled').
+    """
+    return os.path.splitext(path.rstrip(os.sep))[0] + '.compiled'
+
+class CompiledForest:
+    """
+    A fitted tree ensemble flattened into node arrays and scored without sklearn.
+
+    The trees are concatenated, each laid out breadth-first with the two
+    children of a node stored next to each other: a row at node i moves to
+    `child[i] + (x[feature[i]] > threshold[i])`. Leaves point to themselves
+    with an infinite threshold, so every row can take the same number of steps
+    (`depth[t]` for tree t, starting at `roots[t]`) without branching.
+    `value` holds the per-node class probabilities (or regression values),
+    summed over trees in order and averaged as sklearn does.
+
+    Inputs are compared as float32 against thresholds rounded down to float32,
+    which decides every split exactly as sklearn's float64 thresholds do, so
+    outputs match the source forest exactly.
+
+    Where sklearn routes missing values depends on the training data, which is
+    not compiled, so rows containing NaN are scored by `fallback` (the source
+    forest) when one is given and rejected otherwise.
+    """
+
+    def __init__(self, feature, threshold, child, value, roots, depth, classes=None, n_features_in=None,
+                 feature_names_in=None, engine=None, fallback=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.child = child
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes_ = None if classes is None else np.asarray(classes)
+        self.n_features_in_ = n_features_in
+        if feature_names_in is not None:
+            self.feature_names_in_ = np.asarray(feature_names_in, dtype=object)
+        self.engine = engine or ('numba' if numba is not None else 'numpy')
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{self.engine}'; expected one of {ENGINES}")
+        if self.engine == 'numba' and numba is None:
+            raise ImportError("The numba inference engine requires the 'numba' package")
+        self.fallback = fallback
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def _validate(self, X):
+        if getattr(self, 'feature_names_in_', None) is not None and hasattr(X, 'columns'):
+            X = X[list(self.feature_names_in_)]
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or (self.n_features_in_ is not None and X.shape[1] != self.n_features_in_):
+            raise ValueError(f"X has shape {X.shape}, but the forest expects {self.n_features_in_} features")
+        return X
+
+    def _average(self, X):
+        """
+        Return the tree outputs averaged per row, shape (n_rows, n_outputs).
+        """
+        rows = self._validate(X)
+        missing = np.isnan(rows).any(axis=1)
+        if not missing.any():
+            return self._average_rows(rows)
+        if self.fallback is None:
+            raise ValueError("Input contains NaN; impute missing values before scoring a compiled forest")
+        average = np.empty((rows.shape[0], self.value.shape[1]))
+        if not missing.all():
+            average[~missing] = self._average_rows(rows[~missing])
+        average[missing] = self._average_fallback(X, missing)
+        return average
+
+    def _average_fallback(self, X, rows):
+        """
+        Return the fallback forest's outputs for the selected rows of X, which the compiled forest cannot score.
+        """
+        if hasattr(X, 'iloc'):
+            X = X.iloc[rows]
+            if getattr(self, 'feature_names_in_', None) is not None:
+                X = X[list(self.feature_names_in_)]
+        else:
+            X = np.asarray(X)[rows]
+        if self.classes_ is None:
+            return self.fallback.predict(X).reshape(len(X), -1)
+        return self.fallback.predict_proba(X)
+
+    def _average_rows(self, X):
+        """
+        Return the averaged tree outputs of validated rows without missing values.
+        """
+        if self.engine == 'numba':
+            total = np.zeros((X.shape[0], self.value.shape[1]))
+            _accumulate_numba(X, self.feature, self.threshold, self.child, self.value, self.roots, self.depth, total)
+        else:
+            total = self._accumulate_numpy(X)
+        return total / self.n_trees
+
+    def _accumulate_numpy(self, X):
+        """
+        Step every (tree, row) pair down one level at a time, all pairs at once.
+        """
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        leaf = np.repeat(self.roots, n_rows)
+        position = np.arange(leaf.size)
+        node = leaf.copy()
+        offset = np.tile(np.arange(n_rows) * n_features, self.n_trees)
+        for step in range(1, int(self.depth.max(initial=0)) + 1):
+            moved = self.child[node] + (flat[offset + self.feature[node]] > self.threshold[node])
+            if step % COMPACT_EVERY == 0:
+                # Pairs that stayed put are at their leaf; drop them from the working set
+                done = moved == node
+                leaf[position[done]] = node[done]
+                position, moved, offset = position[~done], moved[~done], offset[~done]
+            node = moved
+        leaf[position] = node
+        # Sum tree by tree in order, as sklearn does, so results agree to the last bit
+        return self.value[leaf].reshape(self.n_trees, n_rows, -1).sum(axis=0)
+
+    def predict_proba(self, X):
+        """
+        Return class probabilities, as the source classifier's `predict_proba`.
+        """
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._average(X)
+
+    def predict(self, X):
+        """
+        Return class labels (or regression values), as the source forest's `predict`.
+        """
+        average = self._average(X)
+        if self.classes_ is None:
+            return average[:, 0]
+        return self.classes_.take(np.argmax(average, axis=1))
+
+if numba is not None:
+    @numba.njit(nogil=True)
+    def _accumulate_numba(X, feature, threshold, child, value, roots, depth, total):
+        # One tree at a time over all rows keeps the tree in cache, and the
+        # rows' independent steps overlap their memory accesses
+        node = np.empty(X.shape[0], dtype=np.int64)
+        for t in range(roots.shape[0]):
+            node[:] = roots[t]
+            for _ in range(depth[t]):
+                for i in range(X.shape[0]):
+                    k = node[i]
+                    node[i] = child[k] + (X[i, feature[k]] > threshold[k])
+            for i in range(X.shape[0]):
+                total[i] += value[node[i]]
+else:
+    _accumulate_numba = None
+
+def _round_down_float32(threshold):
+    """
+    Return the largest float32 not above each float64 threshold; for any float32
+    x, `x <= threshold` holds exactly when `x <= _round_down_float32(threshold)`.
+    """
+    rounded = threshold.astype(np.float32)
+    above = rounded.astype(np.float64) > threshold
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+def _flatten_tree(tree, offset):
+    """
+    Lay out one sklearn tree breadth-first with sibling children adjacent.
+    """
+    left, right = tree.children_left, tree.children_right
+    new_index = np.empty(tree.node_count, dtype=np.int64)
+    new_index[0] = 0
+    next_index, level = 1, np.array([0])
+    while level.size:
+        internal = level[left[level] >= 0]
+        children = np.empty(2 * internal.size, dtype=np.int64)
+        children[0::2], children[1::2] = left[internal], right[internal]
+        new_index[children] = np.arange(next_index, next_index + children.size)
+        next_index += children.size
+        level = children
+    order = np.empty(tree.node_count, dtype=np.int64)
+    order[new_index] = np.arange(tree.node_count)
+
+    is_leaf = left[order] < 0
+    feature = np.where(is_leaf, 0, tree.feature[order])
+    threshold = np.where(is_leaf, np.inf, tree.threshold[order])
+    child = np.where(is_leaf, np.arange(tree.node_count), new_index[np.maximum(left[order], 0)]) + offset
+    return feature, threshold, child, tree.value[order, 0, :].astype(np.float64)
+
+def compile_forest(model, engine=None):
+    """
+    Flatten a fitted single-output random forest (or extra-trees) classifier or
+    regressor into a `CompiledForest`.
+
+    Args:
+    - model: A fitted sklearn forest, e.g. from `scripts.train.train_model`.
+    - engine (str, optional): One of ENGINES; numba when installed, numpy otherwise.
+
+    Returns:
+    - forest (CompiledForest): The flattened forest.
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if not isinstance(estimators, list) or not estimators or not hasattr(estimators[0], 'tree_'):
+        raise TypeError(f"Cannot compile a {type(model).__name__}; only fitted random forests are supported")
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise TypeError("Cannot compile a multi-output forest")
+    is_classifier = hasattr(model, 'classes_')
+
+    feature, threshold, child, value = [], [], [], []
+    roots, depth = [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        tree_feature, tree_threshold, tree_child, tree_value = _flatten_tree(tree, offset)
+        if is_classifier:
+            # Normalized per node as in DecisionTreeClassifier.predict_proba
+            normalizer = tree_value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            tree_value = tree_value / normalizer
+        feature.append(tree_feature)
+        threshold.append(tree_threshold)
+        child.append(tree_child)
+        value.append(tree_value)
+        roots.append(offset)
+        depth.append(tree.max_depth)
+        offset += tree.node_count
+    if offset >= 2 ** 31:
+        raise ValueError(f"Cannot compile a forest of {offset} nodes; node indices are stored as int32")
+
+    return CompiledForest(
+        np.concatenate(feature).astype(np.int32), _round_down_float32(np.concatenate(threshold)),
+        np.concatenate(child).astype(np.int32), np.ascontiguousarray(np.concatenate(value)),
+        np.asarray(roots, dtype=np.int32), np.asarray(depth, dtype=np.int32),
+        classes=model.classes_ if is_classifier else None,
+        n_features_in=getattr(model, 'n_features_in_', None),
+        feature_names_in=getattr(model, 'feature_names_in_', None),
+        engine=engine,
+    )
+
+def save_compiled(forest, path):
+    """
+    Save a compiled forest as a directory of .npy node arrays and a JSON header,
+    so serving processes can memory-map and share one copy.
+
+    Args:
+    - forest (CompiledForest): The forest to save.
+    - path (str): Destination directory, e.g. from `compiled_path_for`.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in NODE_ARRAYS:
+        np.save(os.path.join(path, name + '.npy'), getattr(forest, name))
+    feature_names_in = getattr(forest, 'feature_names_in_', None)
+    header = {
+        'format_version': COMPILED_FORMAT_VERSION,
+        'classes': None if forest.classes_ is None else forest.classes_.tolist(),
+        'n_features_in': forest.n_features_in_,
+        'feature_names_in': None if feature_names_in is None else [str(name) for name in feature_names_in],
+    }
+    with open(os.path.join(path, 'forest.json'), 'w') as f:
+        json.dump(header, f, indent=2)
+    print(f"Compiled forest saved to {path}.")
+
+def load_compiled(path, mmap_mode='r', engine=None):
+    """
+    Load a compiled forest saved by `save_compiled`.
+
+    Args:
+    - path (str): Directory of the compiled forest.
+    - mmap_mode (str, optional): Memory-map the node arrays ('r' by default); None reads them into memory.
+    - engine (str, optional): One of ENGINES; numba when installed, numpy otherwise.
+
+    Returns:
+    - forest (CompiledForest): The loaded forest.
+    """
+    with open(os.path.join(path, 'forest.json')) as f:
+        header = json.load(f)
+    if header.get('format_version') != COMPILED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compiled forest format version {header.get('format_version')} in {path}")
+    arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode) for name in NODE_ARRAYS]
+    return CompiledForest(*arrays, classes=header['classes'], n_features_in=header['n_features_in'],
+                          feature_names_in=header['feature_names_in'], engine=engine)
+
+def benchmark(model, forest, X, repeats=50):
+    """
+    Print the median latency of sklearn and the compiled forest on X.
+    """
+    for name, scorer in (('sklearn', model), (f'compiled ({forest.engine})', forest)):
+        scorer.predict(X[:1])
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            scorer.predict(X)
+            timings.append(time.perf_counter() - started)
+        print(f"{name}: p50 {np.median(timings) * 1000:.3f} ms for {len(X)} rows")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile a trained forest for fast inference.")
+    parser.add_argument("--model-path", default="../models/model_v1.pkl")
+    parser.add_argument("--output-path", default=None, help="Compiled forest directory; next to the model by default")
+    parser.add_argument("--engine", choices=ENGINES, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="Compare latency with sklearn on random rows")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model_path)
+    forest = compile_forest(model, args.engine)
+    print(f"Compiled {forest.n_trees} trees ({forest.n_nodes} nodes).")
+    save_compiled(forest, args.output_path or compiled_path_for(args.model_path))
+
+    if args.benchmark:
+        X = np.random.default_rng(0).normal(size=(1000, forest.n_features_in_))
+        for n_rows in (1, 1000):
+            benchmark(model, forest, X[:n_rows])
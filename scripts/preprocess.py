@@ -1,48 +1,288 @@
 # secure-healthcare-ml/scripts/preprocess.py
 
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from numpy.lib.format import open_memmap
+from sklearn.model_selection import ShuffleSplit, train_test_split
 from sklearn.preprocessing import StandardScaler
 
-def load_data(data_path):
+# Supported processed-data formats, keyed by file extension. A path without
+# an extension is a directory holding the float32 matrix as .npy files.
+DATA_FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.feather': 'feather', '': 'npy', '.npy': 'npy'}
+
+def detect_format(data_path):
+    """
+    Infer the data format from a path.
+
+    Args:
+    - data_path (str): Path to a CSV, Parquet or Feather file, or to an .npy directory.
+
+    Returns:
+    - fmt (str): One of 'csv', 'parquet', 'feather' or 'npy'.
+    """
+    if os.path.isdir(data_path):
+        return 'npy'
+    extension = os.path.splitext(data_path)[1].lower()
+    if extension not in DATA_FORMATS:
+        raise ValueError(f"Unsupported data format for {data_path}; expected one of {sorted(DATA_FORMATS)}")
+    return DATA_FORMATS[extension]
+
+def load_data(data_path, columns=None):
     """
     Load the healthcare dataset from a specified path.
+    The format is detected from the path; Parquet and Feather files are read
+    column-wise and memory-mapped, so only the requested columns are touched.
     Args:
-    - data_path (str): Path to the dataset (CSV file).
+    - data_path (str): Path to the dataset (CSV, Parquet or Feather file, or .npy directory).
+    - columns (list, optional): Columns to load; all columns by default.
 
     Returns:
     - pd.DataFrame: Loaded dataset.
     """
-    df = pd.read_csv(data_path)
+    fmt = detect_format(data_path)
+    if fmt == 'csv':
+        df = pd.read_csv(data_path, usecols=columns)
+    elif fmt == 'parquet':
+        df = pd.read_parquet(data_path, columns=columns, memory_map=True)
+    elif fmt == 'feather':
+        from pyarrow import feather  # pandas' read_feather does not expose memory mapping
+        df = feather.read_table(data_path, columns=columns, memory_map=True).to_pandas()
+    else:
+        X, y, feature_names = load_arrays(data_path)
+        df = pd.DataFrame(X, columns=feature_names)
+        df['target'] = y
+        if columns is not None:
+            df = df[columns]
     print(f"Data loaded from {data_path}. Shape: {df.shape}")
     return df
 
-def preprocess_data(df):
+def load_arrays(data_path, columns=None):
+    """
+    Load processed data as a feature matrix and target array.
+    For an .npy directory the arrays are memory-mapped read-only and nothing
+    is read from disk until it is used.
+
+    Args:
+    - data_path (str): Path to processed data in any supported format.
+    - columns (list, optional): Feature columns to load; all features by default.
+
+    Returns:
+    - X (np.ndarray): Feature matrix of shape (n_rows, n_features).
+    - y (np.ndarray): Target array.
+    - feature_names (list): Column names of X.
+    """
+    if detect_format(data_path) != 'npy':
+        df = load_data(data_path, columns=None if columns is None else list(columns) + ['target'])
+        y = df.pop('target').to_numpy()
+        return df.to_numpy(), y, list(df.columns)
+
+    with open(os.path.join(data_path, 'columns.json')) as f:
+        feature_names = json.load(f)
+    X = np.load(os.path.join(data_path, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_path, 'y.npy'), mmap_mode='r')
+    if columns is not None:
+        X = X[:, [feature_names.index(column) for column in columns]]
+        feature_names = list(columns)
+    return X, y, feature_names
+
+def save_processed(X, y, feature_names, output_path):
+    """
+    Save processed features and target in the format given by the output path.
+    The .npy format stores X as a C-ordered float32 matrix next to y and the
+    column names; Feather files are written uncompressed so they can be memory-mapped.
+
+    Args:
+    - X (np.ndarray): Processed feature matrix.
+    - y (pd.Series or np.ndarray): Target variable.
+    - feature_names (list): Column names of X.
+    - output_path (str): Destination file, or directory for the .npy format.
+    """
+    writer = ProcessedDataWriter(output_path, feature_names, n_rows=len(X))
+    writer.write(X, y)
+    writer.close()
+    print(f"Processed data saved to {output_path}.")
+
+class ProcessedDataWriter:
+    """
+    Writes processed data in chunks to any supported format, so streaming
+    preprocessing never holds the full dataset in memory.
+    """
+
+    def __init__(self, output_path, feature_names, n_rows):
+        self.output_path = output_path
+        self.feature_names = list(feature_names)
+        self.n_rows = n_rows
+        self.fmt = detect_format(output_path)
+        self.rows_written = 0
+        self._writer = None
+        self._schema = None
+        self._X = None
+        self._y = None
+
+    def write(self, X, y):
+        """
+        Append a chunk of features (array or DataFrame in feature order) and targets.
+        """
+        y = np.asarray(y)
+        if self.fmt == 'npy':
+            self._write_arrays(np.asarray(X, dtype=np.float32), y)
+        else:
+            frame = pd.DataFrame(np.asarray(X), columns=self.feature_names)
+            frame['target'] = y
+            self._write_frame(frame)
+        self.rows_written += len(y)
+
+    def _write_arrays(self, X, y):
+        if self._X is None:
+            os.makedirs(self.output_path, exist_ok=True)
+            self._X = open_memmap(os.path.join(self.output_path, 'X.npy'), mode='w+',
+                                  dtype=np.float32, shape=(self.n_rows, len(self.feature_names)))
+            self._y = open_memmap(os.path.join(self.output_path, 'y.npy'), mode='w+',
+                                  dtype=y.dtype, shape=(self.n_rows,))
+            with open(os.path.join(self.output_path, 'columns.json'), 'w') as f:
+                json.dump(self.feature_names, f)
+        self._X[self.rows_written:self.rows_written + len(y)] = X
+        self._y[self.rows_written:self.rows_written + len(y)] = y
+
+    def _write_frame(self, frame):
+        if self.fmt == 'csv':
+            frame.to_csv(self.output_path, mode='a' if self.rows_written else 'w',
+                         header=not self.rows_written, index=False)
+            return
+        import pyarrow as pa  # Optional dependency, only needed for Parquet/Feather output
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._schema = table.schema
+            if self.fmt == 'parquet':
+                self._writer = pq.ParquetWriter(self.output_path, self._schema)
+            else:
+                # Feather V2 is the Arrow IPC file format; left uncompressed so readers can memory-map it
+                self._writer = pa.ipc.new_file(self.output_path, self._schema)
+        self._writer.write_table(table.cast(self._schema))
+
+    def close(self):
+        """
+        Flush and close the output.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._X is not None:
+            self._X.flush()
+            self._y.flush()
+            self._X = self._y = None
+
+# Version of the persisted preprocessing parameters; bump when the layout changes
+PREPROCESSING_FORMAT_VERSION = 1
+
+def preprocessing_path_for(path):
+    """
+    Return the path of the preprocessing parameters that accompany processed data or a model artifact.
+
+    Args:
+    - path (str): Path of the processed data or model (e.g. '../models/model_v1.pkl').
+
+    Returns:
+    - str: Path of the JSON parameters (e.g. '../models/model_v1.preprocessing.json').
+    """
+    return os.path.splitext(path.rstrip(os.sep))[0] + '.preprocessing.json'
+
+def fit_preprocessing(df):
+    """
+    Fit imputation and scaling parameters on a raw dataset.
+    Non-numeric columns are dropped, missing values are imputed with the column
+    mean, and features are standardized as by a StandardScaler.
+
+    Args:
+    - df (pd.DataFrame): The raw dataset, including the 'target' column.
+
+    Returns:
+    - params (dict): Feature order, imputation values and scaler mean and scale.
+    """
+    X = df.select_dtypes(include=[np.number]).drop(columns=['target'])
+    impute_values = X.mean()
+    scaler = StandardScaler().fit(X.fillna(impute_values))
+    return make_preprocessing_params(X.columns, impute_values, scaler.mean_, scaler.scale_)
+
+def make_preprocessing_params(feature_names, impute_values, mean, scale):
+    """
+    Assemble preprocessing parameters in their persisted layout.
+    """
+    return {
+        'format_version': PREPROCESSING_FORMAT_VERSION,
+        'feature_names': [str(name) for name in feature_names],
+        'impute_values': np.asarray(impute_values, dtype=np.float64).tolist(),
+        'mean': np.asarray(mean, dtype=np.float64).tolist(),
+        'scale': np.asarray(scale, dtype=np.float64).tolist(),
+    }
+
+def apply_preprocessing(df, params):
+    """
+    Impute and scale the features of a dataset with fitted parameters.
+
+    Args:
+    - df (pd.DataFrame): Dataset containing (at least) the fitted feature columns.
+    - params (dict): Parameters returned by `fit_preprocessing`.
+
+    Returns:
+    - X (np.ndarray): Preprocessed features in the fitted column order.
+    """
+    X = df[params['feature_names']].to_numpy(dtype=np.float64)
+    X = np.where(np.isnan(X), np.asarray(params['impute_values']), X)
+    return (X - np.asarray(params['mean'])) / np.asarray(params['scale'])
+
+def save_preprocessing(params, path):
+    """
+    Save fitted preprocessing parameters as JSON.
+    """
+    with open(path, 'w') as f:
+        json.dump(params, f, indent=2)
+    print(f"Preprocessing parameters saved to {path}.")
+
+def load_preprocessing(path):
+    """
+    Load preprocessing parameters saved by `save_preprocessing`.
+
+    Args:
+    - path (str): Path of the JSON parameters.
+
+    Returns:
+    - params (dict): The fitted parameters.
+    """
+    with open(path) as f:
+        params = json.load(f)
+    if params.get('format_version') != PREPROCESSING_FORMAT_VERSION:
+        raise ValueError(f"Unsupported preprocessing format version {params.get('format_version')} in {path}")
+    return params
+
+def preprocess_data(df, params=None):
     """
     Preprocess the data by handling missing values, encoding categorical variables,
     and scaling the features.
     
     Args:
     - df (pd.DataFrame): The raw dataset to preprocess.
+    - params (dict, optional): Fitted parameters to apply; fitted on `df` when omitted.
     
     Returns:
-    - X (pd.DataFrame): Preprocessed feature set.
+    - X (np.ndarray): Preprocessed feature set.
     - y (pd.Series): Target variable.
     """
-    # Drop non-numeric columns (assuming 'target' is the target variable)
-    df = df.select_dtypes(include=[np.number])
-
-    # Handle missing values by filling with the mean (or you could choose another strategy)
-    df.fillna(df.mean(), inplace=True)
+    if params is None:
+        params = fit_preprocessing(df)
+    X_scaled = apply_preprocessing(df, params)
 
-    # Separate features and target variable
-    X = df.drop(columns=['target'])
-    y = df['target']
-
-    # Feature scaling (StandardScaler standardizes the features)
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # Missing targets are filled with the mean, as for the features
+    y = df['target'].fillna(df['target'].mean())
 
     return X_scaled, y
 
@@ -66,20 +306,339 @@ def split_data(X, y, test_size=0.3, random_state=42):
     print(f"Data split into training and test sets with {X_train.shape[0]} training samples and {X_test.shape[0]} test samples.")
     return X_train, X_test, y_train, y_test
 
+class RunningStats:
+    """
+    Per-column count, mean and sum of squared deviations of the non-missing
+    values seen so far. Statistics of separate chunks can be merged exactly
+    (Chan et al.'s parallel variance update), so a dataset can be summarized
+    in one pass without holding it in memory.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.count = np.zeros(len(self.columns))
+        self.mean = np.zeros(len(self.columns))
+        self.m2 = np.zeros(len(self.columns))
+
+    def update(self, chunk):
+        """
+        Add the values of a DataFrame chunk containing (at least) the tracked columns.
+        """
+        values = chunk[self.columns].to_numpy(dtype=np.float64)
+        other = RunningStats(self.columns)
+        other.count = np.sum(~np.isnan(values), axis=0).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            other.mean = np.where(other.count > 0, np.nansum(values, axis=0) / other.count, 0.0)
+        other.m2 = np.nansum((values - other.mean) ** 2, axis=0)
+        self.merge(other)
+
+    def merge(self, other):
+        """
+        Merge the statistics of another RunningStats over the same columns.
+        """
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(total > 0, self.mean + delta * other.count / total, 0.0)
+            self.m2 = self.m2 + other.m2 + np.where(total > 0, delta ** 2 * self.count * other.count / total, 0.0)
+        self.count = total
+
+    def means(self):
+        """
+        Column means of the non-missing values (NaN for columns with no values).
+        """
+        return pd.Series(np.where(self.count > 0, self.mean, np.nan), index=self.columns)
+
+    def imputed_std(self, n_rows):
+        """
+        Population standard deviation of each column after missing values are
+        filled with the column mean; imputed values add no squared deviation.
+        """
+        return pd.Series(np.sqrt(self.m2 / n_rows), index=self.columns)
+
+
+def compute_column_stats(data_path, chunksize=100000):
+    """
+    First pass of streaming preprocessing: summarize the numeric columns of a CSV file.
+
+    Args:
+    - data_path (str): Path to the dataset (CSV file).
+    - chunksize (int): Number of rows read per chunk.
+
+    Returns:
+    - stats (RunningStats): Statistics of the columns that are numeric in every chunk.
+    - n_rows (int): Total number of rows.
+    """
+    stats = None
+    numeric_columns = None
+    n_rows = 0
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        chunk_numeric = list(chunk.select_dtypes(include=[np.number]).columns)
+        if stats is None:
+            stats = RunningStats(chunk_numeric)
+            numeric_columns = set(chunk_numeric)
+        numeric_columns &= set(chunk_numeric)
+        # Columns that are not numeric in this chunk will be dropped; blank them for now
+        frame = chunk.reindex(columns=stats.columns)
+        frame[[column for column in stats.columns if column not in chunk_numeric]] = np.nan
+        stats.update(frame)
+        n_rows += len(chunk)
+
+    if stats is None:
+        raise ValueError(f"No rows found in {data_path}")
+
+    # Keep only columns that were numeric in every chunk, in file order
+    keep = [i for i, column in enumerate(stats.columns) if column in numeric_columns]
+    kept = RunningStats([stats.columns[i] for i in keep])
+    kept.count, kept.mean, kept.m2 = stats.count[keep], stats.mean[keep], stats.m2[keep]
+    print(f"Column statistics computed over {n_rows} rows of {data_path}.")
+    return kept, n_rows
+
+
+def preprocess_streaming(data_path, output_path, chunksize=100000, params=None):
+    """
+    Preprocess a CSV file too large for memory in two passes: compute column
+    means and variances, then impute, scale and write the output chunk by chunk.
+    Results match `preprocess_data` on the full dataset, and the fitted
+    parameters are saved next to the output (see `preprocessing_path_for`).
+
+    Args:
+    - data_path (str): Path to the raw dataset (CSV file).
+    - output_path (str): Path of the processed data; the format follows the extension (see `detect_format`).
+    - chunksize (int): Number of rows held in memory at a time.
+    - params (dict, optional): Fitted parameters to apply instead of fitting new ones.
+
+    Returns:
+    - n_rows (int): Number of rows written.
+    """
+    stats, n_rows = compute_column_stats(data_path, chunksize)
+    means = stats.means()
+    feature_columns = [column for column in stats.columns if column != 'target']
+    scale = stats.imputed_std(n_rows)[feature_columns]
+    scale[scale == 0] = 1.0  # Same convention as StandardScaler for constant columns
+
+    if params is None:
+        params = make_preprocessing_params(feature_columns, means[feature_columns], means[feature_columns], scale)
+    save_preprocessing(params, preprocessing_path_for(output_path))
+
+    writer = ProcessedDataWriter(output_path, params['feature_names'], n_rows)
+    for chunk in pd.read_csv(data_path, chunksize=chunksize):
+        writer.write(apply_preprocessing(chunk, params), chunk['target'].fillna(means['target']))
+    writer.close()
+
+    print(f"Processed data ({n_rows} rows) streamed to {output_path}.")
+    return n_rows
+
+
+# Where content-addressed train/test datasets are cached
+DEFAULT_CACHE_DIR = '../data/processed/cache'
+
+def hash_file(path, block_size=1 << 20):
+    """
+    Return the SHA-256 hex digest of a file's contents, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def dataset_cache_key(data_path, test_size=0.3, random_state=42, params=None):
+    """
+    Content address of a preprocessed dataset: a hash of the raw input and of
+    every setting that changes the output. Streaming and in-memory
+    preprocessing produce the same dataset, so the mode is not part of the key.
+
+    Args:
+    - data_path (str): Path to the raw dataset (CSV file).
+    - test_size (float): Proportion of the data held out for testing.
+    - random_state (int): Seed of the train/test split.
+    - params (dict, optional): Fixed preprocessing parameters, when not fitted on the input.
+
+    Returns:
+    - key (str): Hex digest identifying the dataset.
+    """
+    config = {
+        'format_version': PREPROCESSING_FORMAT_VERSION,
+        'input_sha256': hash_file(data_path),
+        'test_size': test_size,
+        'random_state': random_state,
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+def build_dataset(data_path, cache_dir=DEFAULT_CACHE_DIR, test_size=0.3, random_state=42,
+                  streaming=False, chunksize=100000, params=None):
+    """
+    Preprocess and split a raw dataset once, caching the result by content.
+    The dataset directory holds memory-mapped 'train' and 'test' arrays (see
+    `load_arrays`), the fitted preprocessing parameters and a manifest. When a
+    dataset with the same key already exists, nothing is recomputed.
+
+    Args:
+    - data_path (str): Path to the raw dataset (CSV file).
+    - cache_dir (str): Directory holding cached datasets.
+    - test_size (float): Proportion of the data held out for testing.
+    - random_state (int): Seed of the train/test split.
+    - streaming (bool): Preprocess in chunks of `chunksize` rows instead of in memory.
+    - chunksize (int): Number of rows held in memory at a time when streaming.
+    - params (dict, optional): Preprocessing parameters to apply instead of fitting
+      new ones, e.g. those of a model that is trained further on new data.
+
+    Returns:
+    - dataset_dir (str): Path of the cached dataset.
+    """
+    key = dataset_cache_key(data_path, test_size, random_state, params)
+    dataset_dir = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(dataset_dir, 'manifest.json')):
+        print(f"Dataset cache hit for {data_path}: {dataset_dir}")
+        return dataset_dir
+
+    # Build in a scratch directory and rename it into place, so an interrupted
+    # run never leaves a partial dataset behind under the final key
+    os.makedirs(cache_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f'{key}.', dir=cache_dir)
+    try:
+        if streaming:
+            all_path = os.path.join(build_dir, 'all')
+            n_rows = preprocess_streaming(data_path, all_path, chunksize, params)
+            X, y, feature_names = load_arrays(all_path)
+            splitter = ShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+            # Same indices as train_test_split, without materializing the data
+            train_index, test_index = next(splitter.split(np.empty((n_rows, 1))))
+            for name, index in (('train', train_index), ('test', test_index)):
+                writer = ProcessedDataWriter(os.path.join(build_dir, name), feature_names, len(index))
+                for start in range(0, len(index), chunksize):
+                    rows = index[start:start + chunksize]
+                    writer.write(X[rows], y[rows])
+                writer.close()
+            del X, y
+            shutil.rmtree(all_path)
+            os.replace(preprocessing_path_for(all_path), os.path.join(build_dir, 'preprocessing.json'))
+        else:
+            df = load_data(data_path)
+            if params is None:
+                params = fit_preprocessing(df)
+            X, y = preprocess_data(df, params)
+            X_train, X_test, y_train, y_test = split_data(X, y, test_size, random_state)
+            save_processed(X_train, y_train, params['feature_names'], os.path.join(build_dir, 'train'))
+            save_processed(X_test, y_test, params['feature_names'], os.path.join(build_dir, 'test'))
+            save_preprocessing(params, os.path.join(build_dir, 'preprocessing.json'))
+
+        manifest = {
+            'key': key,
+            'source': os.path.abspath(data_path),
+            'input_sha256': hash_file(data_path),
+            'test_size': test_size,
+            'random_state': random_state,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        with open(os.path.join(build_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(build_dir, dataset_dir)
+        except OSError:
+            # Another run finished the same dataset first; its result is identical
+            shutil.rmtree(build_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    print(f"Dataset for {data_path} cached in {dataset_dir}")
+    return dataset_dir
+
+def dataset_record_path_for(model_path):
+    """
+    Return the path of the record of the cached dataset a model was trained on.
+
+    Args:
+    - model_path (str): Path of the model (e.g. '../models/model_v1.pkl').
+
+    Returns:
+    - str: Path of the JSON record (e.g. '../models/model_v1.dataset.json').
+    """
+    return os.path.splitext(model_path)[0] + '.dataset.json'
+
+def save_dataset_record(dataset_dir, model_path):
+    """
+    Record next to a model which cached dataset it was trained on, so validation
+    reuses the same held-out split instead of preprocessing the input again.
+
+    Args:
+    - dataset_dir (str): Path of the cached dataset built by `build_dataset`.
+    - model_path (str): Path of the model trained on it.
+    """
+    with open(dataset_record_path_for(model_path), 'w') as f:
+        json.dump({'dataset_dir': os.path.abspath(dataset_dir)}, f, indent=2)
+
+def find_model_dataset(model_path, data_path):
+    """
+    Return the cached dataset a model was trained on, if it is still cached and
+    was built from the current contents of `data_path`.
+
+    Args:
+    - model_path (str): Path of the model.
+    - data_path (str): Path to the raw dataset (CSV file).
+
+    Returns:
+    - dataset_dir (str or None): Path of the cached dataset, or None when there is none to reuse.
+    """
+    record_path = dataset_record_path_for(model_path)
+    if not os.path.exists(record_path):
+        return None
+    with open(record_path) as f:
+        dataset_dir = json.load(f)['dataset_dir']
+    manifest_path = os.path.join(dataset_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('input_sha256') != hash_file(data_path):
+        return None
+    return dataset_dir
+
+def load_dataset(dataset_dir):
+    """
+    Load a cached dataset built by `build_dataset`; the arrays are memory-mapped.
+
+    Args:
+    - dataset_dir (str): Path of the cached dataset.
+
+    Returns:
+    - X_train (np.ndarray): Training features.
+    - X_test (np.ndarray): Testing features.
+    - y_train (np.ndarray): Training target.
+    - y_test (np.ndarray): Testing target.
+    - params (dict): The fitted preprocessing parameters.
+    """
+    X_train, y_train, _ = load_arrays(os.path.join(dataset_dir, 'train'))
+    X_test, y_test, _ = load_arrays(os.path.join(dataset_dir, 'test'))
+    params = load_preprocessing(os.path.join(dataset_dir, 'preprocessing.json'))
+    return X_train, X_test, y_train, y_test, params
+
+
 if __name__ == "__main__":
-    # Define data path
-    data_path = "../data/synthetic_fhir_data.csv"
-    
-    # Load and preprocess data
-    df = load_data(data_path)
-    X, y = preprocess_data(df)
-    
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = split_data(X, y)
-    
-    # Save the processed data for future use
-    processed_data_path = "../data/processed/processed_data.csv"
-    processed_df = pd.DataFrame(X_train, columns=df.drop(columns=['target']).columns)
-    processed_df['target'] = y_train
-    processed_df.to_csv(processed_data_path, index=False)
-    print(f"Processed data saved to {processed_data_path}.")
+    parser = argparse.ArgumentParser(description="Preprocess the healthcare dataset.")
+    parser.add_argument("--data-path", default="../data/synthetic_fhir_data.csv")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Directory of cached train/test datasets, keyed by input content and settings")
+    parser.add_argument("--output-path", default=None,
+                        help="Instead of the dataset cache, write all processed rows to this file "
+                             "(.csv, .parquet, .feather) or .npy directory")
+    parser.add_argument("--test-size", type=float, default=0.3)
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--streaming", action="store_true",
+                        help="Process the CSV in chunks with memory bounded by --chunksize")
+    parser.add_argument("--chunksize", type=int, default=100000)
+    args = parser.parse_args()
+
+    if args.output_path is None:
+        build_dataset(args.data_path, args.cache_dir, args.test_size, args.random_state,
+                      streaming=args.streaming, chunksize=args.chunksize)
+    elif args.streaming:
+        preprocess_streaming(args.data_path, args.output_path, args.chunksize)
+    else:
+        df = load_data(args.data_path)
+        params = fit_preprocessing(df)
+        X, y = preprocess_data(df, params)
+        save_processed(X, y, params['feature_names'], args.output_path)
+        save_preprocessing(params, preprocessing_path_for(args.output_path))
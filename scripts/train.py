@@ -1,7 +1,11 @@
 # secure-healthcare-ml/scripts/train.py
 
+import argparse
+import contextlib
+import resource
+import time
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.metrics import accuracy_score, confusion_matrix
 from sklearn.model_selection import train_test_split
 import joblib
@@ -12,22 +16,78 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 # Import preprocessing functions
-from scripts.preprocess import load_data, preprocess_data, split_data
+from scripts.preprocess import (
+    DEFAULT_CACHE_DIR, build_dataset, load_dataset, load_preprocessing, preprocessing_path_for, save_dataset_record,
+    save_preprocessing,
+)
+from scripts.compile_model import compile_forest, compiled_path_for, save_compiled
+from explainability.registry import background_path_for, save_background
 
-def train_model(X_train, y_train):
+# Estimators selectable for training; histogram-based boosting scales better to large row counts
+ESTIMATORS = ("random_forest", "hist_gradient_boosting")
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def count_trees(model):
     """
-    Train a RandomForest model on the provided data.
+    Return the number of fitted trees in a tree ensemble.
+    """
+    if isinstance(model, HistGradientBoostingClassifier):
+        return model.n_iter_ * model.n_trees_per_iteration_
+    return len(model.estimators_)
+
+def train_model(X_train, y_train, estimator="random_forest", n_estimators=100, n_jobs=-1, backend=None,
+                base_model=None, params=None):
+    """
+    Train a RandomForest model on the provided data, or optionally a
+    histogram-based gradient boosting model, and report fit time, trees/sec
+    and peak memory.
     
     Args:
     - X_train (np.ndarray): Training features.
     - y_train (pd.Series): Training target.
+    - estimator (str): One of ESTIMATORS.
+    - n_estimators (int): Number of trees (boosting iterations) to fit.
+    - n_jobs (int): Number of cores used to build the forest; -1 uses all cores.
+    - backend (str, optional): joblib parallel backend, e.g. 'loky' or 'threading'.
+    - base_model (optional): A fitted model to extend with `n_estimators` more
+      trees fitted on this data (warm start) instead of training from scratch.
+    - params (dict, optional): Further hyperparameters of the estimator, e.g. from tuning.
     
     Returns:
     - model (sklearn.ensemble.RandomForestClassifier): Trained model.
     """
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    if base_model is not None:
+        model = base_model
+        trees_before = count_trees(model)
+        if isinstance(model, HistGradientBoostingClassifier):
+            model.set_params(warm_start=True, max_iter=model.n_iter_ + n_estimators)
+        else:
+            model.set_params(warm_start=True, n_estimators=trees_before + n_estimators, n_jobs=n_jobs)
+    elif estimator == "hist_gradient_boosting":
+        trees_before = 0
+        model = HistGradientBoostingClassifier(max_iter=n_estimators, random_state=42, **(params or {}))
+    elif estimator == "random_forest":
+        trees_before = 0
+        model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs, **(params or {}))
+    else:
+        raise ValueError(f"Unknown estimator '{estimator}'; expected one of {ESTIMATORS}")
+
+    started = time.perf_counter()
+    with joblib.parallel_backend(backend) if backend else contextlib.nullcontext():
+        model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    trees = count_trees(model) - trees_before
     print(f"Model trained with {X_train.shape[0]} samples.")
+    print(f"Fit time: {fit_seconds:.2f}s, {trees} trees added ({trees / fit_seconds:.1f} trees/sec), "
+          f"peak RSS: {peak_rss_mb():.0f} MiB")
     return model
 
 def evaluate_model(model, X_test, y_test):
@@ -64,20 +124,50 @@ def save_model(model, model_path):
     print(f"Model saved to {model_path}")
 
 if __name__ == "__main__":
-    # Load and preprocess data
-    data_path = "../data/processed/processed_data.csv"
-    df = load_data(data_path)
-    X, y = preprocess_data(df)
-    
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = split_data(X, y)
+    parser = argparse.ArgumentParser(description="Train the healthcare risk model.")
+    parser.add_argument("--data-path", default="../data/synthetic_fhir_data.csv", help="Raw dataset (CSV file)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of cached train/test datasets")
+    parser.add_argument("--model-path", default="../models/model_v1.pkl")
+    parser.add_argument("--estimator", choices=ESTIMATORS, default="random_forest")
+    parser.add_argument("--n-estimators", type=int, default=100,
+                        help="Trees (boosting iterations) to fit, or to add when warm starting")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Cores used for training; -1 uses all cores")
+    parser.add_argument("--backend", default=None, help="joblib parallel backend (e.g. loky, threading)")
+    parser.add_argument("--warm-start-from", default=None,
+                        help="Existing model to extend with trees fitted on --data-path, reusing its preprocessing")
+    parser.add_argument("--compile", action="store_true",
+                        help="Also save the forest flattened for the API's compiled prediction engine")
+    args = parser.parse_args()
+
+    # New data is preprocessed with the base model's parameters so old and new trees see the same features
+    base_model, params = None, None
+    if args.warm_start_from:
+        base_model = joblib.load(args.warm_start_from)
+        params = load_preprocessing(preprocessing_path_for(args.warm_start_from))
+
+    # Preprocess and split once; later runs on the same input load the cached arrays
+    dataset_dir = build_dataset(args.data_path, args.cache_dir, params=params)
+    X_train, X_test, y_train, y_test, params = load_dataset(dataset_dir)
     
     # Train model
-    model = train_model(X_train, y_train)
+    model = train_model(X_train, y_train, args.estimator, args.n_estimators, args.n_jobs, args.backend, base_model)
     
     # Evaluate model
     accuracy, cm = evaluate_model(model, X_test, y_test)
     
     # Save trained model
-    model_path = "../models/model_v1.pkl"
+    model_path = args.model_path
     save_model(model, model_path)
+
+    # Ship the fitted preprocessing parameters with the model so serving applies the same transform
+    save_preprocessing(params, preprocessing_path_for(model_path))
+
+    # Point validation at the cached split the model was trained and evaluated on
+    save_dataset_record(dataset_dir, model_path)
+
+    # Persist a summarized SHAP background set for non-tree explainers
+    save_background(X_train, background_path_for(model_path))
+
+    # Flatten the forest for the API's compiled prediction engine
+    if args.compile:
+        save_compiled(compile_forest(model), compiled_path_for(model_path))
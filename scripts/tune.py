@@ -0,0 +1,235 @@
+# secure-healthcare-ml/scripts/tune.py
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, StratifiedKFold
+
+# Adding the path to the src folder (or where your modules are located)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from scripts.preprocess import (
+    DEFAULT_CACHE_DIR, build_dataset, load_arrays, load_dataset, preprocessing_path_for, save_dataset_record,
+    save_preprocessing,
+)
+from scripts.train import evaluate_model, save_model, train_model
+from explainability.registry import background_path_for, save_background
+
+# RandomForest hyperparameters sampled by the search; n_estimators is the halving resource
+PARAM_DISTRIBUTIONS = {
+    'max_depth': [None, 5, 10, 20, 40],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4, 8],
+    'max_features': ['sqrt', 'log2', 0.5, 1.0],
+    'class_weight': [None, 'balanced'],
+}
+
+# Training split of the dataset being tuned, memory-mapped once per worker process
+_X = None
+_y = None
+
+
+def sample_candidates(n_candidates, random_state=42):
+    """
+    Draw hyperparameter candidates from PARAM_DISTRIBUTIONS.
+    The same seed always yields the same candidates, so resumed searches line up with their cache.
+
+    Args:
+    - n_candidates (int): Number of candidates to draw.
+    - random_state (int): Seed of the sampler.
+
+    Returns:
+    - candidates (list): Parameter dicts.
+    """
+    return list(ParameterSampler(PARAM_DISTRIBUTIONS, n_iter=n_candidates, random_state=random_state))
+
+
+def halving_schedule(n_candidates, min_resource, max_resource, factor=3):
+    """
+    Plan the rungs of successive halving: each rung keeps the best 1/factor of
+    the candidates and gives them factor times more trees, up to max_resource.
+
+    Returns:
+    - rungs (list): (n_candidates, n_estimators) per rung.
+    """
+    rungs = []
+    n, resource = n_candidates, min_resource
+    while True:
+        rungs.append((n, min(resource, max_resource)))
+        if n <= 1 or resource >= max_resource:
+            return rungs
+        n, resource = max(1, math.ceil(n / factor)), resource * factor
+
+
+def fold_cache_key(dataset_key, params, n_estimators, fold, n_splits, scoring, random_state):
+    """
+    Identify a single fold evaluation by everything that determines its score.
+    """
+    task = {
+        'dataset': dataset_key, 'params': params, 'n_estimators': n_estimators, 'fold': fold,
+        'n_splits': n_splits, 'scoring': scoring, 'random_state': random_state,
+    }
+    return hashlib.sha256(json.dumps(task, sort_keys=True).encode()).hexdigest()[:24]
+
+
+def _init_worker(dataset_dir):
+    """
+    Map the training split in each worker; the pages are shared through the OS page cache.
+    """
+    global _X, _y
+    _X, _y, _ = load_arrays(os.path.join(dataset_dir, 'train'))
+
+
+def _evaluate_fold(params, n_estimators, fold, n_splits, scoring, random_state, result_path):
+    """
+    Fit one candidate on one cross-validation fold and record its score on disk.
+    """
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    train_index, test_index = list(folds.split(np.zeros(len(_y)), _y))[fold]
+
+    started = time.perf_counter()
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=random_state, n_jobs=1, **params)
+    model.fit(_X[train_index], _y[train_index])
+    score = float(get_scorer(scoring)(model, _X[test_index], _y[test_index]))
+    result = {'score': score, 'fit_seconds': time.perf_counter() - started}
+
+    # Write atomically so an interrupted search never leaves a truncated result
+    with open(result_path + '.tmp', 'w') as f:
+        json.dump(result, f)
+    os.replace(result_path + '.tmp', result_path)
+    return result
+
+
+def successive_halving(dataset_dir, candidates, output_dir, min_resource=25, max_resource=400, factor=3,
+                       n_splits=3, n_jobs=None, scoring='accuracy', random_state=42, time_budget=None):
+    """
+    Run successive halving over the candidates with every fold of every rung
+    evaluated in a process pool. Fold results are cached in `output_dir`, so
+    rerunning an interrupted search only evaluates the missing folds.
+
+    Args:
+    - dataset_dir (str): Cached dataset built by `build_dataset`.
+    - candidates (list): Hyperparameter dicts to compare.
+    - output_dir (str): Directory for fold results.
+    - min_resource (int): Trees per candidate in the first rung.
+    - max_resource (int): Trees per candidate in the last rung.
+    - factor (int): Fraction of candidates dropped (and growth of trees) per rung.
+    - n_splits (int): Number of cross-validation folds.
+    - n_jobs (int, optional): Worker processes; all cores by default.
+    - scoring (str): scikit-learn scorer name; higher is better.
+    - random_state (int): Seed for folds and forests.
+    - time_budget (float, optional): Seconds after which no further rung is started.
+
+    Returns:
+    - leaderboard (pd.DataFrame): One row per candidate and rung, best first.
+    """
+    dataset_key = os.path.basename(os.path.normpath(dataset_dir))
+    fold_dir = os.path.join(output_dir, 'folds')
+    os.makedirs(fold_dir, exist_ok=True)
+    n_jobs = n_jobs or os.cpu_count()
+    started = time.perf_counter()
+
+    # The total work is fixed up front, so time-to-best-model scales predictably with cores
+    schedule = halving_schedule(len(candidates), min_resource, max_resource, factor)
+    planned_trees = sum(n * n_estimators * n_splits for n, n_estimators in schedule)
+    print(f"Successive halving over {len(candidates)} candidates in {len(schedule)} rungs: "
+          f"{planned_trees} trees on {n_jobs} workers.")
+
+    rows = []
+    survivors = list(range(len(candidates)))
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context,
+                             initializer=_init_worker, initargs=(dataset_dir,)) as pool:
+        for rung, (n_keep, n_estimators) in enumerate(schedule):
+            survivors = survivors[:n_keep]
+            scores = {index: [None] * n_splits for index in survivors}
+            futures = {}
+            cached = 0
+            for index in survivors:
+                for fold in range(n_splits):
+                    key = fold_cache_key(dataset_key, candidates[index], n_estimators, fold, n_splits,
+                                         scoring, random_state)
+                    result_path = os.path.join(fold_dir, key + '.json')
+                    if os.path.exists(result_path):
+                        with open(result_path) as f:
+                            scores[index][fold] = json.load(f)['score']
+                        cached += 1
+                        continue
+                    future = pool.submit(_evaluate_fold, candidates[index], n_estimators, fold, n_splits,
+                                         scoring, random_state, result_path)
+                    futures[future] = (index, fold)
+            for future in as_completed(futures):
+                index, fold = futures[future]
+                scores[index][fold] = future.result()['score']
+
+            for index in survivors:
+                rows.append({
+                    'candidate': index, 'rung': rung, 'n_estimators': n_estimators,
+                    'mean_score': float(np.mean(scores[index])), 'std_score': float(np.std(scores[index])),
+                    'params': json.dumps(candidates[index], sort_keys=True),
+                })
+            survivors.sort(key=lambda index: -np.mean(scores[index]))
+
+            elapsed = time.perf_counter() - started
+            print(f"Rung {rung}: {len(survivors)} candidates x {n_estimators} trees x {n_splits} folds "
+                  f"({cached} folds cached), best {scoring} {np.mean(scores[survivors[0]]):.4f}, "
+                  f"{elapsed:.1f}s elapsed")
+            if time_budget is not None and elapsed >= time_budget:
+                print(f"Time budget of {time_budget:.0f}s reached; stopping after rung {rung}.")
+                break
+
+    # Deeper rungs used more trees, so rank by rung first, then by score
+    leaderboard = pd.DataFrame(rows).sort_values(['rung', 'mean_score'], ascending=[False, False])
+    return leaderboard.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the healthcare risk model hyperparameters.")
+    parser.add_argument("--data-path", default="../data/synthetic_fhir_data.csv", help="Raw dataset (CSV file)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of cached train/test datasets")
+    parser.add_argument("--output-dir", default="../models/tuning",
+                        help="Directory for cached fold results and the leaderboard")
+    parser.add_argument("--model-path", default="../models/model_v1.pkl")
+    parser.add_argument("--n-candidates", type=int, default=27)
+    parser.add_argument("--min-resource", type=int, default=25, help="Trees per candidate in the first rung")
+    parser.add_argument("--max-resource", type=int, default=400, help="Trees per candidate in the last rung")
+    parser.add_argument("--factor", type=int, default=3)
+    parser.add_argument("--n-splits", type=int, default=3)
+    parser.add_argument("--n-jobs", type=int, default=None, help="Worker processes; all cores by default")
+    parser.add_argument("--scoring", default="accuracy")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Seconds after which no further rung is started")
+    parser.add_argument("--random-state", type=int, default=42)
+    args = parser.parse_args()
+
+    dataset_dir = build_dataset(args.data_path, args.cache_dir)
+    candidates = sample_candidates(args.n_candidates, args.random_state)
+    leaderboard = successive_halving(
+        dataset_dir, candidates, args.output_dir, args.min_resource, args.max_resource, args.factor,
+        args.n_splits, args.n_jobs, args.scoring, args.random_state, args.time_budget,
+    )
+    leaderboard_path = os.path.join(args.output_dir, "leaderboard.csv")
+    leaderboard.to_csv(leaderboard_path, index=False)
+    print(f"Leaderboard saved to {leaderboard_path}.")
+
+    # Refit the winner on the full training split and evaluate it on the held-out split
+    best = leaderboard.iloc[0]
+    print(f"Best candidate {best['candidate']}: {best['params']} ({args.scoring} {best['mean_score']:.4f})")
+    X_train, X_test, y_train, y_test, params = load_dataset(dataset_dir)
+    model = train_model(X_train, y_train, n_estimators=int(best['n_estimators']), params=json.loads(best['params']))
+    evaluate_model(model, X_test, y_test)
+
+    save_model(model, args.model_path)
+    save_preprocessing(params, preprocessing_path_for(args.model_path))
+    save_dataset_record(dataset_dir, args.model_path)
+    save_background(X_train, background_path_for(args.model_path))
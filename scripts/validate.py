@@ -1,5 +1,6 @@
 # secure-healthcare-ml/scripts/validate.py
 
+import argparse
 import pandas as pd
 import joblib
 from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
@@ -10,7 +11,8 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
 # Import preprocessing functions
-from scripts.preprocess import load_data, preprocess_data, split_data
+from scripts.preprocess import (DEFAULT_CACHE_DIR, build_dataset, find_model_dataset, load_dataset,
+                                load_preprocessing, preprocessing_path_for)
 
 def load_trained_model(model_path):
     """
@@ -26,6 +28,42 @@ def load_trained_model(model_path):
     print(f"Model loaded from {model_path}")
     return model
 
+def load_model_preprocessing(model_path):
+    """
+    Load the preprocessing parameters saved alongside a model artifact.
+
+    Args:
+    - model_path (str): Path to the saved model.
+
+    Returns:
+    - params (dict or None): The model's fitted parameters, or None for models saved without them.
+    """
+    params_path = preprocessing_path_for(model_path)
+    if not os.path.exists(params_path):
+        print(f"No preprocessing parameters found at {params_path}; fitting them on the data instead.")
+        return None
+    return load_preprocessing(params_path)
+
+def load_validation_dataset(model_path, data_path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Return the cached dataset to validate a model on: the one it was trained on
+    when that is still cached for the same input, otherwise one built with the
+    model's preprocessing parameters.
+
+    Args:
+    - model_path (str): Path to the saved model.
+    - data_path (str): Path to the raw dataset (CSV file).
+    - cache_dir (str): Directory holding cached datasets.
+
+    Returns:
+    - dataset_dir (str): Path of the cached dataset.
+    """
+    dataset_dir = find_model_dataset(model_path, data_path)
+    if dataset_dir is not None:
+        print(f"Validating on the dataset the model was trained on: {dataset_dir}")
+        return dataset_dir
+    return build_dataset(data_path, cache_dir, params=load_model_preprocessing(model_path))
+
 def evaluate_model(model, X_test, y_test):
     """
     Evaluate the model's performance using accuracy, confusion matrix, and classification report.
@@ -52,17 +90,18 @@ def evaluate_model(model, X_test, y_test):
     return accuracy, cm, report
 
 if __name__ == "__main__":
-    # Load and preprocess data
-    data_path = "../data/processed/processed_data.csv"
-    df = load_data(data_path)
-    X, y = preprocess_data(df)
-    
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = split_data(X, y)
-    
+    parser = argparse.ArgumentParser(description="Validate the trained healthcare risk model.")
+    parser.add_argument("--data-path", default="../data/synthetic_fhir_data.csv", help="Raw dataset (CSV file)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of cached train/test datasets")
+    parser.add_argument("--model-path", default="../models/model_v1.pkl")
+    args = parser.parse_args()
+
     # Load trained model
-    model_path = "../models/model_v1.pkl"
-    model = load_trained_model(model_path)
+    model = load_trained_model(args.model_path)
+
+    # Load the held-out split, scaled exactly as the model's training data was
+    dataset_dir = load_validation_dataset(args.model_path, args.data_path, args.cache_dir)
+    X_train, X_test, y_train, y_test, params = load_dataset(dataset_dir)
     
     # Evaluate model
     accuracy, cm, report = evaluate_model(model, X_test, y_test)
@@ -0,0 +1,85 @@
+# secure-healthcare-ml/tests/conftest.py
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+
+# Scratch directory holding the reference model and the files the app writes
+_workdir = tempfile.mkdtemp(prefix="secure-healthcare-ml-tests-")
+_reference = {}
+
+def build_synthetic_dataset(n_rows=1000, seed=0):
+    """Build a small FHIR-shaped dataset with missing values, a constant and a text column."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 90, n_rows).astype(float),
+        "bmi": rng.normal(28, 5, n_rows),
+        "systolic_bp": rng.normal(125, 15, n_rows),
+        "site": 1.0,
+        "gender": rng.choice(["male", "female"], n_rows),
+        "target": rng.integers(0, 2, n_rows),
+    })
+    df.loc[rng.random(n_rows) < 0.1, "bmi"] = np.nan
+    df.loc[rng.random(n_rows) < 0.05, "systolic_bp"] = np.nan
+    return df
+
+def pytest_configure(config):
+    """
+    Train a small reference model before any test module imports the app, which
+    loads MODEL_PATH at import, and keep the app's audit spool and caches out of the tree.
+    """
+    os.environ.setdefault("SECRET_KEY", "test-secret-key")
+    os.environ["MODEL_PATH"] = os.path.join(_workdir, "model_v1.pkl")
+    os.environ["AUDIT_SPOOL_PATH"] = os.path.join(_workdir, "audit_spool.ndjson")
+    os.environ["EXPLANATION_CACHE_PATH"] = os.path.join(_workdir, "explanation_cache.sqlite3")
+
+    from benchmarks.data import build_reference_model
+    with contextlib.redirect_stdout(io.StringIO()):
+        _reference.update(build_reference_model(_workdir, n_rows=400, n_estimators=10))
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+@pytest.fixture(scope="class")
+def synthetic_dataset(request):
+    """
+    Builder of raw training datasets, `build_synthetic_dataset(n_rows=1000, seed=0)`;
+    set as the `synthetic_dataset` method of unittest classes using the fixture.
+    """
+    if request.cls is not None:
+        request.cls.synthetic_dataset = staticmethod(build_synthetic_dataset)
+    return build_synthetic_dataset
+
+@pytest.fixture(scope="class")
+def reference_model(request):
+    """
+    The model the app serves, with its training frame, synthetic patients and
+    raw request records; set as `reference` on unittest classes using the fixture.
+    """
+    if request.cls is not None:
+        request.cls.reference = _reference
+    return _reference
+
+@pytest.fixture(scope="class")
+def api_users(request):
+    """
+    Authorization headers of a clinician and an admin, whose user records are
+    served from the auth user cache; set as `headers` and `admin_headers` on unittest classes.
+    """
+    from api import auth
+    headers = {}
+    for username, is_admin in (("clinician", False), ("admin", True)):
+        user = SimpleNamespace(username=username, disabled=False, is_admin=is_admin)
+        auth.user_cache.set(username, user, time.time() + 3600)
+        headers[username] = {"Authorization": f"Bearer {auth.create_access_token({'sub': username})}"}
+    if request.cls is not None:
+        request.cls.headers = headers["clinician"]
+        request.cls.admin_headers = headers["admin"]
+    return headers
@@ -2,8 +2,17 @@
 
 import unittest
 import json
+import shutil
+from unittest import mock
+import numpy as np
+import pytest
 from fastapi.testclient import TestClient
+from api import audit, auth, predict
+from api.explain import explainers, get_explainer
 from api.main import app  # Assuming the FastAPI app is defined in api.main
+from api.registry import registry
+from api.utils import records_to_matrix
+from scripts.preprocess import preprocessing_path_for
 
 class TestAPI(unittest.TestCase):
     
@@ -90,5 +99,180 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"model_status": "loaded"})
 
+@pytest.mark.usefixtures("reference_model", "api_users")
+class TestPredictionEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+        self.records = self.reference["records"][:5]
+
+    def expected_predictions(self, records, version=None):
+        entry = registry.get(version)
+        return entry.predictor.predict(entry.prepare(records_to_matrix(records, entry.feature_names()))).tolist()
+
+    def test_predict(self):
+        """Test that a single record is scored like the same record in a batch."""
+        response = self.client.post("/predict/predict", json={"features": self.records[0]}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["prediction"], self.expected_predictions(self.records[:1])[0])
+
+    def test_predict_requires_token(self):
+        """Test that scoring without a token is rejected."""
+        response = self.client.post("/predict/predict", json={"features": self.records[0]})
+        self.assertEqual(response.status_code, 401)
+
+    def test_predict_invalid_features(self):
+        """Test that missing and non-numeric features are rejected with 400."""
+        record = dict(self.records[0])
+        record.pop("age")
+        response = self.client.post("/predict/predict", json={"features": record}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("age", response.json()["detail"])
+
+        for value in ("invalid_value", "1.5"):
+            record = dict(self.records[0], age=value)
+            response = self.client.post("/predict/predict", json={"features": record}, headers=self.headers)
+            self.assertEqual(response.status_code, 400)
+
+    def test_predict_batch(self):
+        """Test the /predict/batch endpoint returns one prediction per record in input order."""
+        payload = {"records": self.records, "return_probabilities": True}
+        response = self.client.post("/predict/batch", json=payload, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        batch = response.json()
+        self.assertEqual(batch["predictions"], self.expected_predictions(self.records))
+        self.assertEqual(len(batch["probabilities"]), len(self.records))
+
+    def test_predict_batch_missing_feature(self):
+        """Test the /predict/batch endpoint rejects records with missing features."""
+        payload = {"records": [self.records[0], {"age": 60}]}
+        response = self.client.post("/predict/batch", json=payload, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Record 1", response.json()["detail"])
+
+    def test_predict_batch_ndjson(self):
+        """Test that an NDJSON body is scored into one result line per record, in order."""
+        body = "".join(json.dumps(record) + "\n" for record in self.records)
+        response = self.client.post("/predict/batch/ndjson", content=body, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line["prediction"] for line in lines], self.expected_predictions(self.records))
+
+    def test_microbatched_predict(self):
+        """Test that micro-batched single-row predictions match unbatched scoring."""
+        self.addCleanup(predict.batchers.clear)
+        with mock.patch.object(predict, "MICROBATCH_ENABLED", True), TestClient(app) as client:
+            predictions = []
+            for record in self.records:
+                response = client.post("/predict/predict", json={"features": record}, headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                predictions.append(response.json()["prediction"])
+            stats = client.get("/predict/batching/stats", headers=self.headers).json()
+        self.assertEqual(predictions, self.expected_predictions(self.records))
+        self.assertTrue(stats["enabled"])
+        self.assertEqual(stats["requests_total"], len(self.records))
+
+    def test_retired_version_batcher_is_stopped(self):
+        """Test that the micro-batcher of a version retired from another thread is stopped by shutdown."""
+        self.load_second_version()
+        self.addCleanup(predict.batchers.clear)
+        with mock.patch.object(predict, "MICROBATCH_ENABLED", True), TestClient(app) as client:
+            response = client.post("/predict/predict", json={"features": self.records[0]},
+                                   headers={**self.headers, "X-Model-Version": "model_v2"})
+            self.assertEqual(response.status_code, 200)
+            batcher = predict.batchers["model_v2"]
+            registry.remove("model_v2")
+            self.assertNotIn("model_v2", predict.batchers)
+        self.assertIsNone(batcher._worker)
+        self.assertFalse(predict._retiring)
+
+    def test_predict_patients(self):
+        """Test that stored patients are fetched, materialized and scored in request order."""
+        rows = [(patient_id, *patient) for patient_id, patient in enumerate(self.reference["patients"][:3], start=1)]
+        with mock.patch.object(predict.db_utils, "fetch_patients_data", return_value=rows) as fetch:
+            response = self.client.post("/predict/patients", json={"patient_ids": [3, 1]}, headers=self.headers)
+            single = self.client.get("/predict/patient/2", headers=self.headers)
+            missing = self.client.post("/predict/patients", json={"patient_ids": [1, 99]}, headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result["patient_id"] for result in response.json()["results"]], [3, 1])
+        self.assertEqual(fetch.call_args_list[0].args[0], [3, 1])
+        self.assertEqual(single.status_code, 200)
+        self.assertEqual(single.json()["patient_id"], 2)
+        self.assertEqual(missing.status_code, 404)
+
+    def load_second_version(self):
+        v1_path = registry.get("model_v1").path
+        v2_path = v1_path.replace("model_v1", "model_v2")
+        shutil.copy(v1_path, v2_path)
+        shutil.copy(preprocessing_path_for(v1_path), preprocessing_path_for(v2_path))
+        registry.load(v2_path)
+        self.addCleanup(lambda: registry.activate("model_v1"))
+
+    def test_model_versions(self):
+        """Test activating, pinning and rolling back model versions, and retiring one."""
+        self.load_second_version()
+
+        forbidden = self.client.post("/predict/models/model_v2/activate", headers=self.headers)
+        self.assertEqual(forbidden.status_code, 403)
+        activated = self.client.post("/predict/models/model_v2/activate", headers=self.admin_headers)
+        self.assertEqual(activated.json(), {"active_version": "model_v2"})
+
+        features = {"features": self.records[0]}
+        pinned = self.client.post("/predict/predict", json=features,
+                                  headers={**self.headers, "X-Model-Version": "model_v1"})
+        self.assertEqual(pinned.status_code, 200)
+        unknown = self.client.post("/predict/predict", json=features,
+                                   headers={**self.headers, "X-Model-Version": "model_v9"})
+        self.assertEqual(unknown.status_code, 404)
+
+        # Rolling back retires the version rolled back from
+        retired = registry.get("model_v2")
+        rolled_back = self.client.post("/predict/models/rollback", headers=self.admin_headers)
+        self.assertEqual(rolled_back.json(), {"active_version": "model_v1"})
+        self.assertNotIn("model_v2", registry.versions)
+
+        # A request still holding a retired entry is served without recreating its batcher or explainer
+        with mock.patch.object(predict, "MICROBATCH_ENABLED", True):
+            self.assertIsNone(predict.get_batcher(retired))
+        get_explainer(retired)
+        self.assertNotIn("model_v2", explainers)
+        self.assertNotIn("model_v2", predict.batchers)
+
+    def test_audit_records(self):
+        """Test that scored and failed requests are audited with their status and written out at shutdown."""
+        before = audit.audit_log.stats()
+        missing = {name: value for name, value in self.records[0].items() if name != "age"}
+        with TestClient(app) as client:
+            client.post("/predict/predict", json={"features": self.records[0]}, headers=self.headers)
+            client.post("/predict/batch", json={"records": self.records}, headers=self.headers)
+            client.post("/predict/batch", json={"records": [missing]}, headers=self.headers)
+            stats = client.get("/audit/stats", headers=self.headers).json()
+        after = audit.audit_log.stats()
+        self.assertEqual(stats["records_total"] - before["records_total"], 3)
+        self.assertEqual(after["spooled_total"] - before["spooled_total"], 3)
+        self.assertEqual(after["queue_depth"], 0)
+        with open(audit.audit_log.spool_path) as spool:
+            rows = [json.loads(line) for line in spool.readlines()[-3:]]
+        self.assertEqual([(row[2], row[-1]) for row in rows],
+                         [("/predict", 200), ("/predict/batch", 200), ("/predict/batch", 400)])
+
+    def test_metrics(self):
+        """Test that requests are exported as Prometheus metrics per route template."""
+        self.client.get("/predict/patient/abc", headers=self.headers)
+        self.client.post("/predict/predict", json={"features": self.records[0]}, headers=self.headers)
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        response = self.client.get("/metrics", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('route="/predict/predict",status="200"', response.text)
+        self.assertIn('route="/predict/patient/{patient_id}",status="422"', response.text)
+        self.assertIn('stage="predict"', response.text)
+
+        # Prometheus scrapes with the static token
+        with mock.patch.object(auth, "METRICS_TOKEN", "scrape-token"):
+            self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer scrape-token"}).status_code, 200)
+            self.assertEqual(self.client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code, 401)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,188 @@
+# secure-healthcare-ml/tests/test_audit.py
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from fastapi import HTTPException
+from api.audit import AuditLog, hash_inputs
+
+class FakeWriter:
+    """Collects written batches, failing while `fail` is set."""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    async def __call__(self, rows):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.batches.append(rows)
+
+class TestAuditLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spool_path = os.path.join(self.tmp.name, "audit_spool.ndjson")
+        self.writer = FakeWriter()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_log(self, **kwargs):
+        kwargs.setdefault("batch_size", 3)
+        kwargs.setdefault("flush_interval", 0.01)
+        return AuditLog(self.writer, spool_path=self.spool_path, **kwargs)
+
+    def record(self, log, n, start=0):
+        for i in range(start, start + n):
+            log.record("/predict", "alice", "model_v1", {"age": i, "bmi": 25.0}, i % 2, 0.002)
+
+    def test_records_written_in_batches(self):
+        """Test that queued records are written in batches with hashed inputs."""
+        log = self.make_log()
+
+        async def run():
+            await log.start()
+            self.record(log, 7)
+            await log.stop()
+
+        asyncio.run(run())
+        self.assertEqual([len(batch) for batch in self.writer.batches], [3, 3, 1])
+        recorded_at, username, endpoint, version, input_hash, output, latency_ms, status = self.writer.batches[0][0]
+        self.assertEqual((username, endpoint, version, output, status), ("alice", "/predict", "model_v1", "0", 200))
+        self.assertEqual(input_hash, hash_inputs({"bmi": 25.0, "age": 0}))
+        self.assertAlmostEqual(latency_ms, 2.0)
+        self.assertIsNotNone(recorded_at.tzinfo)
+        self.assertEqual(log.stats()["written_total"], 7)
+
+    def test_failed_writes_spool_and_replay(self):
+        """Test that records are spooled while the database fails and replayed once it recovers."""
+        log = self.make_log()
+        self.writer.fail = True
+        self.record(log, 4)
+        asyncio.run(log.stop())
+        self.assertTrue(os.path.exists(self.spool_path))
+        self.assertEqual(log.stats()["spooled_total"], 4)
+
+        self.writer.fail = False
+        self.record(log, 2, start=4)
+        asyncio.run(log.stop())
+        written = [row for batch in self.writer.batches for row in batch]
+        self.assertEqual(len(written), 6)
+        self.assertEqual(sorted(row[5] for row in written), sorted(str(i % 2) for i in range(6)))
+        self.assertFalse(log.stats()["spool_pending"])
+        self.assertEqual(log.stats()["replayed_total"], 4)
+
+    def test_failed_calls_audited_with_status(self):
+        """Test that calls are audited whether the handler returns or raises."""
+        log = self.make_log()
+        with log.audited("/predict", "alice", "model_v1", {"age": 1}) as call:
+            call.output = 1
+        for error in (HTTPException(status_code=422, detail="Invalid features"), RuntimeError("model failed")):
+            with self.assertRaises(type(error)):
+                with log.audited("/predict", "alice", "model_v1", {"age": 2}):
+                    raise error
+        asyncio.run(log.stop())
+        rows = [row for batch in self.writer.batches for row in batch]
+        self.assertEqual([(row[5], row[7]) for row in rows], [("1", 200), ("null", 422), ("null", 500)])
+
+    def test_unserializable_records_dead_lettered(self):
+        """Test that a record that cannot be serialized is dead-lettered without holding up the others."""
+        log = self.make_log()
+        circular = {"age": 1}
+        circular["self"] = circular
+        self.record(log, 1)
+        log.record("/predict", "alice", "model_v1", circular, 1, 0.002)
+        self.record(log, 1, start=1)
+
+        asyncio.run(log.stop())
+        written = [row for batch in self.writer.batches for row in batch]
+        self.assertEqual(len(written), 2)
+        self.assertEqual(log.stats()["dead_lettered_total"], 1)
+        with open(self.spool_path + ".dead") as dead:
+            self.assertEqual(json.loads(dead.readline())["endpoint"], "/predict")
+
+    def test_stop_logs_flush_errors(self):
+        """Test that a failing flush on shutdown is logged rather than raised."""
+        log = self.make_log()
+        self.record(log, 2)
+        with mock.patch.object(log, "_write", side_effect=OSError("disk full")):
+            with self.assertLogs("api.audit", level="ERROR"):
+                asyncio.run(log.stop())
+        self.assertEqual(log.queue_depth, 0)
+        self.assertEqual(log.stats()["last_error"], "disk full")
+
+    def test_shared_spool_replayed_once(self):
+        """Test that workers sharing a spool replay each record once, including those of exited workers."""
+        with open(f"{self.spool_path}.999999999.replay", "w") as stale:
+            stale.write(json.dumps([0.0, "bob", "/predict", "model_v1", "0" * 64, "1", 1.0, 200]) + "\n")
+        logs = []
+        # Two running processes, standing in for the workers
+        for pid in (os.getpid(), os.getppid()):
+            with mock.patch("os.getpid", return_value=pid):
+                logs.append(self.make_log())
+        self.writer.fail = True
+        self.record(logs[0], 3)
+        self.record(logs[1], 3, start=3)
+        asyncio.run(logs[0].stop())
+        asyncio.run(logs[1].stop())
+
+        self.writer.fail = False
+        self.record(logs[0], 1, start=6)
+        self.record(logs[1], 1, start=7)
+
+        async def run():
+            await asyncio.gather(logs[0].stop(), logs[1].stop())
+
+        asyncio.run(run())
+        written = [row for batch in self.writer.batches for row in batch]
+        self.assertEqual(len(written), 9)
+        self.assertEqual(sum(log.stats()["replayed_total"] for log in logs), 7)
+        self.assertFalse(logs[0].stats()["spool_pending"])
+
+    def test_spool_without_database(self):
+        """Test that records are only spooled when no writer is configured."""
+        log = AuditLog(None, spool_path=self.spool_path, batch_size=3)
+        self.record(log, 5)
+        asyncio.run(log.stop())
+        with open(self.spool_path) as spool:
+            self.assertEqual(len(spool.readlines()), 5)
+
+    def test_overflow_policies(self):
+        """Test that a full queue drops or spools new records according to the policy."""
+        dropping = self.make_log(max_queue=2, overflow="drop")
+        self.record(dropping, 5)
+        self.assertEqual(dropping.stats()["queue_depth"], 2)
+        self.assertEqual(dropping.stats()["dropped_total"], 3)
+
+        spooling = self.make_log(max_queue=2, overflow="spool")
+        self.record(spooling, 5)
+        self.assertEqual(spooling.stats()["spooled_total"], 3)
+        with self.assertRaises(ValueError):
+            self.make_log(overflow="block")
+
+    def test_overflow_spooled_off_the_event_loop(self):
+        """Test that records overflowing on the event loop are spooled by a worker thread and flushed on stop."""
+        log = self.make_log(max_queue=2, overflow="spool")
+        threads = []
+        spool = log._spool
+
+        def recording_spool(rows, *args):
+            threads.append(threading.current_thread())
+            spool(rows, *args)
+
+        async def run():
+            with mock.patch.object(log, "_spool", side_effect=recording_spool):
+                self.record(log, 5)
+                await log.stop()
+
+        asyncio.run(run())
+        self.assertEqual(log.stats()["spooled_total"], 3)
+        self.assertTrue(all(thread is not threading.main_thread() for thread in threads))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# secure-healthcare-ml/tests/test_auth.py
+
+import asyncio
+import time
+import unittest
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from api import auth
+from api.auth import ExpiringLRUCache, create_access_token, get_current_user, revoke_token, token_digest
+from api.utils import hash_password
+
+def current_user(token):
+    return asyncio.run(get_current_user(token))
+
+class TestAuthCaches(unittest.TestCase):
+
+    def setUp(self):
+        auth.token_cache.clear()
+        auth.user_cache.clear()
+        auth._revoked_tokens.clear()
+        self.token = create_access_token({"sub": "alice"})
+        users = {"alice": SimpleNamespace(username="alice", disabled=False, is_admin=False)}
+        lookup = mock.patch.object(auth, "get_user_by_username", side_effect=users.get)
+        self.get_user_by_username = lookup.start()
+        self.addCleanup(lookup.stop)
+
+    def test_verified_token_is_cached(self):
+        """Test that a token is verified once and then served from the cache."""
+        with mock.patch.object(auth, "decode_access_token_claims",
+                               wraps=auth.decode_access_token_claims) as decode:
+            self.assertEqual(current_user(self.token).username, "alice")
+            self.assertEqual(current_user(self.token).username, "alice")
+        self.assertEqual(decode.call_count, 1)
+
+    def test_cached_entry_honours_expiry(self):
+        """Test that a cached token is never trusted past its own expiry."""
+        token = create_access_token({"sub": "alice"}, expires_delta=timedelta(seconds=2))
+        current_user(token)
+        _, cached_until = auth.token_cache.get(token_digest(token))
+        self.assertLessEqual(cached_until, time.time() + 2)
+
+    def test_invalid_tokens_are_not_cached(self):
+        """Test that a token with a bad signature is rejected every time."""
+        with self.assertRaises(HTTPException):
+            current_user(self.token + "x")
+        self.assertEqual(auth.token_cache.stats()["entries"], 0)
+
+    def test_revoked_token_rejected_immediately(self):
+        """Test that revoking a cached token takes effect on the next request."""
+        current_user(self.token)
+        revoke_token(self.token)
+        with self.assertRaises(HTTPException) as context:
+            current_user(self.token)
+        self.assertEqual(context.exception.status_code, 401)
+
+    def test_disabled_user_rejected_within_window(self):
+        """Test that disabling a user takes effect once the revocation window has passed."""
+        user = SimpleNamespace(username="alice", disabled=False)
+        with mock.patch.object(auth, "get_user_by_username", return_value=user), \
+                mock.patch.object(auth, "AUTH_REVOCATION_WINDOW", 0.2):
+            current_user(self.token)
+            user.disabled = True
+            self.assertEqual(current_user(self.token).username, "alice")
+            time.sleep(0.25)
+            with self.assertRaises(HTTPException):
+                current_user(self.token)
+
+    def test_unknown_user_rejected(self):
+        """Test that a validly signed token for a user that does not exist is rejected, with one lookup."""
+        token = create_access_token({"sub": "mallory"})
+        for _ in range(2):
+            with self.assertRaises(HTTPException) as context:
+                current_user(token)
+            self.assertEqual(context.exception.status_code, 401)
+        self.assertEqual(self.get_user_by_username.call_count, 1)
+        self.assertEqual(auth.token_cache.stats()["entries"], 0)
+
+    def test_token_carries_admin_flag(self):
+        """Test that the admin flag comes from the user record, not the token."""
+        admin = SimpleNamespace(username="root", disabled=False, is_admin=True)
+        auth.user_cache.set("root", admin, time.time() + 60)
+        self.assertTrue(current_user(create_access_token({"sub": "root"})).is_admin)
+        self.assertFalse(current_user(self.token).is_admin)
+
+    def test_lru_bound(self):
+        """Test that the cache keeps only the most recently used entries."""
+        cache = ExpiringLRUCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.set(key, key, time.time() + 60)
+        cache.get("a")
+        cache.set("c", "c", time.time() + 60)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a")[0], "a")
+        self.assertEqual(cache.stats()["entries"], 2)
+
+class TestLogin(unittest.TestCase):
+
+    def setUp(self):
+        auth.user_cache.clear()
+        app = FastAPI()
+        app.include_router(auth.router, prefix="/auth")
+        self.client = TestClient(app)
+        self.user = SimpleNamespace(username="alice", password=hash_password("secret", iterations=1000),
+                                    disabled=False, is_admin=False)
+        lookup = mock.patch.object(auth, "get_user_by_username", side_effect={"alice": self.user}.get)
+        lookup.start()
+        self.addCleanup(lookup.stop)
+
+    def test_login_issues_usable_token(self):
+        """Test that valid credentials are exchanged for a token the auth dependency accepts."""
+        response = self.client.post("/auth/token", json={"username": "alice", "password": "secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(current_user(response.json()["access_token"]).username, "alice")
+
+    def test_login_rejects_bad_credentials(self):
+        """Test that a wrong password, an unknown user and a disabled user all get 401."""
+        for username, password in (("alice", "wrong"), ("bob", "secret")):
+            response = self.client.post("/auth/token", json={"username": username, "password": password})
+            self.assertEqual(response.status_code, 401)
+        self.user.disabled = True
+        response = self.client.post("/auth/token", json={"username": "alice", "password": "secret"})
+        self.assertEqual(response.status_code, 401)
+
+if __name__ == "__main__":
+    unittest.main()
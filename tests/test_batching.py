@@ -0,0 +1,87 @@
+# secure-healthcare-ml/tests/test_batching.py
+
+import asyncio
+import time
+import unittest
+import numpy as np
+from api.batching import MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_concurrent_requests_are_coalesced(self):
+        """Test that concurrent single-row requests are scored in one batch, in order."""
+        batch_sizes = []
+
+        def predict_fn(matrix):
+            batch_sizes.append(matrix.shape[0])
+            return matrix.sum(axis=1)
+
+        async def run():
+            batcher = MicroBatcher(predict_fn, max_batch_size=16, max_wait_ms=20.0)
+            await batcher.start()
+            rows = [np.array([i, i * 10.0]) for i in range(8)]
+            results = await asyncio.gather(*(batcher.submit(row) for row in rows))
+            stats = batcher.stats()
+            await batcher.stop()
+            return results, stats
+
+        results, stats = asyncio.run(run())
+        self.assertEqual(list(results), [i * 11.0 for i in range(8)])
+        self.assertEqual(batch_sizes, [8])
+        self.assertEqual(stats["requests_total"], 8)
+        self.assertEqual(stats["batch_size_histogram"], {8: 1})
+
+    def test_max_batch_size_is_respected(self):
+        """Test that batches never exceed the configured maximum size."""
+        batch_sizes = []
+
+        def predict_fn(matrix):
+            batch_sizes.append(matrix.shape[0])
+            return matrix[:, 0]
+
+        async def run():
+            batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=20.0)
+            await batcher.start()
+            results = await asyncio.gather(*(batcher.submit(np.array([float(i)])) for i in range(10)))
+            await batcher.stop()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(list(results), [float(i) for i in range(10)])
+        self.assertTrue(all(size <= 4 for size in batch_sizes))
+        self.assertEqual(sum(batch_sizes), 10)
+
+    def test_prediction_errors_propagate(self):
+        """Test that a failing model call raises in every awaiting request."""
+        def predict_fn(matrix):
+            raise ValueError("model failure")
+
+        async def run():
+            batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=1.0)
+            try:
+                with self.assertRaises(ValueError):
+                    await batcher.submit(np.array([1.0]))
+            finally:
+                await batcher.stop()
+
+        asyncio.run(run())
+
+    def test_stop_scores_rows_already_taken_by_the_worker(self):
+        """Test that stopping during the batching window or a model call resolves every request."""
+        def predict_fn(matrix):
+            time.sleep(0.05)
+            return matrix[:, 0]
+
+        async def run():
+            batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50.0)
+            await batcher.start()
+            submits = [asyncio.ensure_future(batcher.submit(np.array([float(i)]))) for i in range(4)]
+            await asyncio.sleep(0.01)
+            await batcher.stop()
+            self.assertTrue(all(submit.done() for submit in submits))
+            return [submit.result() for submit in submits]
+
+        self.assertEqual(asyncio.run(run()), [0.0, 1.0, 2.0, 3.0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+# secure-healthcare-ml/tests/test_cache.py
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+import pytest
+from api.cache import ExplanationCache, MemoryBackend, SQLiteBackend, make_cache_key
+
+class TestCacheKey(unittest.TestCase):
+
+    def test_key_is_canonical(self):
+        """Test that key order and int/float spelling do not change the cache key."""
+        key_a = make_cache_key("model_v1", {"age": 45, "bmi": 30.5}, {"explainer": "TreeExplainer"})
+        key_b = make_cache_key("model_v1", {"bmi": 30.5, "age": 45.0}, {"explainer": "TreeExplainer"})
+        self.assertEqual(key_a, key_b)
+
+    def test_key_depends_on_version_and_config(self):
+        """Test that model version and explainer configuration are part of the key."""
+        features = {"age": 45, "bmi": 30.5}
+        key = make_cache_key("model_v1", features, {"explainer": "TreeExplainer"})
+        self.assertNotEqual(key, make_cache_key("model_v2", features, {"explainer": "TreeExplainer"}))
+        self.assertNotEqual(key, make_cache_key("model_v1", features, {"explainer": "KernelExplainer"}))
+        self.assertTrue(key.startswith("model_v1:"))
+
+@pytest.fixture
+def make_backend(request, tmp_path):
+    """
+    Factory of explanation cache backends, parametrized indirectly by backend name;
+    SQLite backends made by one test share a file, as the workers of a host do.
+    """
+    def make(max_entries=1024, max_bytes=1024 * 1024, ttl_seconds=3600.0):
+        if request.param == "memory":
+            return MemoryBackend(max_entries, max_bytes, ttl_seconds)
+        return SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries, max_bytes, ttl_seconds)
+    return make
+
+backends = pytest.mark.parametrize("make_backend", ["memory", "sqlite"], indirect=True)
+
+@backends
+def test_hit_and_miss(make_backend):
+    """Test that hits and misses are counted and values round-trip."""
+    cache = ExplanationCache(make_backend())
+    key = make_cache_key("model_v1", {"age": 45})
+    assert cache.get(key) is None
+    cache.set(key, {"prediction": 1, "shap_values": [0.1, 0.2]})
+    assert cache.get(key) == {"prediction": 1, "shap_values": [0.1, 0.2]}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["entries"] == 1
+
+@backends
+def test_lru_eviction(make_backend):
+    """Test that the least recently used entry is evicted when the entry cap is hit."""
+    cache = ExplanationCache(make_backend(max_entries=2))
+    keys = [make_cache_key("model_v1", {"age": age}) for age in (1, 2, 3)]
+    cache.set(keys[0], {"v": 0})
+    time.sleep(0.01)
+    cache.set(keys[1], {"v": 1})
+    time.sleep(0.01)
+    cache.get(keys[0])
+    time.sleep(0.01)
+    cache.set(keys[2], {"v": 2})
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+@backends
+def test_byte_cap(make_backend):
+    """Test that the total size of cached values stays under the byte cap."""
+    cache = ExplanationCache(make_backend(max_bytes=200))
+    for age in range(10):
+        cache.set(make_cache_key("model_v1", {"age": age}), {"shap_values": [0.0] * 10})
+    assert cache.stats()["bytes"] <= 200
+
+@backends
+def test_ttl_expiry(make_backend):
+    """Test that entries expire after their TTL."""
+    cache = ExplanationCache(make_backend(ttl_seconds=0.05))
+    key = make_cache_key("model_v1", {"age": 45})
+    cache.set(key, {"v": 1})
+    time.sleep(0.1)
+    assert cache.get(key) is None
+
+@backends
+def test_invalidate_model_version(make_backend):
+    """Test that swapping the model drops only the previous version's entries."""
+    cache = ExplanationCache(make_backend())
+    old_key = make_cache_key("model_v1", {"age": 45})
+    new_key = make_cache_key("model_v2", {"age": 45})
+    cache.set(old_key, {"v": 1})
+    cache.set(new_key, {"v": 2})
+
+    cache.invalidate("model_v1")
+    assert cache.get(old_key) is None
+    assert cache.get(new_key) == {"v": 2}
+
+@backends
+def test_async_access_off_the_event_loop(make_backend):
+    """Test that async lookups of blocking backends run in a worker thread, and memory lookups inline."""
+    cache = ExplanationCache(make_backend())
+    key = make_cache_key("model_v1", {"age": 45})
+    threads = []
+    get = cache.backend.get
+
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    async def run():
+        await cache.set_async(key, {"v": 1})
+        with mock.patch.object(cache.backend, "get", side_effect=recording_get):
+            return await cache.get_async(key)
+
+    assert asyncio.run(run()) == {"v": 1}
+    assert (threads[0] is threading.main_thread()) == (not cache.blocking)
+
+@pytest.mark.parametrize("make_backend", ["sqlite"], indirect=True)
+def test_shared_between_workers(make_backend):
+    """Test that two backends on the same file (e.g. two uvicorn workers) share hits."""
+    writer = ExplanationCache(make_backend())
+    reader = ExplanationCache(make_backend())
+    key = make_cache_key("model_v1", {"age": 45})
+    writer.set(key, {"v": 1})
+    assert reader.get(key) == {"v": 1}
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# secure-healthcare-ml/tests/test_compile_model.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingClassifier, RandomForestClassifier
+from scripts.compile_model import ENGINES, compile_forest, compiled_path_for, load_compiled, numba, save_compiled
+
+class TestCompiledForest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = rng.normal(size=(2000, 4))
+        self.y = (self.X[:, 0] + self.X[:, 1] * self.X[:, 2] + rng.normal(size=2000) > 0).astype(int)
+        self.X_test = rng.normal(size=(500, 4))
+        self.forest = RandomForestClassifier(n_estimators=20, random_state=0).fit(self.X, self.y)
+
+    def engines(self):
+        return [engine for engine in ENGINES if engine != "numba" or numba is not None]
+
+    def test_matches_sklearn_classifier(self):
+        """Test that compiled probabilities and labels equal sklearn's exactly, for every engine."""
+        for engine in self.engines():
+            compiled = compile_forest(self.forest, engine)
+            np.testing.assert_array_equal(compiled.predict_proba(self.X_test), self.forest.predict_proba(self.X_test))
+            np.testing.assert_array_equal(compiled.predict(self.X_test), self.forest.predict(self.X_test))
+            np.testing.assert_array_equal(compiled.predict(self.X_test[:1]), self.forest.predict(self.X_test[:1]))
+
+    def test_split_thresholds_are_exact(self):
+        """Test that rows lying exactly on split thresholds go the same way as in sklearn."""
+        thresholds = self.forest.estimators_[0].tree_.threshold
+        on_split = np.tile(thresholds[thresholds != -2][:100, None], (1, 4))
+        for engine in self.engines():
+            compiled = compile_forest(self.forest, engine)
+            np.testing.assert_array_equal(compiled.predict_proba(on_split), self.forest.predict_proba(on_split))
+
+    def test_matches_sklearn_regressor(self):
+        """Test that a compiled regression forest predicts the same values."""
+        regressor = ExtraTreesRegressor(n_estimators=10, random_state=0).fit(self.X, self.X[:, 0] * 2)
+        for engine in self.engines():
+            np.testing.assert_array_equal(compile_forest(regressor, engine).predict(self.X_test),
+                                          regressor.predict(self.X_test))
+
+    def test_saved_forest_is_memory_mapped(self):
+        """Test that a saved forest loads memory-mapped and predicts the same."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = compiled_path_for(os.path.join(tmp, "model_v1.pkl"))
+            save_compiled(compile_forest(self.forest), path)
+            compiled = load_compiled(path)
+
+            self.assertTrue(path.endswith("model_v1.compiled"))
+            self.assertIsInstance(compiled.child, np.memmap)
+            np.testing.assert_array_equal(compiled.predict(self.X_test), self.forest.predict(self.X_test))
+
+    def test_dataframe_columns_follow_training_order(self):
+        """Test that DataFrame inputs are reordered to the columns the forest was fitted on."""
+        frame = pd.DataFrame(self.X, columns=["a", "b", "c", "d"])
+        forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(frame, self.y)
+        test_frame = pd.DataFrame(self.X_test, columns=["a", "b", "c", "d"])
+        np.testing.assert_array_equal(compile_forest(forest).predict(test_frame[["d", "c", "b", "a"]]),
+                                      forest.predict(test_frame))
+
+    def test_invalid_inputs_rejected(self):
+        """Test that unsupported models, wrong widths and missing values are errors."""
+        with self.assertRaises(TypeError):
+            compile_forest(HistGradientBoostingClassifier(max_iter=5).fit(self.X, self.y))
+        compiled = compile_forest(self.forest)
+        with self.assertRaises(ValueError):
+            compiled.predict(self.X_test[:, :3])
+        with self.assertRaises(ValueError):
+            compiled.predict(np.full((1, 4), np.nan))
+
+    def test_missing_values_scored_by_fallback(self):
+        """Test that rows with NaN are scored by the fallback forest and the others by the compiled one."""
+        X_test = self.X_test[:50].copy()
+        X_test[[3, 17], 2] = np.nan
+        for engine in self.engines():
+            compiled = compile_forest(self.forest, engine)
+            compiled.fallback = self.forest
+            np.testing.assert_array_equal(compiled.predict_proba(X_test), self.forest.predict_proba(X_test))
+            np.testing.assert_array_equal(compiled.predict(X_test[3:4]), self.forest.predict(X_test[3:4]))
+
+        frame = pd.DataFrame(self.X, columns=["a", "b", "c", "d"])
+        forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(frame, self.y)
+        test_frame = pd.DataFrame(X_test, columns=["a", "b", "c", "d"])
+        compiled = compile_forest(forest)
+        compiled.fallback = forest
+        np.testing.assert_array_equal(compiled.predict(test_frame[["d", "c", "b", "a"]]), forest.predict(test_frame))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,286 @@
+# secure-healthcare-ml/tests/test_db.py
+
+import csv
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import psycopg2
+from db import db_utils
+
+class TestConnectionPool(unittest.TestCase):
+    """Exercises the pooled connection layer against a SQLite stand-in database."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "patients.sqlite3")
+        self.connects = 0
+
+        def connect():
+            self.connects += 1
+            return sqlite3.connect(self.path, check_same_thread=False)
+
+        self.connect = connect
+        db_utils.init_pool(minconn=1, maxconn=3, connect=connect)
+        db_utils.execute_insert("CREATE TABLE patients (patient_id INTEGER PRIMARY KEY, first_name TEXT)", ())
+
+    def tearDown(self):
+        db_utils.close_pool()
+        self.tmp.cleanup()
+
+    def test_connections_are_reused(self):
+        """Test that sequential statements share one persistent connection."""
+        for name in ("Ann", "Bob", "Cy"):
+            db_utils.execute_insert("INSERT INTO patients (first_name) VALUES (?)", (name,))
+        rows = db_utils.execute_query("SELECT first_name FROM patients ORDER BY patient_id")
+
+        self.assertEqual(rows, [("Ann",), ("Bob",), ("Cy",)])
+        self.assertEqual(self.connects, 1)
+
+    def test_pool_size_is_bounded(self):
+        """Test that concurrent checkouts never exceed the configured maximum."""
+        pool = db_utils.get_pool()
+        peak = []
+        barrier = threading.Barrier(6)
+
+        def worker():
+            barrier.wait()
+            with db_utils.get_connection() as conn:
+                conn.execute("SELECT 1")
+                peak.append(pool.stats()["in_use"])
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(pool.stats()["size"], 3)
+
+    def test_checkout_times_out_when_exhausted(self):
+        """Test that waiting on an exhausted pool fails after the timeout."""
+        pool = db_utils.init_pool(minconn=0, maxconn=1, connect=self.connect, timeout=0.05)
+        conn = pool.getconn()
+        with self.assertRaises(TimeoutError):
+            pool.getconn()
+        pool.putconn(conn)
+
+    def test_stale_connection_is_replaced(self):
+        """Test that a connection failing its health check is discarded and replaced."""
+        pool = db_utils.init_pool(minconn=1, maxconn=1, connect=self.connect, health_check_interval=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.close()
+
+        rows = db_utils.execute_query("SELECT COUNT(*) FROM patients")
+        self.assertEqual(rows, [(0,)])
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_failed_insert_is_rolled_back(self):
+        """Test that an error inside a checkout rolls back and returns the connection."""
+        with self.assertRaises(sqlite3.Error):
+            with db_utils.get_connection() as conn:
+                conn.execute("INSERT INTO patients (first_name) VALUES ('Dee')")
+                conn.execute("INSERT INTO missing_table VALUES (1)")
+
+        self.assertEqual(db_utils.execute_query("SELECT COUNT(*) FROM patients"), [(0,)])
+        self.assertEqual(db_utils.get_pool().stats()["in_use"], 0)
+
+class QmarkConnection:
+    """Wraps a sqlite3 connection so psycopg2-style %s placeholders work."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return QmarkCursor(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class QmarkCursor:
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(query.replace("%s", "?"), params)
+
+    def executemany(self, query, rows):
+        return self._cursor.executemany(query.replace("%s", "?"), rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class TestBulkInsert(unittest.TestCase):
+    """Exercises bulk patient ingestion against a SQLite stand-in database."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, "patients.sqlite3")
+        db_utils.init_pool(minconn=1, maxconn=2, connect=lambda: QmarkConnection(sqlite3.connect(path, check_same_thread=False)))
+        columns = ", ".join(f"{column} TEXT" for column in db_utils.PATIENT_COLUMNS)
+        db_utils.execute_insert(f"CREATE TABLE patients (patient_id INTEGER PRIMARY KEY, {columns})", ())
+        self.checkpoint = "ingest"
+
+    def tearDown(self):
+        db_utils.close_pool()
+        self.tmp.cleanup()
+
+    def patients(self, n):
+        return [(f"First{i}", f"Last{i}", "1985-06-15", "Male", "123 Main St", "555-1234", f"p{i}@example.com",
+                 "C34", "Lung cancer", "T01", "Lung resection", "A01", "Cisplatin", "2024-02-10") for i in range(n)]
+
+    def count(self):
+        return db_utils.execute_query("SELECT COUNT(*) FROM patients")[0][0]
+
+    def checkpoints(self):
+        return db_utils.execute_query("SELECT name, rows_committed FROM patient_load_checkpoints")
+
+    def test_bulk_insert_from_generator(self):
+        """Test that a generator of tuples is loaded in batches and rates are reported."""
+        stats = db_utils.bulk_insert_patients((row for row in self.patients(25)), batch_size=10)
+        self.assertEqual(stats["rows"], 25)
+        self.assertGreater(stats["rows_per_sec"], 0)
+        self.assertEqual(self.count(), 25)
+
+    def test_bulk_insert_from_csv(self):
+        """Test that a CSV export is loaded with missing values stored as NULL."""
+        path = os.path.join(self.tmp.name, "patients.csv")
+        rows = self.patients(5)
+        rows[2] = rows[2][:7] + ("",) + rows[2][8:]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(db_utils.PATIENT_COLUMNS)
+            writer.writerows(rows)
+
+        db_utils.bulk_insert_patients(path, batch_size=2)
+        self.assertEqual(self.count(), 5)
+        self.assertEqual(db_utils.execute_query("SELECT COUNT(*) FROM patients WHERE diagnosis_code IS NULL"), [(1,)])
+
+    def test_resume_from_last_committed_batch(self):
+        """Test that a failed load resumes after the last committed batch without duplicates."""
+        rows = self.patients(10)
+
+        def failing_source():
+            yield from rows[:7]
+            raise RuntimeError("export interrupted")
+
+        with self.assertRaises(RuntimeError):
+            db_utils.bulk_insert_patients(failing_source(), batch_size=3, checkpoint=self.checkpoint)
+        self.assertEqual(self.count(), 6)
+        self.assertEqual(self.checkpoints(), [("ingest", 6)])
+
+        stats = db_utils.bulk_insert_patients(iter(rows), batch_size=3, checkpoint=self.checkpoint)
+        self.assertEqual(stats["rows"], 4)
+        self.assertEqual(self.count(), 10)
+        self.assertEqual(self.checkpoints(), [])
+
+    def test_batch_and_checkpoint_commit_together(self):
+        """Test that a batch whose checkpoint cannot be written is rolled back, so resuming adds no duplicates."""
+        rows = self.patients(10)
+        write_checkpoint = db_utils._write_checkpoint
+
+        def failing_write(cursor, checkpoint, source_id, rows_committed):
+            if rows_committed > 3:
+                raise RuntimeError("connection lost")
+            write_checkpoint(cursor, checkpoint, source_id, rows_committed)
+
+        with mock.patch.object(db_utils, "_write_checkpoint", side_effect=failing_write):
+            with self.assertRaises(RuntimeError):
+                db_utils.bulk_insert_patients(iter(rows), batch_size=3, checkpoint=self.checkpoint)
+        self.assertEqual(self.count(), 3)
+
+        db_utils.bulk_insert_patients(iter(rows), batch_size=3, checkpoint=self.checkpoint)
+        first_names = [name for (name,) in db_utils.execute_query("SELECT first_name FROM patients ORDER BY patient_id")]
+        self.assertEqual(first_names, [row[0] for row in rows])
+
+    def test_refused_copy_retried_with_inserts(self):
+        """Test that a batch whose COPY is refused is retried with INSERTs, as is the rest of the load."""
+        copy_batch = mock.Mock(side_effect=psycopg2.errors.InsufficientPrivilege("permission denied for COPY"))
+        with mock.patch.object(QmarkCursor, "copy_expert", create=True), \
+                mock.patch.object(db_utils, "_copy_batch", copy_batch):
+            stats = db_utils.bulk_insert_patients(iter(self.patients(7)), batch_size=3, checkpoint=self.checkpoint)
+        self.assertEqual(stats["rows"], 7)
+        self.assertEqual(self.count(), 7)
+        self.assertEqual(copy_batch.call_count, 1)
+
+    def test_checkpoint_of_another_source_rejected(self):
+        """Test that a checkpoint is not resumed against a different source."""
+        path = os.path.join(self.tmp.name, "patients.csv")
+        db_utils.create_load_checkpoints_table()
+        db_utils.execute_insert("INSERT INTO patient_load_checkpoints VALUES (%s, %s, %s)", (self.checkpoint, "iterable", 3))
+        with self.assertRaises(ValueError):
+            db_utils.bulk_insert_patients(path, batch_size=3, checkpoint=self.checkpoint)
+
+@unittest.skipUnless(os.getenv("DB_NAME"), "requires a PostgreSQL database configured via DB_* settings")
+class TestAsyncDB(unittest.TestCase):
+    """Exercises the asyncpg layer against a local PostgreSQL database."""
+
+    def test_concurrent_fetches_share_pool(self):
+        """Test that many concurrent lookups complete through a small pool."""
+        import asyncio
+        import datetime
+        from db import async_db
+
+        async def run():
+            await async_db.init_async_pool(min_size=1, max_size=4)
+            try:
+                await async_db.execute_insert(
+                    "CREATE TABLE IF NOT EXISTS patients (patient_id SERIAL PRIMARY KEY, "
+                    + ", ".join(f"{column} {'DATE' if column in ('dob', 'visit_date') else 'TEXT'}"
+                                for column in async_db.PATIENT_COLUMNS) + ")"
+                )
+                await async_db.insert_patient_data((
+                    "John", "Doe", datetime.date(1985, 6, 15), "Male", "123 Main St", "555-1234",
+                    "johndoe@example.com", "C34", "Lung cancer", "T01", "Lung resection",
+                    "A01", "Cisplatin", datetime.date(2024, 2, 10),
+                ))
+                patient_id = (await async_db.execute_query("SELECT MAX(patient_id) FROM patients"))[0][0]
+                results = await asyncio.gather(*(async_db.fetch_patient_data(patient_id) for _ in range(50)))
+                return [len(rows) for rows in results]
+            finally:
+                await async_db.close_async_pool()
+
+        self.assertEqual(asyncio.run(run()), [1] * 50)
+
+    def test_bulk_insert_resumes_from_checkpoint(self):
+        """Test that an interrupted async load resumes after the last committed batch."""
+        import asyncio
+        import datetime
+        from db import async_db
+
+        rows = [(f"First{i}", f"Last{i}", datetime.date(1985, 6, 15), "Male", "123 Main St", "555-1234",
+                 f"p{i}@example.com", "C34", "Lung cancer", "T01", "Lung resection", "A01", "Cisplatin",
+                 datetime.date(2024, 2, 10)) for i in range(10)]
+
+        def failing_source():
+            yield from rows[:7]
+            raise RuntimeError("export interrupted")
+
+        async def run():
+            await async_db.init_async_pool(min_size=1, max_size=2)
+            try:
+                await async_db.execute_insert(
+                    "CREATE TABLE IF NOT EXISTS patients (patient_id SERIAL PRIMARY KEY, "
+                    + ", ".join(f"{column} {'DATE' if column in ('dob', 'visit_date') else 'TEXT'}"
+                                for column in async_db.PATIENT_COLUMNS) + ")"
+                )
+                await async_db.execute_insert(async_db.LOAD_CHECKPOINTS_DDL)
+                await async_db.execute_insert("DELETE FROM patient_load_checkpoints WHERE name = $1", "async-ingest")
+                before = (await async_db.execute_query("SELECT COUNT(*) FROM patients"))[0][0]
+                with self.assertRaises(RuntimeError):
+                    await async_db.bulk_insert_patients(failing_source(), batch_size=3, checkpoint="async-ingest")
+                stats = await async_db.bulk_insert_patients(iter(rows), batch_size=3, checkpoint="async-ingest")
+                after = (await async_db.execute_query("SELECT COUNT(*) FROM patients"))[0][0]
+                return stats["rows"], after - before
+            finally:
+                await async_db.close_async_pool()
+
+        self.assertEqual(asyncio.run(run()), (4, 10))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,16 @@
 
 import unittest
 import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import pytest
 from fastapi.testclient import TestClient
+from api import explain
+from api.cache import create_explanation_cache
 from api.main import app  # Assuming the FastAPI app is defined in api.main
 
 class TestExplainability(unittest.TestCase):
@@ -86,5 +95,82 @@ class TestExplainability(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"model_status": "loaded"})
 
+@pytest.mark.usefixtures("reference_model", "api_users")
+class TestExplanationEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+        self.features = self.reference["records"][7]
+
+    def test_explanation_cached_by_features(self):
+        """Test that explaining the same features twice is served from the explanation cache."""
+        features = self.reference["records"][8]
+        before = self.client.get("/explain/cache/stats", headers=self.headers).json()
+        first = self.client.post("/explain/explain", json={"features": features}, headers=self.headers)
+        second = self.client.post("/explain/explain", json={"features": dict(reversed(features.items()))},
+                                  headers=self.headers)
+        after = self.client.get("/explain/cache/stats", headers=self.headers).json()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.json()["shap_values"]), len(features))
+        self.assertEqual(second.json()["shap_values"], first.json()["shap_values"])
+        self.assertNotEqual(second.json()["explanation_id"], first.json()["explanation_id"])
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+
+    def test_explanation_computed_off_the_event_loop(self):
+        """Test that scoring and SHAP run in a worker thread rather than on the event loop."""
+        threads = []
+        compute = explain.compute_explanation
+
+        def recording_compute(*args):
+            threads.append(threading.current_thread())
+            return compute(*args)
+
+        features = self.reference["records"][9]
+        with mock.patch.object(explain, "compute_explanation", side_effect=recording_compute):
+            response = self.client.post("/explain/explain", json={"features": features}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 1)
+        self.assertIn("AnyIO worker thread", threads[0].name)
+
+    def test_explain_plot_rendered_on_demand(self):
+        """Test that /explain returns an explanation id whose plot can be fetched lazily."""
+        response = self.client.post("/explain/explain", json={"features": self.features}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        explanation_id = response.json()["explanation_id"]
+
+        # Render in a thread rather than a spawned process to keep the test fast
+        with ThreadPoolExecutor(max_workers=1) as pool, mock.patch.object(explain, "get_plot_pool", return_value=pool):
+            plot = self.client.get(f"/explain/{explanation_id}/plot", params={"kind": "summary", "fmt": "svg"},
+                                   headers=self.headers)
+        self.assertEqual(plot.status_code, 200)
+        self.assertEqual(plot.headers["content-type"], "image/svg+xml")
+
+        missing = self.client.get("/explain/unknown-id/plot", headers=self.headers)
+        self.assertEqual(missing.status_code, 404)
+        bad_kind = self.client.get(f"/explain/{explanation_id}/plot", params={"kind": "pie"}, headers=self.headers)
+        self.assertEqual(bad_kind.status_code, 400)
+
+    def test_explain_plot_served_by_any_worker(self):
+        """Test that a plot can be rendered by a worker other than the one that computed the explanation."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "explanation_cache.sqlite3")
+            with mock.patch.object(explain, "explanation_cache", create_explanation_cache("sqlite", path=path)):
+                response = self.client.post("/explain/explain", json={"features": self.features},
+                                            headers=self.headers)
+            explanation_id = response.json()["explanation_id"]
+
+            # A second worker: its own connection to the shared cache and no rendered plots
+            other_worker = create_explanation_cache("sqlite", path=path)
+            with ThreadPoolExecutor(max_workers=1) as pool, \
+                    mock.patch.object(explain, "explanation_cache", other_worker), \
+                    mock.patch.object(explain, "_plot_cache", OrderedDict()), \
+                    mock.patch.object(explain, "get_plot_pool", return_value=pool):
+                plot = self.client.get(f"/explain/{explanation_id}/plot", params={"kind": "force", "fmt": "svg"},
+                                       headers=self.headers)
+        self.assertEqual(plot.status_code, 200)
+        self.assertEqual(other_worker.stats()["hits"] + other_worker.stats()["misses"], 0)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,95 @@
+# secure-healthcare-ml/tests/test_explainability.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import shap
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from explainability.registry import ExplainerRegistry, build_explainer, select_class_values
+from explainability.shap_explainer import SHAPExplainer
+
+class TestExplainerRegistry(unittest.TestCase):
+
+    def setUp(self):
+        """Train small reference models on synthetic data."""
+        rng = np.random.default_rng(0)
+        self.X = pd.DataFrame(rng.normal(size=(200, 4)), columns=["age", "bmi", "children", "charges"])
+        self.y = (self.X["age"] + self.X["bmi"] > 0).astype(int)
+        self.forest = RandomForestClassifier(n_estimators=10, random_state=42).fit(self.X, self.y)
+        self.linear = LogisticRegression().fit(self.X, self.y)
+
+    def test_tree_model_uses_tree_explainer(self):
+        """Test that tree ensembles get a TreeExplainer without any background data."""
+        explainer = build_explainer(self.forest)
+        self.assertIsInstance(explainer, shap.TreeExplainer)
+
+    def test_non_tree_model_requires_background(self):
+        """Test that the Kernel fallback refuses to run without a background set."""
+        with self.assertRaises(ValueError):
+            build_explainer(self.linear)
+
+        explainer = build_explainer(self.linear, shap.kmeans(self.X, 5))
+        self.assertIsInstance(explainer, shap.KernelExplainer)
+
+    def test_registry_reuses_explainer(self):
+        """Test that the registry hands back the same explainer for a model version."""
+        registry = ExplainerRegistry()
+        explainer = registry.register("model_v1", self.forest)
+        self.assertIs(registry.get("model_v1"), explainer)
+        self.assertIn("model_v1", registry)
+
+        registry.remove("model_v1")
+        with self.assertRaises(KeyError):
+            registry.get("model_v1")
+
+    def test_select_class_values_shape(self):
+        """Test that per-class SHAP output is reduced to (n_samples, n_features)."""
+        explainer = build_explainer(self.forest)
+        values = select_class_values(explainer.shap_values(self.X.iloc[:3]), class_index=1)
+        self.assertEqual(values.shape, (3, 4))
+
+class TestSHAPExplainerBatch(unittest.TestCase):
+
+    def setUp(self):
+        """Train a small reference forest on synthetic data."""
+        rng = np.random.default_rng(1)
+        self.X = pd.DataFrame(rng.normal(size=(120, 3)), columns=["age", "bmi", "children"])
+        y = (self.X["age"] > 0).astype(int)
+        model = RandomForestClassifier(n_estimators=5, random_state=42).fit(self.X, y)
+        self.explainer = SHAPExplainer(model, feature_names=list(self.X.columns))
+        self.expected = self.explainer.explain(self.X).values
+
+    def test_explain_batch_matches_full_explanation(self):
+        """Test that chunked explanations, in-process and in a pool, match a single call."""
+        for n_jobs in (1, 2):
+            chunks = list(self.explainer.explain_batch(self.X, chunk_size=50, n_jobs=n_jobs))
+            self.assertEqual([start for start, _ in chunks], [0, 50, 100])
+            values = np.concatenate([explanation.values for _, explanation in chunks])
+            np.testing.assert_allclose(values, self.expected)
+
+    def test_explain_num_features_truncates(self):
+        """Test that the deprecated num_features keeps only the most important features."""
+        with self.assertWarns(DeprecationWarning):
+            explanation = self.explainer.explain(self.X, num_features=1)
+        self.assertEqual(explanation.feature_names, ["age"])
+        self.assertEqual(explanation.values.shape[:2], (len(self.X), 1))
+
+    def test_explain_to_npy(self):
+        """Test that SHAP values are written to a memory-mapped .npy file."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "shap_values.npy")
+            values = self.explainer.explain_to_npy(self.X, path, chunk_size=32)
+            self.assertEqual(values.shape, self.expected.shape)
+            np.testing.assert_allclose(values, self.expected, rtol=1e-5, atol=1e-6)
+            del values
+
+    def test_local_explanation_single_instance(self):
+        """Test that a local explanation matches the corresponding row of the full explanation."""
+        explanation = self.explainer.local_explanation(self.X, instance_idx=7)
+        np.testing.assert_allclose(explanation.values, self.expected[7])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# secure-healthcare-ml/tests/test_features.py
+
+import datetime
+import unittest
+import numpy as np
+from fastapi import HTTPException
+from api.features import derive_features, materialize_features, patient_rows_to_frame
+
+def patient_row(patient_id, gender="Male", diagnosis_code="C34", dob="1985-06-15", visit_date="2024-02-10"):
+    return (patient_id, "John", "Doe", dob, gender, "123 Main St", "555-1234", "jd@example.com",
+            diagnosis_code, "Lung cancer", "T01", "Lung resection", "A01", "Cisplatin", visit_date)
+
+class TestPatientFeatures(unittest.TestCase):
+
+    def test_rows_follow_requested_order(self):
+        """Test that fetched rows are reordered to match the requested patient IDs."""
+        frame = patient_rows_to_frame([patient_row(1), patient_row(2), patient_row(3)], [3, 1, 2])
+        self.assertEqual(list(frame.index), [3, 1, 2])
+
+    def test_missing_patients_raise_404(self):
+        """Test that requesting unknown patient IDs is reported as not found."""
+        with self.assertRaises(HTTPException) as context:
+            patient_rows_to_frame([patient_row(1)], [1, 7])
+        self.assertEqual(context.exception.status_code, 404)
+
+    def test_derived_features(self):
+        """Test that age and one-hot indicators are derived from patient records."""
+        frame = patient_rows_to_frame([patient_row(1), patient_row(2, gender="Female", diagnosis_code="E11")], [1, 2])
+        features = derive_features(frame, as_of=datetime.datetime(2024, 2, 20))
+
+        self.assertAlmostEqual(features.loc[1, "age"], 38.65, places=1)
+        self.assertEqual(features.loc[1, "days_since_visit"], 10.0)
+        self.assertEqual(features.loc[1, "gender_Male"], 1.0)
+        self.assertEqual(features.loc[2, "diagnosis_code_E11"], 1.0)
+
+    def test_materialize_in_model_order(self):
+        """Test that the matrix follows model column order and zero-fills unseen categories."""
+        frame = patient_rows_to_frame([patient_row(1), patient_row(2, gender="Female")], [1, 2])
+        matrix = materialize_features(frame, ["gender_Male", "diagnosis_code_Z99", "age"])
+
+        self.assertEqual(matrix.shape, (2, 3))
+        self.assertTrue(matrix.flags["C_CONTIGUOUS"])
+        np.testing.assert_array_equal(matrix[:, 0], [1.0, 0.0])
+        np.testing.assert_array_equal(matrix[:, 1], [0.0, 0.0])
+
+    def test_underivable_feature_is_rejected(self):
+        """Test that model features that cannot be derived from the patients table are an error."""
+        frame = patient_rows_to_frame([patient_row(1)], [1])
+        with self.assertRaises(HTTPException) as context:
+            materialize_features(frame, ["age", "bmi"])
+        self.assertEqual(context.exception.status_code, 422)
+
+if __name__ == "__main__":
+    unittest.main()
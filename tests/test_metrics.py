@@ -0,0 +1,82 @@
+# secure-healthcare-ml/tests/test_metrics.py
+
+import asyncio
+import unittest
+import httpx
+from fastapi import APIRouter, FastAPI
+from api import metrics
+from api.metrics import MetricsRegistry, MetricsMiddleware, stats_families, time_stage
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test that histogram buckets are cumulative and include sum and count."""
+        registry = MetricsRegistry(namespace="test")
+        histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 2.0):
+            histogram.observe(value, "/predict")
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE test_latency_seconds histogram", lines)
+        self.assertIn('test_latency_seconds_bucket{route="/predict",le="0.1"} 1', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/predict",le="1.0"} 3', lines)
+        self.assertIn('test_latency_seconds_bucket{route="/predict",le="+Inf"} 4', lines)
+        self.assertIn('test_latency_seconds_sum{route="/predict"} 3.05', lines)
+        self.assertIn('test_latency_seconds_count{route="/predict"} 4', lines)
+
+    def test_label_values_escaped(self):
+        """Test that quotes, backslashes and newlines in label values are escaped."""
+        registry = MetricsRegistry(namespace="test")
+        registry.counter("events_total", "Events", ("name",)).inc('a"b\\c\nd')
+        self.assertIn('test_events_total{name="a\\"b\\\\c\\nd"} 1.0', registry.render())
+
+    def test_stats_families(self):
+        """Test that stats dicts are flattened into typed, labelled families."""
+        families = {name: (metric_type, samples) for name, metric_type, _, samples in stats_families("cache", [
+            ({"version": "v1"}, {"hits": 3, "hit_rate": 0.75, "backend": "memory", "tokens": {"entries": 2},
+                                 "histogram": {1: 5, 2: 7}}),
+            ({"version": "v2"}, {"hits": 1}),
+        ])}
+        self.assertEqual(families["cache_hits_total"], ("counter", [({"version": "v1"}, 3), ({"version": "v2"}, 1)]))
+        self.assertEqual(families["cache_hit_rate"][0], "gauge")
+        self.assertEqual(families["cache_tokens_entries"][1], [({"version": "v1"}, 2)])
+        self.assertEqual(families["cache_histogram"][1], [({"version": "v1", "key": "1"}, 5), ({"version": "v1", "key": "2"}, 7)])
+        self.assertNotIn("cache_backend", families)
+        self.assertNotIn("cache_hits", families)
+
+    def test_failing_collector_does_not_fail_scrape(self):
+        """Test that a collector raising an exception is reported instead of failing the render."""
+        registry = MetricsRegistry(namespace="test")
+        registry.register_collector("broken", lambda: 1 / 0)
+        self.assertIn('test_collector_errors{collector="broken"} 1', registry.render())
+
+    def test_middleware_labels_route_templates(self):
+        """Test that requests are counted per route template and status, and stages are timed."""
+        router = APIRouter()
+
+        @router.get("/items/{item_id}")
+        async def read_item(item_id: int):
+            with time_stage("lookup"):
+                return {"item_id": item_id}
+
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware)
+        app.include_router(router, prefix="/store")
+
+        async def send_requests():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for item_id in (1, 2, 3):
+                    self.assertEqual((await client.get(f"/store/items/{item_id}")).status_code, 200)
+                self.assertEqual((await client.get("/missing")).status_code, 404)
+
+        before = metrics.requests_total.get("GET", "/store/items/{item_id}", "200")
+        lookups = metrics.stage_latency.count("lookup")
+        asyncio.run(send_requests())
+        self.assertEqual(metrics.requests_total.get("GET", "/store/items/{item_id}", "200") - before, 3)
+        self.assertGreaterEqual(metrics.requests_total.get("GET", "unmatched", "404"), 1)
+        self.assertEqual(metrics.stage_latency.count("lookup") - lookups, 3)
+        self.assertEqual(metrics.requests_in_flight.get(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+# secure-healthcare-ml/tests/test_preprocess.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import pytest
+from unittest import mock
+from scripts import preprocess
+from scripts.preprocess import (RunningStats, build_dataset, compute_column_stats, dataset_cache_key, detect_format,
+                                fit_preprocessing, load_arrays, load_data, load_dataset, load_preprocessing,
+                                preprocess_data, preprocess_streaming, preprocessing_path_for, save_preprocessing,
+                                save_processed, split_data)
+
+@pytest.mark.usefixtures("synthetic_dataset")
+class TestStreamingPreprocessing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raw_path = os.path.join(self.tmp.name, "raw.csv")
+        self.df = self.synthetic_dataset()
+        self.df.to_csv(self.raw_path, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_running_stats_merge_matches_full_pass(self):
+        """Test that merged chunk statistics equal statistics over the whole column."""
+        stats = RunningStats(["bmi"])
+        for start in range(0, len(self.df), 97):
+            stats.update(self.df.iloc[start:start + 97])
+
+        self.assertAlmostEqual(stats.means()["bmi"], self.df["bmi"].mean())
+        self.assertEqual(stats.count[0], self.df["bmi"].notna().sum())
+
+    def test_numeric_columns_detected_across_chunks(self):
+        """Test that only columns numeric in every chunk are kept."""
+        stats, n_rows = compute_column_stats(self.raw_path, chunksize=128)
+        self.assertEqual(stats.columns, ["age", "bmi", "systolic_bp", "site", "target"])
+        self.assertEqual(n_rows, len(self.df))
+
+    def test_streaming_matches_in_memory(self):
+        """Test that chunked two-pass preprocessing reproduces the in-memory result."""
+        output_path = os.path.join(self.tmp.name, "processed.csv")
+        preprocess_streaming(self.raw_path, output_path, chunksize=128)
+
+        X_expected, y_expected = preprocess_data(pd.read_csv(self.raw_path))
+        streamed = pd.read_csv(output_path)
+
+        np.testing.assert_allclose(streamed.drop(columns=["target"]).to_numpy(), X_expected, atol=1e-9)
+        np.testing.assert_array_equal(streamed["target"].to_numpy(), y_expected.to_numpy())
+
+@pytest.mark.usefixtures("synthetic_dataset")
+class TestProcessedDataFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(1)
+        self.X = rng.normal(size=(200, 3))
+        self.y = rng.integers(0, 2, 200)
+        self.feature_names = ["age", "bmi", "systolic_bp"]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_all_formats(self):
+        """Test that processed data saved in each format loads back with the same values."""
+        for name in ("processed.csv", "processed.parquet", "processed.feather", "processed"):
+            path = os.path.join(self.tmp.name, name)
+            save_processed(self.X, self.y, self.feature_names, path)
+            df = load_data(path)
+
+            self.assertEqual(list(df.columns), self.feature_names + ["target"])
+            atol = 1e-6 if detect_format(path) == "npy" else 1e-12
+            np.testing.assert_allclose(df[self.feature_names].to_numpy(), self.X, atol=atol)
+            np.testing.assert_array_equal(df["target"].to_numpy(), self.y)
+
+    def test_npy_arrays_are_memory_mapped(self):
+        """Test that the .npy format is memory-mapped as a C-ordered float32 matrix."""
+        path = os.path.join(self.tmp.name, "processed")
+        save_processed(self.X, self.y, self.feature_names, path)
+        X, y, feature_names = load_arrays(path)
+
+        self.assertIsInstance(X, np.memmap)
+        self.assertEqual(X.dtype, np.float32)
+        self.assertTrue(X.flags["C_CONTIGUOUS"])
+        self.assertEqual(feature_names, self.feature_names)
+
+    def test_column_selection(self):
+        """Test that only the requested columns are loaded."""
+        for name in ("processed.parquet", "processed"):
+            path = os.path.join(self.tmp.name, name)
+            save_processed(self.X, self.y, self.feature_names, path)
+            X, y, feature_names = load_arrays(path, columns=["bmi"])
+
+            self.assertEqual(feature_names, ["bmi"])
+            np.testing.assert_allclose(X[:, 0], self.X[:, 1], atol=1e-6)
+
+    def test_streaming_to_npy(self):
+        """Test that streaming preprocessing fills the memory-mapped arrays chunk by chunk."""
+        raw_path = os.path.join(self.tmp.name, "raw.csv")
+        self.synthetic_dataset().to_csv(raw_path, index=False)
+        output_path = os.path.join(self.tmp.name, "processed")
+        preprocess_streaming(raw_path, output_path, chunksize=128)
+
+        X_expected, y_expected = preprocess_data(pd.read_csv(raw_path))
+        X, y, _ = load_arrays(output_path)
+        np.testing.assert_allclose(X, X_expected, atol=1e-5)
+        np.testing.assert_array_equal(y, y_expected.to_numpy())
+
+@pytest.mark.usefixtures("synthetic_dataset")
+class TestPersistedPreprocessing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = self.synthetic_dataset()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parameters_round_trip(self):
+        """Test that saved parameters load back unchanged and are versioned."""
+        path = preprocessing_path_for(os.path.join(self.tmp.name, "model_v1.pkl"))
+        params = fit_preprocessing(self.df)
+        save_preprocessing(params, path)
+
+        self.assertTrue(path.endswith("model_v1.preprocessing.json"))
+        self.assertEqual(load_preprocessing(path), params)
+        self.assertEqual(params["feature_names"], ["age", "bmi", "systolic_bp", "site"])
+
+    def test_streaming_saves_same_parameters(self):
+        """Test that streaming preprocessing persists the parameters fitted in memory."""
+        raw_path = os.path.join(self.tmp.name, "raw.csv")
+        output_path = os.path.join(self.tmp.name, "processed.parquet")
+        self.df.to_csv(raw_path, index=False)
+        preprocess_streaming(raw_path, output_path, chunksize=128)
+
+        streamed = load_preprocessing(preprocessing_path_for(output_path))
+        expected = fit_preprocessing(pd.read_csv(raw_path))
+        self.assertEqual(streamed["feature_names"], expected["feature_names"])
+        for key in ("impute_values", "mean", "scale"):
+            np.testing.assert_allclose(streamed[key], expected[key], rtol=1e-9)
+
+@pytest.mark.usefixtures("synthetic_dataset")
+class TestDatasetCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raw_path = os.path.join(self.tmp.name, "raw.csv")
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.synthetic_dataset().to_csv(self.raw_path, index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_matches_preprocess_and_split(self):
+        """Test that the cached splits equal preprocessing followed by split_data."""
+        X_train, X_test, y_train, y_test, params = load_dataset(build_dataset(self.raw_path, self.cache_dir))
+
+        X_expected, y_expected = preprocess_data(pd.read_csv(self.raw_path))
+        X_train_expected, X_test_expected, y_train_expected, y_test_expected = split_data(X_expected, y_expected)
+        np.testing.assert_allclose(X_train, X_train_expected, atol=1e-6)
+        np.testing.assert_allclose(X_test, X_test_expected, atol=1e-6)
+        np.testing.assert_array_equal(y_test, y_test_expected.to_numpy())
+        self.assertEqual(params["feature_names"], ["age", "bmi", "systolic_bp", "site"])
+
+    def test_cache_hit_skips_preprocessing(self):
+        """Test that a second build with the same input and settings reuses the cached dataset."""
+        dataset_dir = build_dataset(self.raw_path, self.cache_dir)
+        with mock.patch.object(preprocess, "fit_preprocessing", side_effect=AssertionError("recomputed")):
+            self.assertEqual(build_dataset(self.raw_path, self.cache_dir), dataset_dir)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(dataset_dir)])
+
+    def test_key_follows_content_and_settings(self):
+        """Test that the cache key changes with the input bytes and split settings only."""
+        key = dataset_cache_key(self.raw_path)
+        self.assertNotEqual(dataset_cache_key(self.raw_path, test_size=0.2), key)
+
+        copy_path = os.path.join(self.tmp.name, "copy.csv")
+        with open(self.raw_path) as src, open(copy_path, "w") as dst:
+            dst.write(src.read())
+        self.assertEqual(dataset_cache_key(copy_path), key)
+
+        with open(copy_path, "a") as f:
+            f.write("50,30.0,120.0,1.0,male,1\n")
+        self.assertNotEqual(dataset_cache_key(copy_path), key)
+
+    def test_streaming_build_matches_in_memory(self):
+        """Test that a streamed build produces the same split as the in-memory build."""
+        expected = load_dataset(build_dataset(self.raw_path, os.path.join(self.tmp.name, "memory")))
+        streamed = load_dataset(build_dataset(self.raw_path, self.cache_dir, streaming=True, chunksize=97))
+
+        for actual, wanted in zip(streamed[:4], expected[:4]):
+            np.testing.assert_allclose(actual, wanted, atol=1e-5)
+
+if __name__ == "__main__":
+    unittest.main()
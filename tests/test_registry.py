@@ -0,0 +1,229 @@
+# secure-healthcare-ml/tests/test_registry.py
+
+import asyncio
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from api.registry import ModelRegistry, ModelWatcher
+from api.utils import records_to_matrix
+from scripts.compile_model import CompiledForest, compile_forest, compiled_path_for, save_compiled
+from scripts.preprocess import make_preprocessing_params, preprocessing_path_for, save_preprocessing
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.X = rng.normal(size=(200, 3))
+        self.y = (self.X[:, 0] > 0).astype(int)
+        self.forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(self.X, self.y)
+        self.model_path = os.path.join(self.tmp.name, "model_v1.pkl")
+        joblib.dump(self.forest, self.model_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_artifact_loaded_once(self):
+        """Test that loading the same version twice returns the already loaded artifact."""
+        registry = ModelRegistry()
+        entry = registry.load(self.model_path, activate=True)
+
+        self.assertIs(registry.load(self.model_path), entry)
+        self.assertIs(registry.get(), entry)
+        np.testing.assert_array_equal(entry.model.predict(self.X), self.forest.predict(self.X))
+
+    def test_arrays_are_memory_mapped(self):
+        """Test that the artifact's arrays are mapped from disk rather than copied."""
+        path = os.path.join(self.tmp.name, "linear.pkl")
+        joblib.dump(LogisticRegression().fit(self.X, self.y), path)
+        entry = ModelRegistry().load(path)
+        self.assertIsInstance(entry.model.coef_, np.memmap)
+
+    def test_plain_pickle_artifacts_load(self):
+        """Test that artifacts written with pickle still load."""
+        path = os.path.join(self.tmp.name, "model_v0.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(self.forest, f)
+        self.assertEqual(ModelRegistry().load(path).version, "model_v0")
+
+    def test_compiled_engine(self):
+        """Test that the compiled engine scores with the saved forest and falls back to sklearn."""
+        save_compiled(compile_forest(self.forest), compiled_path_for(self.model_path))
+        linear_path = os.path.join(self.tmp.name, "linear.pkl")
+        joblib.dump(LogisticRegression().fit(self.X, self.y), linear_path)
+        registry = ModelRegistry(engine="compiled")
+        entry = registry.load(self.model_path)
+
+        self.assertIsInstance(entry.predictor, CompiledForest)
+        self.assertIsInstance(entry.predictor.child, np.memmap)
+        np.testing.assert_array_equal(entry.predictor.predict(self.X), self.forest.predict(self.X))
+        self.assertIs(registry.load(linear_path).predictor, registry.get("linear").model)
+        self.assertEqual(registry.get("linear").describe()["engine"], "sklearn")
+
+    def test_compiled_engine_scores_missing_values(self):
+        """Test that rows with missing values are scored by the model when serving a compiled forest."""
+        entry = ModelRegistry(engine="compiled").load(self.model_path)
+        X = self.X[:10].copy()
+        X[[2, 7], 1] = np.nan
+        np.testing.assert_array_equal(entry.predictor.predict(X), self.forest.predict(X))
+
+    def test_single_row_encoding(self):
+        """Test that a request's features are preprocessed into a reused row matching the batch path."""
+        save_preprocessing(make_preprocessing_params(["a", "b", "c"], [0, 5, 0], [1, 1, 1], [2, 2, 2]),
+                           preprocessing_path_for(self.model_path))
+        entry = ModelRegistry().load(self.model_path)
+        features = {"c": 3.0, "a": 1.0, "b": None}
+        row = entry.encode_row(features)
+
+        np.testing.assert_array_equal(row, entry.prepare(records_to_matrix([features], ["a", "b", "c"])))
+        np.testing.assert_array_equal(row, [[0.0, 2.0, 1.0]])
+        self.assertIs(entry.encode_row(features), row)
+
+    def test_warm_up_and_metrics(self):
+        """Test that a model is warmed up with its preprocessing and reports load metrics."""
+        save_preprocessing(make_preprocessing_params(["a", "b", "c"], [0, 0, 0], [0, 0, 0], [1, 1, 1]),
+                           preprocessing_path_for(self.model_path))
+        registry = ModelRegistry()
+        self.assertFalse(registry.is_ready())
+        entry = registry.load(self.model_path)
+
+        self.assertTrue(registry.is_ready())
+        self.assertEqual(entry.feature_names(), ["a", "b", "c"])
+        self.assertGreater(entry.warmup_seconds, 0)
+        description = registry.stats()["models"][0]
+        self.assertEqual(description["version"], "model_v1")
+        self.assertTrue(description["preprocessing"])
+        self.assertGreater(description["load_seconds"], 0)
+
+    def test_activate_and_remove(self):
+        """Test switching the active version and dropping the previous one."""
+        registry = ModelRegistry()
+        registry.load(self.model_path, activate=True)
+        other_path = os.path.join(self.tmp.name, "model_v2.pkl")
+        joblib.dump(self.forest, other_path)
+        registry.load(other_path)
+        self.assertEqual(registry.active_version, "model_v1")
+
+        registry.activate("model_v2")
+        with self.assertRaises(ValueError):
+            registry.remove("model_v2")
+        registry.remove("model_v1")
+        with self.assertRaises(KeyError):
+            registry.get("model_v1")
+
+    def publish(self, version, n_estimators=5):
+        path = os.path.join(self.tmp.name, f"{version}.pkl")
+        forest = RandomForestClassifier(n_estimators=n_estimators, random_state=0).fit(self.X, self.y)
+        joblib.dump(forest, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return path
+
+    def test_rollback_and_retirement(self):
+        """Test that the previous version is kept for rollback and older ones are retired."""
+        retired = []
+        registry = ModelRegistry(keep_versions=2)
+        registry.retire_hooks.append(retired.append)
+        for version in ("model_v1", "model_v2", "model_v3"):
+            registry.load(self.publish(version), activate=True)
+
+        self.assertEqual(sorted(registry.versions), ["model_v2", "model_v3"])
+        self.assertEqual(retired, ["model_v1"])
+        self.assertEqual(registry.rollback(), "model_v2")
+        self.assertEqual(registry.active_version, "model_v2")
+        with self.assertRaises(KeyError):
+            registry.rollback()
+
+    def test_in_flight_requests_keep_their_version(self):
+        """Test that an entry held by a request stays usable after a swap."""
+        registry = ModelRegistry(keep_versions=1)
+        held = registry.load(self.model_path, activate=True)
+        registry.load(self.publish("model_v2"), activate=True)
+
+        self.assertEqual(registry.get().version, "model_v2")
+        np.testing.assert_array_equal(held.model.predict(self.X), self.forest.predict(self.X))
+
+    def test_load_hooks_run_before_activation(self):
+        """Test that load hooks see a new version before it becomes active."""
+        registry = ModelRegistry()
+        registry.load(self.model_path, activate=True)
+        active_during_hook = []
+        registry.load_hooks.append(lambda entry: active_during_hook.append(registry.active_version))
+        registry.load(self.publish("model_v2"), activate=True)
+        self.assertEqual(active_during_hook, ["model_v1"])
+
+    def test_watcher_swaps_in_new_artifacts(self):
+        """Test that the watcher loads and activates artifacts published after it started."""
+        registry = ModelRegistry()
+        registry.load(self.model_path, activate=True)
+        watcher = ModelWatcher(registry, self.tmp.name, interval=60)
+
+        async def run():
+            await watcher.start()
+            try:
+                unchanged = await watcher.poll()
+                self.publish("model_v2")
+                swapped = await watcher.poll()
+                with open(os.path.join(self.tmp.name, "model_v3.pkl"), "wb") as f:
+                    f.write(b"not a model")
+                failed = await watcher.poll()
+                return unchanged, swapped, failed
+            finally:
+                await watcher.stop()
+
+        self.assertEqual(asyncio.run(run()), (None, "model_v2", None))
+        self.assertEqual(registry.active_version, "model_v2")
+
+    def test_watcher_retries_failed_loads(self):
+        """Test that an artifact whose load fails, e.g. while still being written, is retried on the next poll."""
+        registry = ModelRegistry()
+        registry.load(self.model_path, activate=True)
+        watcher = ModelWatcher(registry, self.tmp.name, interval=60)
+        load = registry.load
+        attempts = []
+
+        def flaky_load(path, *args, **kwargs):
+            attempts.append(path)
+            if len(attempts) == 1:
+                raise EOFError("Ran out of input")
+            return load(path, *args, **kwargs)
+
+        async def run():
+            await watcher.start()
+            try:
+                self.publish("model_v2")
+                with mock.patch.object(registry, "load", side_effect=flaky_load):
+                    return await watcher.poll(), await watcher.poll(), await watcher.poll()
+            finally:
+                await watcher.stop()
+
+        self.assertEqual(asyncio.run(run()), (None, "model_v2", None))
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(registry.active_version, "model_v2")
+
+    def test_watcher_loads_every_new_artifact_in_order(self):
+        """Test that artifacts published between two polls are all loaded, the newest activated last."""
+        registry = ModelRegistry(keep_versions=3)
+        registry.load(self.model_path, activate=True)
+        watcher = ModelWatcher(registry, self.tmp.name, interval=60)
+
+        async def run():
+            await watcher.start()
+            try:
+                for i, version in enumerate(("model_v2", "model_v3")):
+                    path = self.publish(version)
+                    os.utime(path, (1000 + i, 1000 + i))
+                return await watcher.poll()
+            finally:
+                await watcher.stop()
+
+        self.assertEqual(asyncio.run(run()), "model_v3")
+        self.assertEqual(registry.stats()["history"], ["model_v1", "model_v2", "model_v3"])
+
+if __name__ == "__main__":
+    unittest.main()
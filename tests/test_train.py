@@ -0,0 +1,54 @@
+# secure-healthcare-ml/tests/test_train.py
+
+import unittest
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from scripts.train import count_trees, peak_rss_mb, train_model
+
+class TestTrainModel(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = rng.normal(size=(600, 4)).astype(np.float32)
+        self.y = (self.X[:, 0] + self.X[:, 1] > 0).astype(int)
+
+    def test_parallel_forest(self):
+        """Test that the forest is built on all cores by default."""
+        model = train_model(self.X, self.y, n_estimators=20)
+        self.assertIsInstance(model, RandomForestClassifier)
+        self.assertEqual(model.n_jobs, -1)
+        self.assertEqual(count_trees(model), 20)
+
+    def test_parallel_matches_serial(self):
+        """Test that parallel training builds the same forest as a single core."""
+        parallel = train_model(self.X, self.y, n_estimators=10, n_jobs=2, backend="threading")
+        serial = train_model(self.X, self.y, n_estimators=10, n_jobs=1)
+        np.testing.assert_array_equal(parallel.predict_proba(self.X), serial.predict_proba(self.X))
+
+    def test_warm_start_adds_trees(self):
+        """Test that warm starting keeps the existing trees and fits new ones on new data."""
+        model = train_model(self.X[:300], self.y[:300], n_estimators=10)
+        first_trees = list(model.estimators_)
+        model = train_model(self.X[300:], self.y[300:], n_estimators=5, base_model=model)
+
+        self.assertEqual(count_trees(model), 15)
+        self.assertEqual(model.estimators_[:10], first_trees)
+
+    def test_hist_gradient_boosting(self):
+        """Test that histogram-based boosting can be selected and warm started."""
+        model = train_model(self.X, self.y, estimator="hist_gradient_boosting", n_estimators=10)
+        self.assertIsInstance(model, HistGradientBoostingClassifier)
+        model = train_model(self.X, self.y, n_estimators=5, base_model=model)
+        self.assertEqual(model.n_iter_, 15)
+
+    def test_unknown_estimator(self):
+        """Test that an unknown estimator name is rejected."""
+        with self.assertRaises(ValueError):
+            train_model(self.X, self.y, estimator="svm")
+
+    def test_peak_rss_reported(self):
+        """Test that peak memory is reported in MiB."""
+        self.assertGreater(peak_rss_mb(), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+# secure-healthcare-ml/tests/test_tune.py
+
+import os
+import tempfile
+import unittest
+import pytest
+from scripts.preprocess import build_dataset
+from scripts.tune import halving_schedule, sample_candidates, successive_halving
+
+@pytest.mark.usefixtures("synthetic_dataset")
+class TestHyperparameterSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        raw_path = os.path.join(self.tmp.name, "raw.csv")
+        self.synthetic_dataset(400).to_csv(raw_path, index=False)
+        self.dataset_dir = build_dataset(raw_path, os.path.join(self.tmp.name, "cache"))
+        self.output_dir = os.path.join(self.tmp.name, "tuning")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_halving_schedule(self):
+        """Test that each rung keeps a third of the candidates with three times the trees."""
+        self.assertEqual(halving_schedule(27, 25, 400), [(27, 25), (9, 75), (3, 225), (1, 400)])
+        self.assertEqual(halving_schedule(4, 50, 100), [(4, 50), (2, 100)])
+
+    def test_candidates_are_reproducible(self):
+        """Test that the same seed draws the same candidates."""
+        self.assertEqual(sample_candidates(5, random_state=1), sample_candidates(5, random_state=1))
+
+    def test_search_resumes_from_cached_folds(self):
+        """Test that a rerun reuses cached fold results and yields the same leaderboard."""
+        candidates = sample_candidates(4)
+        first = successive_halving(self.dataset_dir, candidates, self.output_dir, min_resource=5,
+                                   max_resource=10, factor=2, n_splits=2, n_jobs=2)
+        fold_dir = os.path.join(self.output_dir, "folds")
+        fold_files = sorted(os.listdir(fold_dir))
+        self.assertEqual(len(fold_files), (4 + 2) * 2)
+
+        # Simulate an interrupted search that lost one fold result
+        os.remove(os.path.join(fold_dir, fold_files[0]))
+        mtimes = {name: os.path.getmtime(os.path.join(fold_dir, name)) for name in fold_files[1:]}
+        second = successive_halving(self.dataset_dir, candidates, self.output_dir, min_resource=5,
+                                    max_resource=10, factor=2, n_splits=2, n_jobs=2)
+
+        self.assertEqual(sorted(os.listdir(fold_dir)), fold_files)
+        self.assertEqual({name: os.path.getmtime(os.path.join(fold_dir, name)) for name in fold_files[1:]}, mtimes)
+        self.assertEqual(first.to_dict("records"), second.to_dict("records"))
+        self.assertEqual(first.iloc[0]["rung"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
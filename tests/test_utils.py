@@ -0,0 +1,119 @@
+# secure-healthcare-ml/tests/test_utils.py
+
+import os
+import tempfile
+import unittest
+import pytest
+import numpy as np
+from fastapi import HTTPException
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import make_pipeline
+from api.utils import (Preprocessor, hash_password, load_preprocessor, preprocess_data, record_to_row,
+                       records_to_matrix, requires_dataframe, verify_password)
+from scripts.preprocess import fit_preprocessing, preprocessing_path_for, save_preprocessing
+
+@pytest.mark.usefixtures("synthetic_dataset")
+class TestServingPreprocessor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = self.synthetic_dataset()
+        self.params = fit_preprocessing(self.df)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_transform_matches_training(self):
+        """Test that the serving-side preprocessor reproduces the training transform, including imputation."""
+        from scripts.preprocess import preprocess_data as preprocess_training_data
+        X_expected, _ = preprocess_training_data(self.df, self.params)
+
+        preprocessor = Preprocessor(self.params)
+        X = preprocessor.transform(self.df[preprocessor.feature_names].to_numpy(dtype=np.float64))
+        np.testing.assert_allclose(X, X_expected, atol=1e-12)
+
+    def test_single_record_is_not_refitted(self):
+        """Test that a single record is scaled with the training parameters instead of being zeroed."""
+        record = {"age": 45.0, "bmi": None, "systolic_bp": 140.0, "site": 1.0}
+        row = preprocess_data(record, Preprocessor(self.params))
+
+        self.assertEqual(list(row.columns), self.params["feature_names"])
+        self.assertNotEqual(row.loc[0, "age"], 0.0)
+        self.assertAlmostEqual(row.loc[0, "bmi"], 0.0)  # Imputed with the training mean
+
+    def test_null_values_become_missing(self):
+        """Test that null feature values are passed on as NaN for imputation."""
+        matrix = records_to_matrix([{"age": 45, "bmi": None}], ["age", "bmi"])
+        self.assertTrue(np.isnan(matrix[0, 1]))
+
+    def test_in_place_transform_matches(self):
+        """Test that transforming into a preallocated row gives the same result as a new array."""
+        preprocessor = Preprocessor(self.params)
+        row = record_to_row({"age": 45.0, "bmi": None, "systolic_bp": 140.0, "site": 1.0}, preprocessor.feature_names)
+        expected = preprocessor.transform(row)
+
+        self.assertIs(preprocessor.transform(row, out=row), row)
+        np.testing.assert_array_equal(row, expected)
+
+    def test_loaded_from_model_directory(self):
+        """Test that parameters saved next to a model are loaded for serving, and are optional."""
+        model_path = os.path.join(self.tmp.name, "model_v1.pkl")
+        save_preprocessing(self.params, preprocessing_path_for(model_path))
+
+        self.assertEqual(load_preprocessor(model_path).feature_names, self.params["feature_names"])
+        self.assertIsNone(load_preprocessor(os.path.join(self.tmp.name, "model_v2.pkl")))
+
+class TestSingleRecordConversion(unittest.TestCase):
+
+    def test_row_in_model_order(self):
+        """Test that a record is written into the given buffer in model column order."""
+        out = np.empty((1, 3))
+        row = record_to_row({"c": 3, "a": 1.5, "b": True, "extra": "ignored"}, ["a", "b", "c"], out=out)
+
+        self.assertIs(row, out)
+        np.testing.assert_array_equal(row, [[1.5, 1.0, 3.0]])
+
+    def test_invalid_records_rejected(self):
+        """Test that missing columns are all reported and non-numeric values are rejected."""
+        with self.assertRaises(HTTPException) as context:
+            record_to_row({"b": 1}, ["a", "b", "c"])
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(context.exception.detail, "Missing columns: a, c")
+
+        with self.assertRaises(HTTPException) as context:
+            record_to_row({"a": "high", "b": None}, ["a", "b"])
+        self.assertEqual(context.exception.status_code, 400)
+
+    def test_numeric_strings_rejected(self):
+        """Test that strings are rejected even where numpy would parse them as numbers."""
+        for values in ({"a": "1.5", "b": 2}, {"a": "1.5", "b": None}):
+            with self.assertRaises(HTTPException):
+                record_to_row(values, ["a", "b"])
+            with self.assertRaises(HTTPException) as context:
+                records_to_matrix([{"a": 1.0, "b": 2}, values], ["a", "b"])
+            self.assertEqual(context.exception.detail, "Record 1 contains non-numeric features")
+        with self.assertRaises(HTTPException):
+            records_to_matrix([{"a": "3"}], ["a"])
+        np.testing.assert_array_equal(records_to_matrix([{"a": None, "b": 2}], ["a", "b"]), [[np.nan, 2.0]])
+
+    def test_dataframe_only_for_named_column_selection(self):
+        """Test that only estimators selecting columns by name require a DataFrame."""
+        X, y = np.random.default_rng(0).normal(size=(50, 2)), np.arange(50) % 2
+        columns = ColumnTransformer([("keep", "passthrough", [0, 1])])
+
+        self.assertFalse(requires_dataframe(RandomForestClassifier(n_estimators=2).fit(X, y)))
+        self.assertTrue(requires_dataframe(make_pipeline(columns, RandomForestClassifier(n_estimators=2)).fit(X, y)))
+
+class TestPasswords(unittest.TestCase):
+
+    def test_hash_and_verify(self):
+        """Test that a password verifies against its salted hash and nothing else does."""
+        hashed = hash_password("correct horse", iterations=1000)
+        self.assertTrue(verify_password("correct horse", hashed))
+        self.assertFalse(verify_password("wrong", hashed))
+        self.assertNotEqual(hashed, hash_password("correct horse", iterations=1000))
+        self.assertFalse(verify_password("correct horse", "not-a-hash"))
+
+if __name__ == "__main__":
+    unittest.main()
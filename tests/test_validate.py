@@ -0,0 +1,61 @@
+# secure-healthcare-ml/tests/test_validate.py
+
+import os
+import tempfile
+import unittest
+import numpy as np
+import pytest
+from scripts.preprocess import (apply_preprocessing, build_dataset, fit_preprocessing, load_dataset,
+                                preprocessing_path_for, save_dataset_record, save_preprocessing)
+from scripts.validate import load_model_preprocessing, load_validation_dataset
+
+@pytest.mark.usefixtures("synthetic_dataset")
+class TestValidationPreprocessing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raw_path = os.path.join(self.tmp.name, "raw.csv")
+        self.df = self.synthetic_dataset()
+        self.df.to_csv(self.raw_path, index=False)
+        self.model_path = os.path.join(self.tmp.name, "model_v1.pkl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_held_out_split_uses_model_preprocessing(self):
+        """Test that validation data is scaled with the model's saved parameters, not refitted ones."""
+        # Parameters fitted on other data, as for a warm-started model
+        params = fit_preprocessing(self.synthetic_dataset(seed=1))
+        save_preprocessing(params, preprocessing_path_for(self.model_path))
+
+        model_params = load_model_preprocessing(self.model_path)
+        dataset_dir = build_dataset(self.raw_path, os.path.join(self.tmp.name, "cache"), params=model_params)
+        X_train, X_test, _, _, used_params = load_dataset(dataset_dir)
+
+        self.assertEqual(used_params, params)
+        X_all = apply_preprocessing(self.df, params)
+        self.assertTrue(any(np.allclose(X_test[0], row) for row in X_all))
+
+    def test_training_dataset_reused(self):
+        """Test that validation reuses the cached split the model was trained on, without preprocessing again."""
+        cache_dir = os.path.join(self.tmp.name, "cache")
+        dataset_dir = build_dataset(self.raw_path, cache_dir)
+        _, _, _, _, params = load_dataset(dataset_dir)
+        save_preprocessing(params, preprocessing_path_for(self.model_path))
+        save_dataset_record(dataset_dir, self.model_path)
+
+        self.assertEqual(load_validation_dataset(self.model_path, self.raw_path, cache_dir), dataset_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        # New data at the same path is preprocessed with the model's parameters instead
+        self.synthetic_dataset(seed=2).to_csv(self.raw_path, index=False)
+        rebuilt = load_validation_dataset(self.model_path, self.raw_path, cache_dir)
+        self.assertNotEqual(rebuilt, dataset_dir)
+        self.assertEqual(load_dataset(rebuilt)[4], params)
+
+    def test_model_without_preprocessing(self):
+        """Test that models saved without parameters fall back to fitting them on the data."""
+        self.assertIsNone(load_model_preprocessing(self.model_path))
+
+if __name__ == "__main__":
+    unittest.main()